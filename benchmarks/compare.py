@@ -0,0 +1,96 @@
+"""
+Compare two benchmark runs written by benchmarks.suite --json.
+
+Results are matched by group and name. A result regresses when its time or
+peak memory grows by more than --threshold (a fraction, 0.10 by default) or
+its recall drops by more than --recall-drop; the exit code is 1 if any
+result regressed, so the comparison can gate a release.
+
+    python -m benchmarks.compare BASELINE.json CANDIDATE.json [--threshold 0.10] [--recall-drop 0.01]
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+# Changes smaller than these are noise however large the ratio, e.g. 0.01 MB -> 0.02 MB
+MIN_SECONDS = 0.0005
+MIN_MB = 0.1
+
+
+def load(path: str) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    with open(path, 'r', encoding='utf-8') as file:
+        report = json.load(file)
+    return {(result['group'], result['name']): result for result in report['results']}
+
+
+def _ratio(old: Optional[float], new: Optional[float]) -> Optional[float]:
+    if old is None or new is None or old <= 0:
+        return None
+    return new / old
+
+
+def compare(baseline: Dict[Tuple[str, str], Dict[str, Any]],
+            candidate: Dict[Tuple[str, str], Dict[str, Any]],
+            threshold: float = 0.10,
+            recall_drop: float = 0.01) -> List[Dict[str, Any]]:
+    """
+    One row per benchmark present in both runs, with the time and memory
+    ratios (candidate / baseline), the recall change and a status of
+    'regressed', 'faster' or 'same'.
+    """
+    rows = []
+    for key in baseline.keys() & candidate.keys():
+        old, new = baseline[key], candidate[key]
+        if 'skipped' in old or 'skipped' in new:
+            continue
+        time_ratio = _ratio(old.get('seconds'), new.get('seconds'))
+        memory_ratio = _ratio(old.get('peak_mb'), new.get('peak_mb'))
+        recall_change = new['recall'] - old['recall'] if 'recall' in old and 'recall' in new else None
+        time_changed = time_ratio is not None and abs(new['seconds'] - old['seconds']) >= MIN_SECONDS
+        memory_changed = memory_ratio is not None and abs(new['peak_mb'] - old['peak_mb']) >= MIN_MB
+
+        regressed = ((time_changed and time_ratio > 1 + threshold) or
+                     (memory_changed and memory_ratio > 1 + threshold) or
+                     (recall_change is not None and recall_change < -recall_drop))
+        if regressed:
+            status = 'regressed'
+        elif time_changed and time_ratio < 1 / (1 + threshold):
+            status = 'faster'
+        else:
+            status = 'same'
+        rows.append({'group': key[0], 'name': key[1], 'time_ratio': time_ratio, 'memory_ratio': memory_ratio,
+                     'recall_change': recall_change, 'status': status})
+    rows.sort(key=lambda row: (row['group'], row['name']))
+    return rows
+
+
+def _format(value: Optional[float], spec: str) -> str:
+    return format(value, spec) if value is not None else f"{'-':>{len(format(0.0, spec))}}"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=0.10)
+    parser.add_argument('--recall-drop', type=float, default=0.01)
+    args = parser.parse_args()
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    rows = compare(baseline, candidate, args.threshold, args.recall_drop)
+    width = max((len(row['group']) + len(row['name']) + 1 for row in rows), default=0)
+    print(f"{'benchmark':{width}}  {'time':>7}  {'memory':>7}  {'recall':>7}  status")
+    for row in rows:
+        name = f"{row['group']}/{row['name']}"
+        print(f"{name:{width}}  {_format(row['time_ratio'], '7.2f')}  {_format(row['memory_ratio'], '7.2f')}  "
+              f"{_format(row['recall_change'], '+7.3f')}  {row['status']}")
+    for key in sorted(baseline.keys() - candidate.keys()):
+        print(f'missing from candidate: {key[0]}/{key[1]}')
+    for key in sorted(candidate.keys() - baseline.keys()):
+        print(f'new in candidate: {key[0]}/{key[1]}')
+    return 1 if any(row['status'] == 'regressed' for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Synthetic corpus generator for the benchmarks.
+
+Writes a reproducible folder of .txt, .docx and .pdf documents made of
+topic-coherent paragraphs of pseudo-words, so that every processor, chunker
+and the parse pipeline can be measured without shipping real documents.
+PDFs are written by hand with the standard Helvetica font, so only
+python-docx is needed to generate the .docx files.
+
+    python -m benchmarks.corpus OUT_DIR [--files 12] [--words 3000] [--seed 0]
+"""
+import argparse
+import os
+import random
+import textwrap
+from typing import Dict, List, Optional, Sequence
+
+KINDS = ('txt', 'docx', 'pdf')
+
+_ONSETS = ['b', 'c', 'd', 'f', 'g', 'h', 'k', 'l', 'm', 'n', 'p', 'r', 's', 't', 'v', 'w', 'br', 'ch', 'st', 'tr']
+_VOWELS = ['a', 'e', 'i', 'o', 'u', 'ai', 'ea', 'ou']
+_CODAS = ['', '', 'n', 'r', 's', 't', 'l', 'nd', 'st']
+_COMMON = ['the', 'of', 'and', 'a', 'to', 'in', 'is', 'that', 'for', 'with', 'as', 'on', 'by', 'this', 'are']
+
+
+class TextGenerator:
+    """
+    Deterministic generator of prose-like text
+
+    Every paragraph is drawn from one of n_topics vocabularies mixed with
+    common function words, so adjacent sentences within a paragraph share
+    words and semantic chunking has real boundaries to find.
+
+    Args:
+        seed: Random seed
+        n_topics: Number of topic vocabularies
+        topic_words: Words per topic vocabulary
+    """
+
+    def __init__(self, seed: int = 0, n_topics: int = 20, topic_words: int = 200) -> None:
+        self.random = random.Random(seed)
+        self.topics = [[self._word() for _ in range(topic_words)] for _ in range(n_topics)]
+
+    def _word(self) -> str:
+        syllables = self.random.randint(1, 3)
+        return ''.join(self.random.choice(_ONSETS) + self.random.choice(_VOWELS) + self.random.choice(_CODAS)
+                       for _ in range(syllables))
+
+    def sentence(self, topic: int) -> str:
+        words = [self.random.choice(_COMMON) if self.random.random() < 0.35 else self.random.choice(self.topics[topic])
+                 for _ in range(self.random.randint(8, 20))]
+        return ' '.join(words).capitalize() + '.'
+
+    def paragraph(self, topic: Optional[int] = None) -> str:
+        topic = self.random.randrange(len(self.topics)) if topic is None else topic
+        return ' '.join(self.sentence(topic) for _ in range(self.random.randint(3, 7)))
+
+    def text(self, n_words: int) -> str:
+        """Paragraphs separated by blank lines, totalling roughly n_words words"""
+        paragraphs, words = [], 0
+        while words < n_words:
+            paragraph = self.paragraph()
+            paragraphs.append(paragraph)
+            words += paragraph.count(' ') + 1
+        return '\n\n'.join(paragraphs)
+
+
+def write_txt(path: str, text: str) -> None:
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(text)
+
+
+def write_docx(path: str, text: str) -> None:
+    from docx import Document
+    document = Document()
+    for paragraph in text.split('\n\n'):
+        document.add_paragraph(paragraph)
+    document.save(path)
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def write_pdf(path: str, text: str, line_chars: int = 90, lines_per_page: int = 50) -> None:
+    """Write text as a minimal PDF: one Helvetica content stream per page, with a correct xref table"""
+    lines: List[str] = []
+    for paragraph in text.split('\n\n'):
+        lines.extend(textwrap.wrap(paragraph, line_chars))
+        lines.append('')
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    # Objects 1-3 are the catalog, the page tree and the font; each page then takes a page and a content object
+    page_refs = ' '.join(f'{4 + 2 * i} 0 R' for i in range(len(pages)))
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        f'<< /Type /Pages /Kids [{page_refs}] /Count {len(pages)} >>'.encode(),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+    ]
+    for i, page in enumerate(pages):
+        stream = 'BT /F1 11 Tf 14 TL 72 770 Td\n' + ''.join(f'({_pdf_escape(line)}) Tj T*\n' for line in page) + 'ET'
+        stream = stream.encode('latin-1', errors='replace')
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                       f'/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>'.encode())
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    with open(path, 'wb') as file:
+        file.write(out)
+
+
+WRITERS = {'txt': write_txt, 'docx': write_docx, 'pdf': write_pdf}
+
+
+def generate(folder: str,
+             n_files: int = 12,
+             words: int = 3000,
+             kinds: Sequence[str] = KINDS,
+             seed: int = 0) -> Dict[str, List[str]]:
+    """
+    Write n_files documents of about words words each, cycling through kinds.
+
+    Files are spread over a few subfolders, as in a real document tree.
+    The same arguments always produce the same text.
+
+    Returns:
+        Dict[str, List[str]]: Paths written, by kind
+    """
+    for kind in kinds:
+        if kind not in WRITERS:
+            raise ValueError(f'Invalid document kind: {kind}. Must be one of {list(WRITERS)}')
+    generator = TextGenerator(seed)
+    written: Dict[str, List[str]] = {kind: [] for kind in kinds}
+    for i in range(n_files):
+        kind = kinds[i % len(kinds)]
+        subfolder = os.path.join(folder, f'group-{i % 3}')
+        os.makedirs(subfolder, exist_ok=True)
+        path = os.path.join(subfolder, f'doc-{i:04d}.{kind}')
+        WRITERS[kind](path, generator.text(words))
+        written[kind].append(path)
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('folder')
+    parser.add_argument('--files', type=int, default=12)
+    parser.add_argument('--words', type=int, default=3000)
+    parser.add_argument('--kinds', nargs='+', default=list(KINDS), choices=KINDS)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    written = generate(args.folder, args.files, args.words, args.kinds, args.seed)
+    for kind, paths in written.items():
+        print(f'{len(paths):4} {kind} files')
+
+
+if __name__ == '__main__':
+    main()
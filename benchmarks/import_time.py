@@ -0,0 +1,95 @@
+"""
+Import-time regression check.
+
+Imports each dvx module in a fresh interpreter and fails if any of them takes
+longer than its budget or pulls in a heavy backend (transformers, PyPDF2,
+python-docx, pandas, ...) that should only be loaded on first use.
+
+    python -m benchmarks.import_time [--budget-ms 500] [--repeat 3] [--json out.json]
+"""
+import argparse
+import json
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+
+MODULES = [
+    'dvx.core.document',
+    'dvx.core.encoder',
+    'dvx.core.metadata',
+    'dvx.core.store',
+    'dvx.encoders.text.hashing',
+    'dvx.index.flat',
+    'dvx.index.hnsw',
+    'dvx.index.ivfpq',
+    'dvx.index.sharded',
+    'dvx.processors.pdf',
+    'dvx.processors.text',
+    'dvx.processors.word',
+    'dvx.retrieve.bm25',
+    'dvx.retrieve.hybrid',
+    'dvx.retrieve.batcher',
+    'dvx.store.bitmap',
+    'dvx.store.segments',
+    'dvx.store.wal',
+    'dvx.utils.arrays',
+    'dvx.utils.chunking',
+    'dvx.utils.instrument',
+    'dvx.utils.overlap',
+    'dvx.utils.similarity',
+]
+
+HEAVY_MODULES = ['transformers', 'torch', 'tensorflow', 'PyPDF2', 'docx', 'pandas', 'scipy', 'sklearn']
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+print(json.dumps({{'seconds': elapsed, 'heavy': heavy}}))
+"""
+
+
+def measure(module: str, repeat: int = 3) -> Dict[str, Any]:
+    """Best-of-repeat import time of module in a fresh interpreter, plus any heavy modules it loaded"""
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if best is None or result['seconds'] < best['seconds']:
+            best = result
+    return {'module': module, 'ms': round(best['seconds'] * 1000, 2), 'heavy': best['heavy']}
+
+
+def run(modules: List[str] = MODULES, budget_ms: float = 500.0, repeat: int = 3) -> List[Dict[str, Any]]:
+    results = []
+    for module in modules:
+        result = measure(module, repeat)
+        result['ok'] = result['ms'] <= budget_ms and not result['heavy']
+        results.append(result)
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=500.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    results = run(budget_ms=args.budget_ms, repeat=args.repeat)
+    for result in results:
+        status = 'ok' if result['ok'] else 'FAIL'
+        heavy = f"  loaded: {', '.join(result['heavy'])}" if result['heavy'] else ''
+        print(f"{status:4}  {result['ms']:8.2f} ms  {result['module']}{heavy}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump({'budget_ms': args.budget_ms, 'results': results}, file, indent=2)
+    return 0 if all(result['ok'] for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,347 @@
+"""
+Throughput and memory benchmarks for ingestion and search.
+
+Generates a synthetic corpus (see benchmarks.corpus) and measures, in
+groups that can be run separately:
+
+    processors  processors.{text,word,pdf}.read over the corpus
+    chunkers    every chunker and span chunker in dvx.utils.chunking
+    similarity  SemanticScore and the vectorised scoring functions
+    pipeline    parse() followed by overlap(), and parse_table()
+    index       build time and recall@k against queries/s for every index
+    imports     import time of each module, from benchmarks.import_time
+
+Each result records the best wall time of --repeat runs, the throughput
+derived from it and, from one extra run under tracemalloc, the peak
+Python-level memory. Results are written as JSON for benchmarks.compare.
+Benchmarks that need the Hugging Face tokenizer are reported as skipped
+when it cannot be loaded.
+
+    python -m benchmarks.suite [--groups chunkers index] [--quick] [--json out.json] [--corpus DIR]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+
+GROUPS = ('processors', 'chunkers', 'similarity', 'pipeline', 'index', 'imports')
+
+# Corpus, text and index sizes for a full run and for --quick
+SIZES = {
+    'full': {'files': 30, 'words': 5000, 'semantic_words': 20000, 'pairs': 2000,
+             'n': 20000, 'dim': 128, 'queries': 500, 'k': 10},
+    'quick': {'files': 6, 'words': 2000, 'semantic_words': 3000, 'pairs': 300,
+              'n': 5000, 'dim': 64, 'queries': 100, 'k': 10},
+}
+
+
+def measure(fn: Callable[[], Any], repeat: int = 3, memory: bool = True) -> Dict[str, Any]:
+    """
+    Best wall time of repeat calls of fn, after one warm-up call, plus the
+    peak traced memory of one more call when memory is True.
+
+    Timing runs are kept apart from the tracemalloc run, whose bookkeeping
+    would otherwise slow allocation-heavy code down.
+    """
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    result: Dict[str, Any] = {'seconds': min(times)}
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            result['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 3)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def record(group: str, name: str, timing: Dict[str, Any], units: float, unit: str, **extra: Any) -> Dict[str, Any]:
+    seconds = timing['seconds']
+    result = {'group': group, 'name': name, 'seconds': round(seconds, 6),
+              'throughput': round(units / seconds, 3) if seconds > 0 else None, 'unit': unit}
+    if 'peak_mb' in timing:
+        result['peak_mb'] = timing['peak_mb']
+    result.update(extra)
+    return result
+
+
+def skipped(group: str, name: str, reason: str) -> Dict[str, Any]:
+    return {'group': group, 'name': name, 'skipped': reason}
+
+
+def tokenizer_error() -> Optional[str]:
+    """Why the default tokenizer cannot be loaded, or None if it can"""
+    try:
+        from dvx.utils.similarity import get_tokenizer
+        get_tokenizer()
+    except Exception as e:
+        return f'{type(e).__name__}: {e}'
+    return None
+
+
+def _megabytes(texts: List[str]) -> float:
+    return sum(len(text.encode('utf-8')) for text in texts) / 2 ** 20
+
+
+def bench_processors(corpus: Dict[str, List[str]], repeat: int) -> List[Dict[str, Any]]:
+    from dvx.processors import pdf, text, word
+    readers = {'txt': text.read, 'docx': word.read, 'pdf': pdf.read}
+    results = []
+    for kind, read in readers.items():
+        paths = corpus.get(kind, [])
+        if not paths:
+            continue
+        output = [read(path) for path in paths]
+        timing = measure(lambda: [read(path) for path in paths], repeat)
+        results.append(record('processors', f'{kind}.read', timing, _megabytes(output), 'MB/s', files=len(paths)))
+    return results
+
+
+def bench_chunkers(content: str, semantic_content: str, repeat: int, missing: Optional[str]) -> List[Dict[str, Any]]:
+    from dvx.encoders.text.hashing import HashingEncoder
+    from dvx.utils import chunking
+    plain = ['fixed_size_chunk', 'sentence_based_chunk', 'paragraph_based_chunk',
+             'fixed_size_spans', 'sentence_spans', 'paragraph_spans']
+    results = []
+    size = _megabytes([content])
+    for name in plain:
+        fn = getattr(chunking, name)
+        results.append(record('chunkers', name, measure(lambda: fn(content), repeat), size, 'MB/s'))
+
+    # Semantic chunking is far slower, so it runs on a shorter text; the hashing
+    # encoder variant needs no tokenizer and always runs
+    size = _megabytes([semantic_content])
+    encoder = HashingEncoder(n_features=256)
+    for name in ['semantic_sentence_chunk', 'semantic_sentence_spans']:
+        fn = getattr(chunking, name)
+        timing = measure(lambda: fn(semantic_content, encoder=encoder), repeat)
+        results.append(record('chunkers', f'{name}[hashing]', timing, size, 'MB/s'))
+        if missing is not None:
+            results.append(skipped('chunkers', name, missing))
+            continue
+        results.append(record('chunkers', name, measure(lambda: fn(semantic_content), repeat), size, 'MB/s'))
+    return results
+
+
+def bench_similarity(sentences: List[str], repeat: int, missing: Optional[str]) -> List[Dict[str, Any]]:
+    from dvx.utils.similarity import SemanticScore, paired_scores, pairwise_scores, set_token_cache_size
+    rng = np.random.default_rng(0)
+    A = rng.standard_normal((len(sentences), 128)).astype(np.float32)
+    B = rng.standard_normal((len(sentences), 128)).astype(np.float32)
+    n = len(sentences)
+    results = [
+        record('similarity', 'pairwise_scores', measure(lambda: pairwise_scores(A, B), repeat), n * n, 'pairs/s'),
+        record('similarity', 'paired_scores', measure(lambda: paired_scores(A, B), repeat), n, 'pairs/s'),
+    ]
+    if missing is not None:
+        results += [skipped('similarity', name, missing)
+                    for name in ['SemanticScore.calculate', 'SemanticScore.calculate[cached]',
+                                 'SemanticScore.encode_batch']]
+        return results
+
+    score = SemanticScore()
+    pairs = list(zip(sentences, sentences[1:]))
+
+    def calculate(cold: bool) -> None:
+        if cold:
+            set_token_cache_size(65536)
+        for a, b in pairs:
+            score.calculate(a, b)
+
+    def encode_batch() -> None:
+        set_token_cache_size(65536)
+        score.encode_batch(sentences)
+
+    results += [
+        record('similarity', 'SemanticScore.calculate', measure(lambda: calculate(True), repeat), len(pairs), 'pairs/s'),
+        record('similarity', 'SemanticScore.calculate[cached]', measure(lambda: calculate(False), repeat),
+               len(pairs), 'pairs/s'),
+        record('similarity', 'SemanticScore.encode_batch', measure(encode_batch, repeat), n, 'sentences/s'),
+    ]
+    return results
+
+
+def bench_pipeline(folder: str, repeat: int, missing: Optional[str]) -> List[Dict[str, Any]]:
+    from dvx.core.document import list_files, overlap, parse, parse_table, read_document
+    size = _megabytes([read_document(path) for path in list_files(folder)])
+    results = []
+    plans = [('sentence_based_chunk', 'sentence_overlap'), ('paragraph_based_chunk', 'paragraph_overlap'),
+             ('fixed_size_chunk', 'token_overlap'), ('semantic_sentence_chunk', 'semantic_sentence_overlap')]
+    for chunking, overlap_type in plans:
+        name = f'parse+overlap[{chunking},{overlap_type}]'
+        if missing is not None and 'semantic' in chunking:
+            results.append(skipped('pipeline', name, missing))
+            continue
+        timing = measure(lambda: overlap(parse(folder, chunking), overlap_type), repeat)
+        results.append(record('pipeline', name, timing, size, 'MB/s'))
+    timing = measure(lambda: parse_table(folder, 'sentence_based_chunk'), repeat)
+    results.append(record('pipeline', 'parse_table[sentence_based_chunk]', timing, size, 'MB/s'))
+    return results
+
+
+def clustered_vectors(n: int, dim: int, n_clusters: int = 64, seed: int = 0) -> np.ndarray:
+    """Gaussian clusters, closer to real embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    return centers[rng.integers(n_clusters, size=n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(np.intersect1d(row[row >= 0], true)) for row, true in zip(found, truth))
+    return hits / truth.size
+
+
+def bench_index(sizes: Dict[str, int], repeat: int) -> List[Dict[str, Any]]:
+    from dvx.index.flat import FlatIndex
+    from dvx.index.hnsw import HNSWIndex
+    from dvx.index.ivfpq import IVFPQIndex
+    from dvx.index.sharded import ShardedIndex
+    n, dim, k = sizes['n'], sizes['dim'], sizes['k']
+    data = clustered_vectors(n + sizes['queries'], dim)
+    vectors, queries = data[:n], data[n:]
+    ids = np.arange(n)
+    metric = 'l2'
+
+    def build(name: str, index: Any, train: bool = False) -> Any:
+        start = time.perf_counter()
+        if train:
+            index.train(vectors)
+        index.add(ids, vectors)
+        seconds = time.perf_counter() - start
+        results.append(record('index', f'{name} build', {'seconds': seconds}, n, 'vectors/s'))
+        return index
+
+    results: List[Dict[str, Any]] = []
+    flat = build('flat', FlatIndex(dim, metric))
+    truth = flat.search(queries, k)[0]
+
+    def sweep(name: str, index: Any, **params: Any) -> None:
+        found = index.search(queries, k, **params)[0]
+        timing = measure(lambda: index.search(queries, k, **params), repeat)
+        label = ' '.join([name] + [f'{key}={value}' for key, value in params.items()])
+        results.append(record('index', label, timing, len(queries), 'queries/s',
+                              recall=round(recall_at_k(found, truth), 4), k=k, params=params))
+
+    sweep('flat', flat)
+    hnsw = build('hnsw', HNSWIndex(dim, metric, seed=0))
+    for ef in (16, 32, 64, 128, 256):
+        sweep('hnsw', hnsw, ef=ef)
+    nlist = max(16, int(np.sqrt(n)))
+    for rerank in (0, 4 * k):
+        name = 'ivfpq' if not rerank else f'ivfpq rerank={rerank}'
+        ivfpq = build(name, IVFPQIndex(dim, metric, nlist=nlist, m=dim // 8, rerank=rerank, seed=0), train=True)
+        for nprobe in (1, 4, 16, 64):
+            sweep(name, ivfpq, nprobe=min(nprobe, nlist))
+    with build('sharded', ShardedIndex(dim, metric, n_shards=min(4, os.cpu_count() or 1))) as sharded:
+        sweep('sharded', sharded)
+    return results
+
+
+def bench_imports(repeat: int) -> List[Dict[str, Any]]:
+    from benchmarks import import_time
+    return [{'group': 'imports', 'name': result['module'], 'seconds': round(result['ms'] / 1000, 6),
+             'heavy': result['heavy']}
+            for result in import_time.run(repeat=repeat)]
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__,
+            'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+
+def run(groups: List[str], quick: bool = False, repeat: int = 3, corpus: Optional[str] = None) -> Dict[str, Any]:
+    """Run the given benchmark groups and return the results with a description of the environment"""
+    from benchmarks.corpus import TextGenerator, generate
+    from dvx.core.document import list_files
+    from dvx.utils.chunking import sentence_based_chunk
+    sizes = SIZES['quick' if quick else 'full']
+    missing = tokenizer_error()
+    generator = TextGenerator(seed=1)
+    content = generator.text(sizes['words'] * sizes['files'])
+    semantic_content = generator.text(sizes['semantic_words'])
+    sentences = sentence_based_chunk(generator.text(sizes['pairs'] * 14))[:sizes['pairs']]
+
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as scratch:
+        folder = corpus or scratch
+        if corpus is None:
+            generate(folder, sizes['files'], sizes['words'])
+        files: Dict[str, List[str]] = {}
+        for path in list_files(folder):
+            files.setdefault(os.path.splitext(path)[1].lstrip('.'), []).append(path)
+
+        for group in groups:
+            print(f'Running {group} benchmarks...', file=sys.stderr)
+            if group == 'processors':
+                results += bench_processors(files, repeat)
+            elif group == 'chunkers':
+                results += bench_chunkers(content, semantic_content, repeat, missing)
+            elif group == 'similarity':
+                results += bench_similarity(sentences, repeat, missing)
+            elif group == 'pipeline':
+                results += bench_pipeline(folder, repeat, missing)
+            elif group == 'index':
+                results += bench_index(sizes, repeat)
+            elif group == 'imports':
+                results += bench_imports(repeat)
+            else:
+                raise ValueError(f'Invalid benchmark group: {group}. Must be one of {list(GROUPS)}')
+
+    return {'environment': environment(), 'settings': {'quick': quick, 'repeat': repeat, 'sizes': sizes},
+            'results': results}
+
+
+def format_result(result: Dict[str, Any], width: int = 60) -> str:
+    name = f"{result['group']}/{result['name']}"
+    if 'skipped' in result:
+        return f'{name:{width}}  skipped: {result["skipped"]}'
+    line = f"{name:{width}}  {result['seconds'] * 1000:10.2f} ms"
+    if result.get('throughput') is not None:
+        line += f"  {result['throughput']:14,.1f} {result['unit']}"
+    if 'peak_mb' in result:
+        line += f"  peak {result['peak_mb']:9.2f} MB"
+    if 'recall' in result:
+        line += f"  recall@{result['k']} {result['recall']:.3f}"
+    return line
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--groups', nargs='+', default=list(GROUPS), choices=GROUPS)
+    parser.add_argument('--quick', action='store_true', help='Use a small corpus and index')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--corpus', help='Benchmark an existing folder instead of a generated corpus')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    report = run(args.groups, quick=args.quick, repeat=args.repeat, corpus=args.corpus)
+    width = max((len(result['group']) + len(result['name']) + 1 for result in report['results']), default=0)
+    for result in report['results']:
+        print(format_result(result, width))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+from typing import Any, Iterator, List, Optional, Sequence, Union
+import numpy as np
+from dvx.utils.arrays import grow
+
+
+class Chunk:
+    """Lightweight view of one row of a ChunkTable; its text is sliced on access"""
+
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table: 'ChunkTable', row: int) -> None:
+        self.table = table
+        self.row = row
+
+    @property
+    def doc_id(self) -> Any:
+        return self.table.doc_ids[self.table.docs[self.row]]
+
+    @property
+    def start(self) -> int:
+        return int(self.table.starts[self.row])
+
+    @property
+    def end(self) -> int:
+        return int(self.table.ends[self.row])
+
+    @property
+    def text(self) -> str:
+        return self.table.text(self.row)
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __repr__(self) -> str:
+        return f'Chunk(doc_id={self.doc_id!r}, start={self.start}, end={self.end})'
+
+
+class ChunkTable:
+    """
+    Columnar table of chunks stored as (doc, start, end) offsets into shared document texts
+
+    Each document's text is held once; chunks are three NumPy columns, so a
+    chunk costs 20 bytes until its text is materialised with text() or a
+    Chunk view.
+
+    Args:
+        capacity: Number of chunk rows to preallocate
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self.doc_ids: List[Any] = []
+        self.sources: List[str] = []
+        self._docs = np.empty(capacity, dtype=np.int32)
+        self._starts = np.empty(capacity, dtype=np.int64)
+        self._ends = np.empty(capacity, dtype=np.int64)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def docs(self) -> np.ndarray:
+        """Document number of every chunk, indexing doc_ids and sources"""
+        return self._docs[:self._size]
+
+    @property
+    def starts(self) -> np.ndarray:
+        return self._starts[:self._size]
+
+    @property
+    def ends(self) -> np.ndarray:
+        return self._ends[:self._size]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the offset columns"""
+        return self._docs.nbytes + self._starts.nbytes + self._ends.nbytes
+
+    def add(self, text: str, spans: np.ndarray, doc_id: Optional[Any] = None) -> int:
+        """
+        Add a document and its chunks.
+
+        Args:
+            text: Full document text, shared by all of its chunks
+            spans: Array of shape (n, 2) of (start, end) offsets into text
+            doc_id: Identifier of the document; defaults to its number in the table
+
+        Returns:
+            int: Number of the document in the table
+        """
+        spans = np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+        if len(spans) and (spans.min() < 0 or spans[:, 1].max() > len(text) or np.any(spans[:, 0] > spans[:, 1])):
+            raise ValueError('Spans must satisfy 0 <= start <= end <= len(text)')
+        doc = len(self.sources)
+        self.doc_ids.append(doc if doc_id is None else doc_id)
+        self.sources.append(text)
+
+        size = self._size + len(spans)
+        if size > len(self._starts):
+            self._docs = grow(self._docs, size)
+            self._starts = grow(self._starts, size)
+            self._ends = grow(self._ends, size)
+        self._docs[self._size:size] = doc
+        self._starts[self._size:size] = spans[:, 0]
+        self._ends[self._size:size] = spans[:, 1]
+        self._size = size
+        return doc
+
+    def text(self, row: int) -> str:
+        """Materialise the text of one chunk"""
+        if not -self._size <= row < self._size:
+            raise IndexError('Chunk index out of range')
+        row %= self._size
+        return self.sources[self._docs[row]][self._starts[row]:self._ends[row]]
+
+    def texts(self, rows: Optional[Sequence[int]] = None) -> Iterator[str]:
+        """Materialise chunk texts lazily, for all rows or the given ones"""
+        rows = range(self._size) if rows is None else rows
+        for row in rows:
+            yield self.text(row)
+
+    def __getitem__(self, row: int) -> Chunk:
+        if not -self._size <= row < self._size:
+            raise IndexError('Chunk index out of range')
+        return Chunk(self, row % self._size)
+
+    def __iter__(self) -> Iterator[Chunk]:
+        for row in range(self._size):
+            yield Chunk(self, row)
+
+    def to_list(self) -> List[str]:
+        return list(self.texts())
+
+    def with_overlap(self, overlap_size: int) -> 'ChunkTable':
+        """
+        Return a table whose chunks start up to overlap_size characters earlier.
+
+        A chunk never extends back past the start of the previous chunk of the
+        same document, and the first chunk of each document is unchanged.
+        Document texts are shared with this table, not copied.
+        """
+        table = ChunkTable(capacity=max(1, self._size))
+        table.doc_ids = self.doc_ids
+        table.sources = self.sources
+        starts = self.starts.copy()
+        if self._size > 1:
+            follows = self.docs[1:] == self.docs[:-1]
+            earlier = np.maximum(starts[1:] - overlap_size, starts[:-1])
+            starts[1:] = np.where(follows, np.minimum(starts[1:], earlier), starts[1:])
+        table._docs[:self._size] = self.docs
+        table._starts[:self._size] = starts
+        table._ends[:self._size] = self.ends
+        table._size = self._size
+        return table
@@ -1,10 +1,27 @@
 from dvx.utils.chunking import fixed_size_chunk, sentence_based_chunk, paragraph_based_chunk, semantic_sentence_chunk
-from dvx.utils.overlap import fixed_size_overlap, sentence_overlap, paragraph_overlap, semantic_sentence_overlap
+from dvx.utils.chunking import fixed_size_spans, sentence_spans, paragraph_spans, semantic_sentence_spans
+from dvx.utils.overlap import fixed_size_overlap, token_overlap, sentence_overlap, paragraph_overlap, semantic_sentence_overlap
 from dvx import processors
+from dvx.utils import instrument
+from dvx.core.manifest import Manifest
+from dvx.core.chunks import ChunkTable
 
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 import os
 
 
+@dataclass
+class Document:
+    """A chunk of text stored in a VectorStore"""
+    id: str
+    text: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
 def read_pdf(path : str, ) -> str:
     from dvx.processors.pdf import read
     content = read(path)
@@ -31,72 +48,293 @@ def validate_chunking(chunking : str = 'semantic_sentence_chunk') -> str:
     elif chunking == 'semantic_sentence_chunk':
         return semantic_sentence_chunk
     else:
-        raise 'Invalid chunking strategy provided'
+        raise ValueError('Invalid chunking strategy provided')
     
 
 def chunk(content : str, chunking : str = 'semantic_sentence_chunk') -> str:
     if content == None:
-        raise 'Invalid text provided'
+        raise ValueError('Invalid text provided')
     
-    chunking = validate_chunking(chunking)
-    return chunking(content)
+    chunking_fn = validate_chunking(chunking)
+    with instrument.stage('chunk', chunking = chunking):
+        chunks = chunking_fn(content)
+    instrument.count('chunks', len(chunks))
+    return chunks
+
+
+def validate_spans(chunking : str = 'semantic_sentence_chunk') -> Callable[..., Any]:
+    """Return the offset-producing counterpart of a chunking strategy"""
+    if chunking == 'fixed_size_chunk':
+        return fixed_size_spans
+    elif chunking == 'sentence_based_chunk':
+        return sentence_spans
+    elif chunking == 'paragraph_based_chunk':
+        return paragraph_spans
+    elif chunking == 'semantic_sentence_chunk':
+        return semantic_sentence_spans
+    else:
+        raise ValueError('Invalid chunking strategy provided')
 
 
-def validate_overlap(overlap : str = 'semantic_sentence_overlap') -> str:
+def validate_overlap(overlap : str = 'semantic_sentence_overlap') -> Callable[..., str]:
     if overlap == 'fixed_size_overlap':
-        overlap = fixed_size_overlap
+        return fixed_size_overlap
+    elif overlap == 'token_overlap':
+        return token_overlap
     elif overlap == 'sentence_overlap':
-        overlap = sentence_overlap
+        return sentence_overlap
     elif overlap == 'paragraph_overlap':
-        overlap = paragraph_overlap
+        return paragraph_overlap
     elif overlap == 'semantic_sentence_overlap':
-        overlap = semantic_sentence_overlap
+        return semantic_sentence_overlap
     else:
-        raise 'Invalid overlap argument provided'
+        raise ValueError('Invalid overlap argument provided')
     
     
-def overlap(chunks : list[str], overlap_type : str = 'semantic_sentence_overlap', overlap_size : int = 100):
-    overlap_iter = validate_overlap(overlap_type)
-    i = 0
-    j = 1
-    overlapped_chunks = []
+def iter_overlap(chunks : Iterable[str],
+                 overlap_type : str = 'semantic_sentence_overlap',
+                 overlap_size : Optional[int] = None,
+                 keep_first : bool = False) -> Iterator[str]:
+    """
+    Streaming version of overlap().
+
+    Consumes chunks lazily and holds only the previous chunk, so it can sit
+    directly behind iter_parse() without materialising the chunk list.
+    """
+    overlap_fn = instrument.wrap('overlap', validate_overlap(overlap_type))
+    kwargs = {} if overlap_size is None else {'overlap_size': overlap_size}
+    previous = None
+    for current in chunks:
+        if previous is not None:
+            yield overlap_fn(previous, current, **kwargs)
+        elif keep_first:
+            yield current
+        previous = current
+
+
+def overlap(chunks : list[str],
+            overlap_type : str = 'semantic_sentence_overlap',
+            overlap_size : Optional[int] = None,
+            keep_first : bool = False) -> List[str]:
+    """
+    Prefix every chunk after the first with the tail of the chunk before it.
 
-    while j < len(chunks):
-        text = semantic_sentence_overlap(chunks[i], chunks[j])
-        i += 1
-        j += 1
-        overlapped_chunks.append(text)
-    return overlapped_chunks
+    Args:
+        chunks: Chunks in document order
+        overlap_type: Name of a function in dvx.utils.overlap
+        overlap_size: Size of the overlap in that function's unit (characters,
+            tokens, sentences or paragraphs); defaults to the function's own default
+        keep_first: Also return the first chunk, unchanged, ahead of the
+            overlapped ones; otherwise only its tail reaches the output
+
+    Returns:
+        List[str]: One chunk per adjacent pair of input chunks, plus the first
+        chunk if keep_first is set
+    """
+    return list(iter_overlap(chunks, overlap_type = overlap_type, overlap_size = overlap_size,
+                             keep_first = keep_first))
 
 
 def read_document(path : str) -> str:
     if path.endswith('pdf'):
-        content = read_pdf(path)
-
+        reader = read_pdf
     elif path.endswith('docx'):
-        content = read_docx(path)
+        reader = read_docx
     elif path.endswith('txt'):
-        content = read_txt(path)
+        reader = read_txt
     else:
-        raise 'Invalid document provided.'
+        raise ValueError('Invalid document provided.')
+    if instrument.is_enabled():
+        instrument.count('bytes', os.path.getsize(path))
+    with instrument.stage('read', path = path):
+        content = reader(path)
     return content
 
 
-def parse(folder_path : str, chunking : str = 'semantic_sentence_chunk'):
-    validate_chunking(chunking)
+class ParseResult(NamedTuple):
+    """Chunks produced from one file, or the error that stopped it"""
+    path: str
+    chunks: List[str]
+    error: Optional[str] = None
 
+
+def list_files(folder_path : str) -> List[str]:
+    """Walk folder_path and return every file in a deterministic, sorted order"""
     file_list = []
-    for root, _, files in os.walk(folder_path):
-        for file in files:
+    for root, dirs, files in os.walk(folder_path):
+        dirs.sort()
+        for file in sorted(files):
             file_list.append(os.path.join(root, file))
-    
-    folder_chunks = []
-    for path in file_list:
+    return file_list
+
+
+def parse_file(path : str, chunking : str = 'semantic_sentence_chunk') -> ParseResult:
+    """Read and chunk a single file, capturing any error instead of raising it"""
+    instrument.count('files')
+    try:
         content = read_document(path)
-        chunks = chunk(content, chunking = chunking)
-        folder_chunks.extend(chunks)
+        return ParseResult(path, chunk(content, chunking = chunking))
+    except Exception as e:
+        instrument.count('errors')
+        return ParseResult(path, [], f'{type(e).__name__}: {e}')
+
+
+def _parse_batch(file_list : List[str],
+                 chunking : str,
+                 options : Optional[Dict[str, Any]] = None) -> Tuple[List[ParseResult], Optional[Dict[str, Any]]]:
+    """Parse a batch in a worker process, collecting instrumentation there when the parent has it enabled"""
+    if options is None:
+        return [parse_file(path, chunking) for path in file_list], None
+    with instrument.collect(**options) as stats:
+        results = [parse_file(path, chunking) for path in file_list]
+    return results, stats.to_dict()
 
-    return folder_chunks
+
+def iter_parse_files(file_list : Iterable[str],
+                     chunking : str = 'semantic_sentence_chunk',
+                     workers : Optional[int] = 1,
+                     chunksize : int = 1) -> Iterator[ParseResult]:
+    """
+    Read and chunk many files, yielding each result as soon as it is ready.
+
+    Results are yielded in the order of file_list. With several workers only a
+    bounded window of batches is in flight at once, so memory stays flat no
+    matter how many files there are.
+
+    Args:
+        file_list: Paths of the files to parse
+        chunking: Chunking strategy applied to each file
+        workers: Number of worker processes; 1 parses in this process, None uses every CPU
+        chunksize: Number of files handed to a worker at a time
+    """
+    validate_chunking(chunking)
+    if workers == 1:
+        for path in file_list:
+            yield parse_file(path, chunking)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    paths = iter(file_list)
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            while len(pending) < 2 * workers:
+                batch = list(islice(paths, chunksize))
+                if not batch:
+                    break
+                pending.append(executor.submit(_parse_batch, batch, chunking, instrument.options()))
+            if not pending:
+                break
+            results, stats = pending.popleft().result()
+            if stats is not None:
+                instrument.stats().merge(stats)
+            yield from results
+
+
+def parse_files(file_list : List[str],
+                chunking : str = 'semantic_sentence_chunk',
+                workers : Optional[int] = 1,
+                chunksize : int = 1) -> List[ParseResult]:
+    """
+    Read and chunk many files, optionally spreading them across worker processes.
+
+    See iter_parse_files() for the arguments.
+
+    Returns:
+        List[ParseResult]: One result per file, in the same order as file_list
+    """
+    return list(iter_parse_files(file_list, chunking, workers = workers, chunksize = chunksize))
+
+
+def iter_parse(folder_path : str,
+               chunking : str = 'semantic_sentence_chunk',
+               workers : Optional[int] = 1,
+               chunksize : int = 1,
+               manifest : Optional[Manifest] = None,
+               store : Optional['VectorStore'] = None) -> Iterator[Tuple[str, str]]:
+    """
+    Streaming version of parse() that yields (path, chunk) pairs as each file finishes.
+
+    Files that fail to parse are reported and skipped rather than aborting the run.
+    With a manifest, only new or changed files are parsed; files deleted since
+    the last run are reported and forgotten. If a store is given, the chunks
+    of deleted and changed files are purged from it, so re-ingesting a changed
+    file does not leave its old chunks behind. Each file is recorded with the
+    fingerprint taken before it was parsed, and the manifest is saved once the
+    generator is exhausted.
+    """
+    file_list = list_files(folder_path)
+    if manifest is not None:
+        diff = manifest.scan(file_list, root = folder_path)
+        for path in diff.deleted:
+            print(f'Document {path} was deleted since the last run')
+        if store is not None:
+            store.purge(diff.deleted + diff.changed)
+        manifest.forget(diff.deleted)
+        file_list = diff.pending
+
+    for result in iter_parse_files(file_list, chunking, workers = workers, chunksize = chunksize):
+        if result.error is not None:
+            print(f'Failed to parse {result.path}: {result.error}')
+            continue
+        if manifest is not None:
+            fingerprint = diff.fingerprints[result.path]
+            manifest.record(result.path, fingerprint.id, fingerprint.stat)
+        for text in result.chunks:
+            yield result.path, text
+
+    if manifest is not None:
+        manifest.save()
+
+
+def parse(folder_path : str,
+          chunking : str = 'semantic_sentence_chunk',
+          workers : Optional[int] = 1,
+          chunksize : int = 1,
+          manifest : Optional[Manifest] = None,
+          store : Optional['VectorStore'] = None):
+    """
+    Chunk every document under folder_path.
+
+    Files that fail to parse are reported and skipped rather than aborting the run.
+    See iter_parse_files() for the workers and chunksize arguments and
+    iter_parse() for incremental runs with a manifest.
+    """
+    with instrument.stage('parse', folder = folder_path):
+        return [text for _, text in iter_parse(folder_path, chunking, workers = workers, chunksize = chunksize,
+                                               manifest = manifest, store = store)]
+
+
+
+def parse_table(folder_path : str,
+                chunking : str = 'semantic_sentence_chunk',
+                table : Optional[ChunkTable] = None) -> ChunkTable:
+    """
+    Chunk every document under folder_path into a ChunkTable keyed by path.
+
+    Chunks are kept as offsets into each document's text instead of as
+    separate strings. Files that fail to parse are reported and skipped.
+
+    Args:
+        folder_path: Folder to walk
+        chunking: Chunking strategy, as for parse()
+        table: Existing table to append to
+    """
+    spans_fn = validate_spans(chunking)
+    table = table if table is not None else ChunkTable()
+    for path in list_files(folder_path):
+        instrument.count('files')
+        try:
+            content = read_document(path)
+            with instrument.stage('chunk', chunking = chunking):
+                spans = spans_fn(content)
+        except Exception as e:
+            instrument.count('errors')
+            print(f'Failed to parse {path}: {type(e).__name__}: {e}')
+            continue
+        table.add(content, spans, doc_id = path)
+        instrument.count('chunks', len(spans))
+    return table
 
 
 
@@ -108,14 +346,3 @@ chunks = chunk(content, chunking = 'semantic_sentence_chunk')
 print(f"Total Chunks: {len(chunks)}\n")
 for idx, chunk in enumerate(chunks, start=1):
     print(f"Chunk {idx}:\n\n{chunk}\n")"""
-
-
-folder_path = 'data'
-chunking = 'paragraph_based_chunk'
-chunks = parse(folder_path, chunking = chunking)
-print(f"Total Chunks: {len(chunks)}\n")
-overlap_type = 'semantic_sentence_overlap'
-chunks = overlap(chunks, overlap_type=overlap_type)
-print(f"Total Chunks: {len(chunks)}\n")
-#for idx, chunk in enumerate(chunks, start=1):
- #   print(f"Chunk {idx}:\n\n{chunk}\n")
\ No newline at end of file
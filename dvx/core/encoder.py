@@ -1,10 +1,82 @@
 from abc import ABC, abstractmethod
+from typing import Optional, Sequence
 import numpy as np
+from dvx.utils.cache import EmbeddingCache
 
 class BaseEncoder(ABC):
     """Abstract base class for different embedding models"""
+
+    @property
+    def model_id(self) -> str:
+        """Identifier of the model and its settings, used to key cached embeddings"""
+        return type(self).__name__
     
     @abstractmethod
     def encode(self, text: str) -> np.ndarray:
         """Convert text to vector embedding"""
         pass
+
+    def _encode_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """Encode one batch; override this for models that can vectorise over a batch"""
+        return np.stack([self.encode(text) for text in texts])
+
+    def encode_batch(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Convert many texts to vector embeddings.
+
+        Args:
+            texts: Texts to encode
+            batch_size: Number of texts passed to the model at a time
+
+        Returns:
+            np.ndarray: Embeddings of shape (len(texts), dim)
+        """
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.concatenate([self._encode_batch(texts[i:i + batch_size])
+                               for i in range(0, len(texts), batch_size)])
+
+
+class CachedEncoder(BaseEncoder):
+    """
+    Wraps an encoder with a content-addressed embedding cache
+
+    Only texts missing from the cache are sent to the wrapped encoder, each
+    distinct text once per batch, and their embeddings are stored for reuse.
+
+    Args:
+        encoder: Encoder to wrap
+        cache: Cache to use; defaults to an in-memory EmbeddingCache
+    """
+
+    def __init__(self, encoder: BaseEncoder, cache: Optional[EmbeddingCache] = None) -> None:
+        self.encoder = encoder
+        self.cache = cache if cache is not None else EmbeddingCache()
+
+    @property
+    def model_id(self) -> str:
+        return self.encoder.model_id
+
+    def encode(self, text: str) -> np.ndarray:
+        return self.encode_batch([text])[0]
+
+    def encode_batch(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        texts = list(texts)
+        model_id = self.model_id
+        keys = [EmbeddingCache.key(model_id, text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        missing = {}
+        for key, text, vector in zip(keys, texts, cached):
+            if vector is None and key not in missing:
+                missing[key] = text
+        if missing:
+            encoded = self.encoder.encode_batch(list(missing.values()), batch_size=batch_size)
+            self.cache.put_many(list(missing), encoded)
+            fresh = dict(zip(missing, encoded))
+            cached = [vector if vector is not None else fresh[key] for key, vector in zip(keys, cached)]
+
+        if not cached:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack(cached).astype(np.float32, copy=False)
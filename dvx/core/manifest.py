@@ -0,0 +1,141 @@
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import hashlib
+import json
+import os
+
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    """Return the hex BLAKE2b digest of a file's contents, read in blocks"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Fingerprint(NamedTuple):
+    """Content hash and stat of a file, taken together before it is processed"""
+    id: str
+    stat: os.stat_result
+
+
+class ManifestDiff(NamedTuple):
+    """Files found by Manifest.scan(), grouped by what happened since the last run"""
+    new: List[str]
+    changed: List[str]
+    unchanged: List[str]
+    deleted: List[str]
+    fingerprints: Dict[str, Fingerprint]
+
+    @property
+    def pending(self) -> List[str]:
+        """Files that need to be (re-)processed"""
+        return self.new + self.changed
+
+
+class Manifest:
+    """
+    Persisted record of processed files, keyed by path
+
+    Each entry holds the file's content hash (used as its stable id) and the
+    filesystem mtime and size seen when it was last processed. A file whose
+    mtime and size are unchanged is skipped without being read; otherwise it
+    is re-hashed and only counts as changed if its contents differ.
+
+    A manifest tracks one stage, so give each consumer (e.g. parse and
+    generate_metadata) its own file.
+
+    Args:
+        path: JSON file to load from and save to, or None to keep it in memory
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def load(self) -> None:
+        with open(self.path, 'r', encoding='utf-8') as file:
+            self.entries = json.load(file)
+
+    def save(self) -> None:
+        """Write the manifest atomically, so a crash never leaves a truncated file"""
+        if self.path is None:
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.entries, file)
+        os.replace(tmp_path, self.path)
+
+    def get_id(self, path: str) -> Optional[str]:
+        entry = self.entries.get(path)
+        return entry['id'] if entry else None
+
+    def _status(self, path: str, stat: os.stat_result) -> Tuple[str, Optional[str]]:
+        """Status of path and, if it had to be read, its content hash"""
+        entry = self.entries.get(path)
+        if entry is None:
+            return 'new', file_hash(path)
+        if entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            return 'unchanged', None
+        id = file_hash(path)
+        if id == entry['id']:
+            # Touched but not modified; remember the new mtime so the next scan is cheap
+            entry['mtime'] = stat.st_mtime
+            return 'unchanged', id
+        return 'changed', id
+
+    def scan(self,
+             file_list: Iterable[str],
+             root: Optional[str] = None,
+             stats: Optional[Dict[str, os.stat_result]] = None) -> ManifestDiff:
+        """
+        Compare file_list against the manifest.
+
+        Nothing is recorded, except that files which were touched without
+        changing have their stored mtime refreshed. New and changed files
+        are hashed here, before they are processed, and their fingerprints
+        are returned for record(): a file modified while it is processed
+        then keeps its old hash and is picked up again by the next scan.
+
+        Args:
+            file_list: Paths currently present
+            root: If given, only entries under this folder can be reported as deleted
+            stats: Optional precomputed stat results keyed by path
+        """
+        diff = ManifestDiff([], [], [], [], {})
+        stats = stats or {}
+        seen = set()
+        for path in file_list:
+            seen.add(path)
+            stat = stats.get(path) or os.stat(path)
+            status, id = self._status(path, stat)
+            getattr(diff, status).append(path)
+            if status != 'unchanged':
+                diff.fingerprints[path] = Fingerprint(id, stat)
+        prefix = os.path.join(root, '') if root is not None else ''
+        diff.deleted.extend(path for path in self.entries if path not in seen and path.startswith(prefix))
+        return diff
+
+    def record(self, path: str, id: Optional[str] = None, stat: Optional[os.stat_result] = None) -> str:
+        """
+        Record path as processed and return its content-hash id.
+
+        Pass the id and stat of the fingerprint taken by scan(); without them
+        the file is stat'ed and hashed in its current state.
+        """
+        stat = stat or os.stat(path)
+        id = id or file_hash(path)
+        self.entries[path] = {'id': id, 'mtime': stat.st_mtime, 'size': stat.st_size}
+        return id
+
+    def forget(self, paths: Iterable[str]) -> List[str]:
+        """Drop paths from the manifest and return the ids they had"""
+        return [self.entries.pop(path)['id'] for path in paths if path in self.entries]
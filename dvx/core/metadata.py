@@ -1,15 +1,62 @@
-from typing import Dict, Any
-import pandas as pd
+from typing import TYPE_CHECKING, Dict, Any, Iterable, List, Optional
 import os
-from datetime import datetime
 import uuid
+from datetime import datetime
+from .manifest import Manifest
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 class DocumentMetaData:
-    """Base document meta class to infer the metadata of the document"""
+    """
+    Base document meta class to infer the metadata of the document
+
+    Rows are appended to per-column lists and indexed by path and id, so adding
+    n files is linear. The DataFrame view is only built when df is read.
+
+    'created_on' is the file's birth time where the platform records one
+    (st_birthtime on macOS, BSD and Windows). Elsewhere, notably on Linux,
+    it falls back to st_ctime, which is the time the inode last changed
+    rather than when the file was created.
+
+    'id' is the file's content hash when generate_metadata() runs with a
+    manifest, which has already hashed the file; otherwise it is a random
+    UUID, so adding metadata never reads file contents.
+    """
     def __init__(self):
         self.columns = ['id', 'path', 'created_on', 'modified_on', 'size', 'title']
-        self.df = pd.DataFrame(columns=self.columns)
+        self._clear()
+
+    def _clear(self) -> None:
+        self._data: Dict[str, List[Any]] = {column: [] for column in self.columns}
+        self._alive: List[bool] = []
+        self._path_index: Dict[str, int] = {}
+        self._id_index: Dict[str, List[int]] = {}
+        self._df: Optional['pd.DataFrame'] = None
+
+    @property
+    def df(self) -> 'pd.DataFrame':
+        if self._df is None:
+            import pandas as pd
+            if all(self._alive):
+                data = self._data
+            else:
+                rows = [i for i, alive in enumerate(self._alive) if alive]
+                data = {column: [values[i] for i in rows] for column, values in self._data.items()}
+            self._df = pd.DataFrame(data, columns=self.columns)
+        return self._df
+
+    @df.setter
+    def df(self, df: 'pd.DataFrame') -> None:
+        self._clear()
+        self._append(df[self.columns].to_dict('records'))
+
+    def __len__(self) -> int:
+        return len(self._path_index)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._path_index
 
     def _parse_doc_type(self, path: str) -> str:
         if self._check_txt(path):
@@ -33,43 +80,129 @@ class DocumentMetaData:
     def _create_id(self, path: str) -> str:
         return str(uuid.uuid4())
 
-    def _get_datetime(self) -> str:
-        return datetime.now().isoformat()
+    def _get_datetime(self, timestamp: Optional[float] = None) -> str:
+        if timestamp is None:
+            return datetime.now().isoformat()
+        return datetime.fromtimestamp(timestamp).isoformat()
 
-    def _create_metadata(self, path: str) -> Dict[str, Any]:
-        file_size = os.path.getsize(path) / (1024 * 1024)
+    def _created_timestamp(self, stat: os.stat_result) -> float:
+        return getattr(stat, 'st_birthtime', stat.st_ctime)
+
+    def _create_metadata(self, path: str, id: Optional[str] = None, stat: Optional[os.stat_result] = None) -> Dict[str, Any]:
+        stat = stat or os.stat(path)
+        file_size = stat.st_size / (1024 * 1024)
         file_name = os.path.basename(path)
         title, _ = os.path.splitext(file_name)
 
         return {
-            'id': self._create_id(path),
+            'id': id or self._create_id(path),
             'path': path,
-            'created_on': self._get_datetime(),
-            'modified_on': self._get_datetime(),
+            'created_on': self._get_datetime(self._created_timestamp(stat)),
+            'modified_on': self._get_datetime(stat.st_mtime),
             'size': file_size,
             'title': title
         }
-    
-    def add_meta(self, path : str) -> None:
-        if path not in self.df['path'].values:
+
+    def _append(self, records: Iterable[Dict[str, Any]]) -> None:
+        for record in records:
+            row = len(self._alive)
+            for column in self.columns:
+                self._data[column].append(record[column])
+            self._alive.append(True)
+            self._path_index[record['path']] = row
+            self._id_index.setdefault(record['id'], []).append(row)
+        self._df = None
+
+    def add_many(self,
+                 paths : Iterable[str],
+                 ids : Optional[Iterable[Optional[str]]] = None,
+                 stats : Optional[Dict[str, os.stat_result]] = None) -> int:
+        """
+        Add metadata for many documents at once, skipping paths already present.
+
+        Args:
+            paths: Document paths
+            ids: Optional precomputed ids, aligned with paths
+            stats: Optional precomputed stat results keyed by path
+
+        Returns:
+            int: Number of documents added
+        """
+        paths = list(paths)
+        ids = list(ids) if ids is not None else [None] * len(paths)
+        stats = stats or {}
+        records = []
+        for path, id in zip(paths, ids):
+            if path in self._path_index:
+                print(f'The document {path} already exists in the database')
+                continue
             self.path = path
             self.type = self._parse_doc_type(path)
-            meta_data = self._create_metadata(path)
-            self.df = pd.concat([self.df, pd.DataFrame([meta_data])])
-        else:
-            print(f'The document {path} already exists in the database')
+            records.append(self._create_metadata(path, id, stats.get(path)))
+        self._append(records)
+        return len(records)
+
+    def add_meta(self, path : str, id : Optional[str] = None) -> None:
+        self.add_many([path], [id])
+
+    def remove_meta(self, path : str) -> None:
+        row = self._path_index.pop(path, None)
+        if row is None:
+            return
+        self._alive[row] = False
+        rows = self._id_index[self._data['id'][row]]
+        rows.remove(row)
+        if not rows:
+            del self._id_index[self._data['id'][row]]
+        self._df = None
 
     def get_meta(self, idx: int) -> Dict[str, Any]:
         return self.df.iloc[idx].to_dict()
+
+    def get_by_path(self, path: str) -> Optional[Dict[str, Any]]:
+        row = self._path_index.get(path)
+        if row is None:
+            return None
+        return {column: self._data[column][row] for column in self.columns}
+
+    def get_by_id(self, id: str) -> List[Dict[str, Any]]:
+        """Rows with the given id; with a manifest, files with identical contents share an id"""
+        return [{column: self._data[column][row] for column in self.columns} for row in self._id_index.get(id, [])]
     
 
-def generate_metadata(folder_path : str, metadoc : DocumentMetaData = None) -> DocumentMetaData:
+def generate_metadata(folder_path : str,
+                      metadoc : DocumentMetaData = None,
+                      manifest : Optional[Manifest] = None) -> DocumentMetaData:
+    """
+    Add metadata for every document in folder_path.
+
+    With a manifest, unchanged files are not read again, changed files have
+    their row replaced, rows of files deleted since the last run are dropped,
+    and the manifest is saved afterwards. Unchanged files missing from
+    metadoc, e.g. in a new process, get their row rebuilt from their stat
+    and the id stored in the manifest.
+    """
     if metadoc == None:
         metadoc = DocumentMetaData()
-    for file in os.listdir(folder_path):
-        if file.endswith('.txt') or file.endswith('.pdf') or file.endswith('.docx'):
-            file_path = os.path.join(folder_path, file)
-            metadoc.add_meta(file_path) 
+    stats = {}
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.name.endswith('.txt') or entry.name.endswith('.pdf') or entry.name.endswith('.docx'):
+                stats[entry.path] = entry.stat()
+
+    if manifest is None:
+        metadoc.add_many(list(stats), stats = stats)
+        return metadoc
+
+    diff = manifest.scan(stats, root = folder_path, stats = stats)
+    for file_path in diff.changed + diff.deleted:
+        metadoc.remove_meta(file_path)
+    ids = [manifest.record(file_path, *diff.fingerprints[file_path]) for file_path in diff.pending]
+    missing = [file_path for file_path in diff.unchanged if file_path not in metadoc]
+    ids += [manifest.get_id(file_path) for file_path in missing]
+    metadoc.add_many(diff.pending + missing, ids, stats = stats)
+    manifest.forget(diff.deleted)
+    manifest.save()
 
     return metadoc
 
@@ -1,8 +1,333 @@
-from typing import Dict, List, Any
+from typing import Dict, Iterable, List, Any, Optional, Sequence, Tuple
+import json
+import os
+import warnings
+import numpy as np
 from .document import Document
+from .metadata import DocumentMetaData
+from dvx.index.base import BaseIndex, INDEX_META, load_index
+from dvx.store.bitmap import MetadataIndex
+from dvx.store.wal import WriteAheadLog
+from dvx.utils.arrays import as_vectors
+
 
 class VectorStore:
-    """Base vector store implementation"""
-    
-    def __init__(self):
+    """
+    Base vector store implementation
+
+    Documents are keyed by their string id. Each document added with
+    upsert() gets an integer label, which is its id in the vector index and
+    never changes or gets reused, so updating a document replaces its vector
+    in place. Metadata filters passed to search() are resolved to a set of
+    labels with a MetadataIndex first, and only those vectors are scored.
+
+    A store created with VectorStore.open() is durable: every upsert and
+    delete is logged before it returns, vectors go to a SegmentedIndex and
+    checkpoint() snapshots the documents, so nothing acknowledged is lost
+    in a crash and no write rewrites the whole index.
+
+    Args:
+        index: Vector index; a cosine FlatIndex is created on the first upsert if omitted
+        metadata: Optional metadata table whose rows, looked up by the
+            document's 'path', are indexed for filtering along with the
+            document's own metadata
+    """
+
+    def __init__(self, index: Optional[BaseIndex] = None, metadata: Optional[DocumentMetaData] = None):
+        self.index = index
+        self.metadata = metadata
         self.documents: Dict[str, Document] = {}
+        self.labels: Dict[str, int] = {}
+        self.filters = MetadataIndex()
+        self._ids: Dict[int, str] = {}
+        self._next_label = 0
+        self.path: Optional[str] = None
+        self._log: Optional[WriteAheadLog] = None
+        self._index_options: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _record(self, document: Document) -> Dict[str, Any]:
+        record = {}
+        if self.metadata is not None and 'path' in document.metadata:
+            record.update(self.metadata.get_by_path(document.metadata['path']) or {})
+        record.update(document.metadata)
+        return record
+
+    def upsert(self, documents: Sequence[Document], vectors: np.ndarray) -> np.ndarray:
+        """
+        Insert or replace documents and their vectors in one batch.
+
+        A document whose id is already stored keeps its label and has its
+        text, metadata and vector replaced. If an id occurs more than once in
+        the batch, the last occurrence wins.
+
+        Args:
+            documents: Documents to store
+            vectors: Array of shape (len(documents), dim)
+
+        Returns:
+            np.ndarray: Label of each document, aligned with documents
+        """
+        vectors = np.asarray(vectors)
+        if vectors.ndim != 2 or len(vectors) != len(documents):
+            raise ValueError('vectors must have shape (len(documents), dim)')
+        if self.index is not None:
+            vectors = as_vectors(vectors, self.index.dim)
+
+        # Labels are assigned aside, and the store only changes once the index has taken the vectors and
+        # the metadata has been parsed for filtering, so a rejected batch leaves it as it was
+        labels = np.empty(len(documents), dtype=np.int64)
+        new_labels: Dict[str, int] = {}
+        next_label = self._next_label
+        for i, document in enumerate(documents):
+            label = self.labels.get(document.id, new_labels.get(document.id))
+            if label is None:
+                label = new_labels[document.id] = next_label
+                next_label += 1
+            labels[i] = label
+
+        # Keep only the last occurrence of each label
+        _, last = np.unique(labels[::-1], return_index=True)
+        keep = np.sort(len(labels) - 1 - last)
+        entries = self.filters.parse([self._record(documents[i]) for i in keep.tolist()])
+
+        if self.index is None and self.path is not None:
+            from dvx.store.segments import SegmentedIndex
+            self.index = SegmentedIndex(os.path.join(self.path, 'index'), vectors.shape[1], **self._index_options)
+        elif self.index is None:
+            from dvx.index.flat import FlatIndex
+            self.index = FlatIndex(vectors.shape[1])
+        self.index.replace(labels[keep], vectors[keep])
+
+        self._next_label = next_label
+        for id, label in new_labels.items():
+            self.labels[id] = label
+            self._ids[label] = id
+        for i in keep.tolist():
+            self.documents[documents[i].id] = documents[i]
+        self.filters.add_entries(labels[keep], entries)
+        # The vectors are already logged by the index, old and new in one record; a crash before this line
+        # leaves unreferenced labels, which open() removes again
+        if self._log is not None:
+            self._log.append(json.dumps({'op': 'upsert', 'next_label': self._next_label,
+                                         'documents': [self._document_record(documents[i])
+                                                       for i in keep.tolist()]}, default=str).encode('utf-8'))
+        return labels
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """Remove documents and their vectors by id and return how many were removed"""
+        ids = list(ids)
+        if self._log is not None:
+            self._log.append(json.dumps({'op': 'delete', 'ids': ids}).encode('utf-8'))
+        removed = 0
+        labels = []
+        for id in ids:
+            if self.documents.pop(id, None) is None:
+                continue
+            removed += 1
+            label = self.labels.pop(id, None)
+            if label is not None:
+                del self._ids[label]
+                labels.append(label)
+        if labels:
+            if self.index is not None:
+                self.index.remove(np.asarray(labels, dtype=np.int64))
+            self.filters.remove(labels)
+        return removed
+
+    def purge(self, paths: List[str]) -> List[str]:
+        """Remove every document whose metadata 'path' is in paths and return their ids"""
+        paths = set(paths)
+        removed = [id for id, document in self.documents.items() if document.metadata.get('path') in paths]
+        self.delete(removed)
+        return removed
+
+    def select(self, **filters: Any) -> Optional[List[str]]:
+        """Ids of the documents matching metadata filters, or None when no filter is given"""
+        labels = self.filters.select(**filters)
+        if labels is None:
+            return None
+        return [self._ids[label] for label in labels.tolist()]
+
+    def search(self, queries: np.ndarray, k: int = 10, **filters: Any) -> List[List[Tuple[Document, float]]]:
+        """
+        Find the k best documents for each query vector, optionally filtered by metadata.
+
+        Args:
+            queries: Array of shape (n, dim) or (dim,)
+            k: Number of results per query
+            **filters: Conditions accepted by MetadataIndex.select(), e.g.
+                doc_type='pdf', path_prefix='data/tenant', modified_after='2024-01-01'
+
+        Returns:
+            List[List[Tuple[Document, float]]]: (document, score) pairs per query, best first
+        """
+        queries = np.asarray(queries)
+        n_queries = 1 if queries.ndim == 1 else len(queries)
+        subset = self.filters.select(**filters) if filters else None
+        if self.index is None or (subset is not None and not len(subset)):
+            return [[] for _ in range(n_queries)]
+
+        labels, scores = self.index.search(queries, k, subset=subset)
+        return [[(self.documents[self._ids[label]], score)
+                 for label, score in zip(row_labels.tolist(), row_scores.tolist()) if label >= 0]
+                for row_labels, row_scores in zip(labels, scores)]
+
+    def save(self, path: str) -> None:
+        """
+        Write the store to the directory at path.
+
+        The index goes to path/index in its own binary format and the
+        documents, with their labels, to a JSON-lines sidecar,
+        path/documents.jsonl.
+        """
+        os.makedirs(path, exist_ok=True)
+        if self.index is not None:
+            self.index.save(os.path.join(path, 'index'))
+        self._write_documents(path)
+
+    def _document_record(self, document: Document) -> Dict[str, Any]:
+        return {'id': document.id, 'text': document.text, 'metadata': document.metadata,
+                'label': self.labels.get(document.id)}
+
+    def _write_documents(self, path: str, sync: bool = False) -> None:
+        # Written to temporary files and renamed into place, so a crash leaves the previous snapshot intact
+        for name, lines in (('documents.jsonl', (json.dumps(self._document_record(document), default=str)
+                                                 for document in self.documents.values())),
+                            ('store.json', [json.dumps({'next_label': self._next_label})])):
+            target = os.path.join(path, name)
+            with open(target + '.tmp', 'w', encoding='utf-8') as file:
+                for line in lines:
+                    file.write(line + '\n')
+                file.flush()
+                if sync:
+                    os.fsync(file.fileno())
+            os.replace(target + '.tmp', target)
+
+    def _read_documents(self, path: str) -> None:
+        with open(os.path.join(path, 'documents.jsonl'), 'r', encoding='utf-8') as file:
+            for line in file:
+                self._load_document(json.loads(line))
+        store_meta = os.path.join(path, 'store.json')
+        if os.path.exists(store_meta):
+            with open(store_meta, 'r', encoding='utf-8') as file:
+                self._next_label = json.load(file)['next_label']
+        else:
+            self._next_label = max(self._ids, default=-1) + 1
+
+    def _load_document(self, record: Dict[str, Any]) -> None:
+        document = Document(record['id'], record['text'], record['metadata'])
+        self.documents[document.id] = document
+        label = record.get('label')
+        if label is not None:
+            self.labels[document.id] = label
+            self._ids[label] = document.id
+
+    def _index_filters(self) -> None:
+        labels = list(self._ids)
+        self.filters.add(labels, [self._record(self.documents[self._ids[label]]) for label in labels])
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, metadata: Optional[DocumentMetaData] = None) -> 'VectorStore':
+        """Read a store written by save(), memory-mapping the index arrays when mmap is True"""
+        index_path = os.path.join(path, 'index')
+        index = load_index(index_path, mmap=mmap) if os.path.isdir(index_path) else None
+        store = cls(index, metadata=metadata)
+        store._read_documents(path)
+        store._index_filters()
+        return store
+
+    @classmethod
+    def open(cls,
+             path: str,
+             dim: Optional[int] = None,
+             metric: str = 'cosine',
+             metadata: Optional[DocumentMetaData] = None,
+             sync: bool = True,
+             **index_options: Any) -> 'VectorStore':
+        """
+        Open, or create, a durable store in the directory at path.
+
+        Vectors live in a SegmentedIndex at path/index and documents in a
+        snapshot, path/documents.jsonl, plus a write-ahead log,
+        path/documents.log, of every upsert and delete since the last
+        checkpoint(). Opening replays the log, so a store that was never
+        closed, e.g. after a crash, comes back with every acknowledged write.
+
+        Args:
+            path: Store directory, created if missing
+            dim: Vector dimension; if omitted for a new store, taken from the first upsert
+            metric: Similarity metric of a new index
+            metadata: Optional metadata table, as for VectorStore()
+            sync: fsync both logs after every write
+            **index_options: Passed to SegmentedIndex, e.g. flush_size or max_segments
+        """
+        from dvx.store.segments import SegmentedIndex
+        os.makedirs(path, exist_ok=True)
+        index_path = os.path.join(path, 'index')
+        index_options = dict(index_options, metric=metric, sync=sync)
+        index = None
+        if dim is not None or os.path.exists(os.path.join(index_path, INDEX_META)):
+            index = SegmentedIndex(index_path, dim, **index_options)
+        store = cls(index, metadata=metadata)
+        store.path = path
+        store._index_options = index_options
+        if os.path.exists(os.path.join(path, 'documents.jsonl')):
+            store._read_documents(path)
+
+        store._log = WriteAheadLog(os.path.join(path, 'documents.log'), sync)
+        for payload in store._log.replay():
+            record = json.loads(payload)
+            if record['op'] == 'upsert':
+                for document in record['documents']:
+                    store._load_document(document)
+                store._next_label = max(store._next_label, record['next_label'])
+            elif record['op'] == 'delete':
+                for id in record['ids']:
+                    if store.documents.pop(id, None) is not None:
+                        label = store.labels.pop(id, None)
+                        if label is not None:
+                            del store._ids[label]
+
+        # Labels written to the index by an upsert whose documents were never logged, or left there by a
+        # logged delete, belong to no document
+        if store.index is not None:
+            labels = store.index.ids
+            orphans = labels[~np.isin(labels, np.fromiter(store._ids, dtype=np.int64, count=len(store._ids)))]
+            if len(orphans):
+                store.index.remove(orphans)
+            store._next_label = max(store._next_label, int(labels.max(initial=-1)) + 1)
+            # The reverse cannot be repaired here: a document whose vector is gone stays out of search
+            # results until it is upserted again
+            present = set(labels.tolist())
+            missing = [id for label, id in store._ids.items() if label not in present]
+            if missing:
+                warnings.warn(f'{len(missing)} documents in {path} have no vector and must be upserted again, '
+                              f'e.g. {missing[:5]}')
+        store._index_filters()
+        return store
+
+    def checkpoint(self) -> None:
+        """Flush the index and snapshot the documents of a store opened with open(), then empty its log"""
+        if self._log is None:
+            raise RuntimeError('checkpoint() needs a store opened with VectorStore.open()')
+        if self.index is not None:
+            self.index.flush()
+        self._write_documents(self.path, sync=self._log.sync)
+        self._log.reset()
+
+    def close(self) -> None:
+        """Close the logs and stop background merging; a store opened with open() needs no save()"""
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        if self.index is not None and hasattr(self.index, 'close'):
+            self.index.close()
+
+    def __enter__(self) -> 'VectorStore':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
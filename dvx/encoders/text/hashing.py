@@ -0,0 +1,155 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import hashlib
+import re
+import zlib
+import numpy as np
+from dvx.core.encoder import BaseEncoder
+
+TOKEN_PATTERN = r'\b\w+\b'
+
+
+class HashingEncoder(BaseEncoder):
+    """
+    Feature-hashing text encoder that needs no model download
+
+    Tokens (and optionally n-grams of tokens) are hashed into n_features
+    buckets with CRC32, so the vocabulary never has to be stored and the cost
+    per text is linear in its length. Calling fit() on a sample corpus adds
+    TF-IDF weighting over the hashed buckets.
+
+    Args:
+        n_features: Dimension of the output vectors
+        ngram_range: Smallest and largest n-gram sizes to hash
+        lowercase: Whether to lowercase text before tokenizing
+        alternate_sign: Give each bucket a hash-derived sign so collisions tend to cancel
+        sublinear_tf: Replace a term count c with 1 + log(c)
+        norm: 'l2' to scale each vector to unit length, or None
+        token_pattern: Regular expression matching one token; the default
+            keeps single-character tokens such as digits and one-letter
+            identifiers, so texts differing only in those get different vectors
+    """
+
+    def __init__(self,
+                 n_features: int = 1024,
+                 ngram_range: Tuple[int, int] = (1, 1),
+                 lowercase: bool = True,
+                 alternate_sign: bool = True,
+                 sublinear_tf: bool = False,
+                 norm: Optional[str] = 'l2',
+                 token_pattern: str = TOKEN_PATTERN) -> None:
+        if norm not in ('l2', None):
+            raise ValueError("norm must be 'l2' or None")
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        self.lowercase = lowercase
+        self.alternate_sign = alternate_sign
+        self.sublinear_tf = sublinear_tf
+        self.norm = norm
+        self.token_pattern = token_pattern
+        self._token = re.compile(token_pattern)
+        self.idf: Optional[np.ndarray] = None
+        self._buckets: Dict[str, Tuple[int, float]] = {}
+
+    @property
+    def model_id(self) -> str:
+        model_id = (f'hashing-{self.n_features}-{self.ngram_range[0]}-{self.ngram_range[1]}-'
+                    f'{self.lowercase:d}{self.alternate_sign:d}{self.sublinear_tf:d}-{self.norm}-'
+                    f'{hashlib.blake2b(self.token_pattern.encode("utf-8"), digest_size=4).hexdigest()}')
+        if self.idf is not None:
+            model_id += '-' + hashlib.blake2b(self.idf.tobytes(), digest_size=8).hexdigest()
+        return model_id
+
+    @property
+    def dim(self) -> int:
+        return self.n_features
+
+    def _terms(self, text: str) -> List[str]:
+        if self.lowercase:
+            text = text.lower()
+        tokens = self._token.findall(text)
+        low, high = self.ngram_range
+        if low == high == 1:
+            return tokens
+        terms = tokens if low == 1 else []
+        for n in range(max(low, 2), high + 1):
+            terms.extend(' '.join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+
+    def _bucket(self, term: str) -> Tuple[int, float]:
+        bucket = self._buckets.get(term)
+        if bucket is None:
+            h = zlib.crc32(term.encode('utf-8'))
+            sign = -1.0 if self.alternate_sign and h & 0x80000000 else 1.0
+            bucket = (h % self.n_features, sign)
+            if len(self._buckets) >= 1 << 20:
+                self._buckets.clear()
+            self._buckets[term] = bucket
+        return bucket
+
+    def _hash(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Row, column and signed-count arrays of the hashed terms, with duplicate cells not yet summed"""
+        rows: List[int] = []
+        cols: List[int] = []
+        signs: List[float] = []
+        for row, text in enumerate(texts):
+            for term in self._terms(text):
+                col, sign = self._bucket(term)
+                rows.append(row)
+                cols.append(col)
+                signs.append(sign)
+        return (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64),
+                np.asarray(signs, dtype=np.float32))
+
+    def _weight(self, X: Any) -> Any:
+        """Apply sublinear tf and idf to a dense array or CSR matrix of summed counts, in place"""
+        values = X.data if hasattr(X, 'data') and not isinstance(X, np.ndarray) else X
+        if self.sublinear_tf:
+            nonzero = values != 0
+            values[nonzero] = np.sign(values[nonzero]) * (1 + np.log(np.abs(values[nonzero])))
+        if self.idf is not None:
+            if isinstance(X, np.ndarray):
+                X *= self.idf
+            else:
+                X.data *= self.idf[X.indices]
+        return X
+
+    def fit(self, texts: Sequence[str]) -> 'HashingEncoder':
+        """Learn smoothed inverse document frequencies of the hashed buckets from texts"""
+        rows, cols, _ = self._hash(texts)
+        present = np.unique(rows * self.n_features + cols) % self.n_features
+        df = np.bincount(present, minlength=self.n_features)
+        n = len(texts)
+        self.idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        return self
+
+    def encode(self, text: str) -> np.ndarray:
+        return self._encode_batch([text])[0]
+
+    def _encode_batch(self, texts: Sequence[str]) -> np.ndarray:
+        rows, cols, signs = self._hash(texts)
+        flat = np.bincount(rows * self.n_features + cols, weights=signs,
+                           minlength=len(texts) * self.n_features)
+        X = self._weight(flat.reshape(len(texts), self.n_features).astype(np.float32))
+        if self.norm == 'l2':
+            norms = np.sqrt(np.einsum('ij,ij->i', X, X))
+            norms[norms == 0] = 1.0
+            X /= norms[:, None]
+        return X
+
+    def encode_sparse(self, texts: Sequence[str]) -> Any:
+        """
+        Encode texts into a scipy.sparse CSR matrix of shape (len(texts), n_features).
+
+        Requires SciPy.
+        """
+        from scipy import sparse
+        rows, cols, signs = self._hash(texts)
+        X = sparse.csr_matrix((signs, (rows, cols)), shape=(len(texts), self.n_features), dtype=np.float32)
+        X.sum_duplicates()
+        X.eliminate_zeros()
+        X = self._weight(X)
+        if self.norm == 'l2':
+            norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+            norms[norms == 0] = 1.0
+            X = sparse.diags(1.0 / norms).dot(X).tocsr()
+        return X
@@ -1,5 +1,121 @@
 from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Tuple
+import importlib
+import json
+import os
+import numpy as np
+# Generic array helpers, re-exported from their old home for existing imports
+from dvx.utils.arrays import as_ids, as_subset, as_vectors, grow, in_subset
+from dvx.utils.similarity import METRICS, SIMILARITY_METRICS
+
 
 class BaseIndex(ABC):
-    """Abstract base class for index implementations"""
-    pass
+    """
+    Abstract base class for index implementations
+
+    Indexes map integer ids to fixed-size vectors. Search results are returned
+    as (ids, scores) arrays of shape (n_queries, k), best first; queries with
+    fewer than k results are padded with id -1. Passing subset restricts a
+    search to those ids, and only their vectors are scored where the index
+    structure allows it.
+    """
+
+    dim: int
+    metric: str
+
+    @abstractmethod
+    def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """Add a batch of vectors under the given ids"""
+        pass
+
+    @abstractmethod
+    def search(self, queries: np.ndarray, k: int = 10, subset: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the ids and scores of the k best vectors for each query, optionally among subset only"""
+        pass
+
+    @abstractmethod
+    def remove(self, ids: np.ndarray) -> int:
+        """Remove vectors by id and return how many were removed"""
+        pass
+
+    def replace(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """Add a batch of vectors, first removing any already stored under the same ids"""
+        self.remove(ids)
+        self.add(ids, vectors)
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    def save(self, path: str) -> None:
+        """Write the index to the directory at path"""
+        raise NotImplementedError(f'{type(self).__name__} does not support saving')
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'BaseIndex':
+        """
+        Read an index written by save().
+
+        With mmap=True the arrays are memory-mapped copy-on-write, so loading
+        is near-instant, processes opening the same files share their pages,
+        and later modifications stay private to this process.
+        """
+        raise NotImplementedError(f'{cls.__name__} does not support loading')
+
+
+INDEX_META = 'index.json'
+
+_INDEX_MODULES = {
+    'FlatIndex': 'dvx.index.flat',
+    'HNSWIndex': 'dvx.index.hnsw',
+    'IVFPQIndex': 'dvx.index.ivfpq',
+    'ShardedIndex': 'dvx.index.sharded',
+    'SegmentedIndex': 'dvx.store.segments',
+}
+
+
+def save_arrays(path: str, meta: Dict[str, Any], **arrays: np.ndarray) -> None:
+    """
+    Write arrays as .npy files plus an index.json sidecar describing them.
+
+    The sidecar is written last, so a directory without one is incomplete.
+    """
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(path, name + '.npy'), np.ascontiguousarray(array))
+    with open(os.path.join(path, INDEX_META), 'w', encoding='utf-8') as file:
+        json.dump(meta, file)
+
+
+def read_meta(path: str) -> Dict[str, Any]:
+    with open(os.path.join(path, INDEX_META), 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def load_array(path: str, name: str, mmap: bool = True) -> np.ndarray:
+    return np.load(os.path.join(path, name + '.npy'), mmap_mode='c' if mmap else None)
+
+
+def load_index(path: str, mmap: bool = True) -> BaseIndex:
+    """Load any index written by BaseIndex.save(), dispatching on its recorded type"""
+    kind = read_meta(path)['type']
+    if kind not in _INDEX_MODULES:
+        raise ValueError(f'Unknown index type: {kind}')
+    cls = getattr(importlib.import_module(_INDEX_MODULES[kind]), kind)
+    return cls.load(path, mmap=mmap)
+
+
+def validate_metric(metric: str) -> None:
+    if metric not in METRICS:
+        raise ValueError(f'Invalid metric. Must be one of {list(METRICS)}')
+
+
+def pad_results(ids: np.ndarray, scores: np.ndarray, k: int, metric: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Pad (n, j) result arrays with j <= k out to (n, k)"""
+    missing = k - ids.shape[1]
+    if missing <= 0:
+        return ids, scores
+    fill = -np.inf if metric in SIMILARITY_METRICS else np.inf
+    ids = np.pad(ids, ((0, 0), (0, missing)), constant_values=-1)
+    scores = np.pad(scores, ((0, 0), (0, missing)), constant_values=fill)
+    return ids, scores
@@ -1,5 +1,152 @@
-from .base import BaseIndex
+from typing import Dict, Optional, Tuple
+import numpy as np
+from .base import BaseIndex, load_array, pad_results, read_meta, save_arrays, validate_metric
+from dvx.utils.arrays import as_ids, as_subset, as_vectors, grow, in_subset
+from dvx.utils.similarity import normalize, squared_norms, pairwise_top_k
+
 
 class FlatIndex(BaseIndex):
-    """Simple flat index implementation"""
-    pass
+    """
+    Exact brute-force index over a contiguous float32 matrix
+
+    Args:
+        dim: Dimension of the indexed vectors
+        metric: Similarity metric to use ('dot_product', 'cosine', 'l1', 'l2')
+        capacity: Number of rows to preallocate
+        block_size: Number of stored rows scored at a time during search
+    """
+
+    def __init__(self, dim: int, metric: str = 'cosine', capacity: int = 1024, block_size: int = 16384) -> None:
+        validate_metric(metric)
+        self.dim = dim
+        self.metric = metric
+        self.block_size = block_size
+        self._size = 0
+        self._vectors = np.empty((capacity, dim), dtype=np.float32)
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._sq_norms = np.empty(capacity, dtype=np.float32)
+        self._row_map: Optional[Dict[int, int]] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, id: int) -> bool:
+        return int(id) in self._rows
+
+    @property
+    def _rows(self) -> Dict[int, int]:
+        # Built lazily so that loading a saved index does not walk every id
+        if self._row_map is None:
+            self._row_map = dict(zip(self.ids.tolist(), range(self._size)))
+        return self._row_map
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids[:self._size]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Stored vectors, row-aligned with ids (unit-normalised for 'cosine')"""
+        return self._vectors[:self._size]
+
+    def reconstruct(self, ids: np.ndarray) -> np.ndarray:
+        """Return the stored vectors for the given ids"""
+        rows = [self._rows[id] for id in as_ids(ids).tolist()]
+        return self._vectors[rows]
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """
+        Add a batch of vectors.
+
+        Args:
+            ids: Integer ids of shape (n,)
+            vectors: Array of shape (n, dim)
+        """
+        ids = as_ids(ids)
+        vectors = as_vectors(vectors, self.dim)
+        if len(ids) != len(vectors):
+            raise ValueError('ids and vectors must have the same length')
+        if len(np.unique(ids)) != len(ids) or any(int(i) in self._rows for i in ids):
+            raise ValueError('ids must be unique and not already in the index')
+
+        if self.metric == 'cosine':
+            vectors = normalize(vectors).astype(np.float32, copy=False)
+
+        start, end = self._size, self._size + len(ids)
+        self._vectors = grow(self._vectors, end)
+        self._ids = grow(self._ids, end)
+        self._sq_norms = grow(self._sq_norms, end)
+
+        self._vectors[start:end] = vectors
+        self._ids[start:end] = ids
+        self._sq_norms[start:end] = squared_norms(vectors)
+        self._rows.update(zip(ids.tolist(), range(start, end)))
+        self._size = end
+
+    def remove(self, ids: np.ndarray) -> int:
+        """Remove vectors by id, filling each hole with the last row. Unknown ids are ignored."""
+        removed = 0
+        for id in as_ids(ids).tolist():
+            row = self._rows.pop(id, None)
+            if row is None:
+                continue
+            last = self._size - 1
+            if row != last:
+                self._vectors[row] = self._vectors[last]
+                self._ids[row] = self._ids[last]
+                self._sq_norms[row] = self._sq_norms[last]
+                self._rows[int(self._ids[row])] = row
+            self._size = last
+            removed += 1
+        return removed
+
+    def search(self, queries: np.ndarray, k: int = 10, subset: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k best stored vectors for each query.
+
+        Args:
+            queries: Array of shape (n, dim) or (dim,)
+            k: Number of results per query
+            subset: Optional ids to restrict the search to; only their rows are scored
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: ids and scores of shape (n, k)
+        """
+        queries = as_vectors(queries, self.dim)
+        metric = self.metric
+        if metric == 'cosine':
+            queries = normalize(queries).astype(np.float32, copy=False)
+            metric = 'dot_product'
+
+        if subset is None:
+            ids, vectors, sq_norms = self.ids, self.vectors, self._sq_norms[:self._size]
+        else:
+            rows = self._subset_rows(as_subset(subset))
+            ids, vectors, sq_norms = self._ids[rows], self._vectors[rows], self._sq_norms[rows]
+        rows, scores = pairwise_top_k(queries, vectors, k, metric=metric, block_size=self.block_size, B_sq=sq_norms)
+        return pad_results(ids[rows], scores, k, self.metric)
+
+    def _subset_rows(self, subset: np.ndarray) -> np.ndarray:
+        """Rows holding the ids in subset, in row order"""
+        if len(subset) * 8 < self._size:
+            # Few ids: look each one up rather than testing every row
+            rows = self._rows
+            return np.sort(np.fromiter((rows[id] for id in subset.tolist() if id in rows), dtype=np.int64))
+        return np.flatnonzero(in_subset(self.ids, subset))
+
+    def save(self, path: str) -> None:
+        """Write the index to the directory at path"""
+        meta = {'type': 'FlatIndex', 'dim': self.dim, 'metric': self.metric, 'block_size': self.block_size}
+        save_arrays(path, meta, vectors=self.vectors, ids=self.ids, sq_norms=self._sq_norms[:self._size])
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'FlatIndex':
+        """Read an index written by save(), memory-mapping its arrays when mmap is True"""
+        meta = read_meta(path)
+        index = cls(meta['dim'], metric=meta['metric'], capacity=0, block_size=meta['block_size'])
+        index._vectors = load_array(path, 'vectors', mmap)
+        index._ids = load_array(path, 'ids', mmap)
+        index._sq_norms = load_array(path, 'sq_norms', mmap)
+        index._size = len(index._ids)
+        index._row_map = None
+        return index
@@ -1,5 +1,405 @@
-from .base import BaseIndex
+import heapq
+import math
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from .base import BaseIndex, load_array, read_meta, save_arrays, validate_metric
+from dvx.utils.arrays import as_ids, as_subset, as_vectors, grow, in_subset
+from dvx.utils.similarity import SIMILARITY_METRICS, normalize, pairwise_scores, top_k
+
 
 class HNSWIndex(BaseIndex):
-    """HNSW index implementation"""
-    pass
+    """
+    HNSW index implementation
+
+    Approximate nearest neighbour search over a hierarchical navigable
+    small-world graph. Neighbour lists are kept in fixed-width int32 arrays,
+    one per layer, and deletes are tombstones that stay navigable until
+    compact() rebuilds the graph.
+
+    Args:
+        dim: Dimension of the indexed vectors
+        metric: Similarity metric to use ('dot_product', 'cosine', 'l1', 'l2')
+        M: Maximum number of neighbours per node on the upper layers (2 * M on layer 0)
+        ef_construction: Size of the candidate list used while inserting
+        ef_search: Size of the candidate list used while searching (at least k)
+        capacity: Number of nodes to preallocate
+        seed: Seed for the level generator
+    """
+
+    # Filtered searches over at most this fraction of the nodes are scored exactly
+    brute_force_ratio = 0.05
+
+    def __init__(self,
+                 dim: int,
+                 metric: str = 'cosine',
+                 M: int = 16,
+                 ef_construction: int = 200,
+                 ef_search: int = 64,
+                 capacity: int = 1024,
+                 seed: Optional[int] = None) -> None:
+        validate_metric(metric)
+        if M < 2:
+            raise ValueError('M must be at least 2')
+        self.dim = dim
+        self.metric = metric
+        self.M = M
+        self.M0 = 2 * M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.seed = seed
+        self._level_mult = 1 / math.log(M)
+        self._rng = np.random.default_rng(seed)
+
+        self._size = 0
+        self._deleted_count = 0
+        self._vectors = np.empty((capacity, dim), dtype=np.float32)
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._deleted = np.zeros(capacity, dtype=bool)
+        self._visited = np.zeros(capacity, dtype=np.uint32)
+        self._epoch = 0
+        self._node_map: Optional[Dict[int, int]] = {}
+
+        # Layer 0 holds every node, so its rows are indexed by node directly.
+        # Upper layers only hold the nodes that reached them and map node -> row.
+        self._links = [np.full((capacity, self.M0), -1, dtype=np.int32)]
+        self._counts = [np.zeros(capacity, dtype=np.int32)]
+        self._slots: List[Optional[Dict[int, int]]] = [None]
+        self._entry = -1
+        self._max_level = -1
+
+    def __len__(self) -> int:
+        return self._size - self._deleted_count
+
+    @property
+    def _nodes(self) -> Dict[int, int]:
+        # Built lazily so that loading a saved index does not walk every id
+        if self._node_map is None:
+            live = np.flatnonzero(~self._deleted[:self._size])
+            self._node_map = dict(zip(self._ids[live].tolist(), live.tolist()))
+        return self._node_map
+
+    def __contains__(self, id: int) -> bool:
+        node = self._nodes.get(int(id))
+        return node is not None and not self._deleted[node]
+
+    def _distances(self, q: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+        """Distances from q to the given nodes, where lower is better for every metric"""
+        V = self._vectors[nodes]
+        if self.metric == 'cosine':
+            return 1.0 - V @ q
+        if self.metric == 'dot_product':
+            return -(V @ q)
+        diff = V - q
+        if self.metric == 'l2':
+            return np.einsum('ij,ij->i', diff, diff)
+        return np.abs(diff).sum(axis=1)
+
+    def _to_scores(self, dist: np.ndarray) -> np.ndarray:
+        if self.metric == 'cosine':
+            return 1.0 - dist
+        if self.metric == 'dot_product':
+            return -dist
+        if self.metric == 'l2':
+            return np.sqrt(np.maximum(dist, 0))
+        return dist
+
+    def _neighbors(self, node: int, level: int) -> np.ndarray:
+        row = node if level == 0 else self._slots[level][node]
+        return self._links[level][row, :self._counts[level][row]]
+
+    def _set_neighbors(self, node: int, level: int, neighbors: np.ndarray) -> None:
+        row = node if level == 0 else self._slots[level][node]
+        self._links[level][row, :len(neighbors)] = neighbors
+        self._counts[level][row] = len(neighbors)
+
+    def _add_layer_slot(self, node: int, level: int) -> None:
+        while len(self._links) <= level:
+            self._links.append(np.full((16, self.M), -1, dtype=np.int32))
+            self._counts.append(np.zeros(16, dtype=np.int32))
+            self._slots.append({})
+        slots = self._slots[level]
+        row = len(slots)
+        self._links[level] = grow(self._links[level], row + 1)
+        self._counts[level] = grow(self._counts[level], row + 1)
+        self._counts[level][row] = 0
+        slots[node] = row
+
+    def _next_epoch(self) -> int:
+        self._epoch += 1
+        if self._epoch == np.iinfo(np.uint32).max:
+            self._visited[:] = 0
+            self._epoch = 1
+        return self._epoch
+
+    def _search_layer(self,
+                      q: np.ndarray,
+                      entries: List[Tuple[float, int]],
+                      ef: int,
+                      level: int,
+                      allowed: Optional[np.ndarray] = None) -> List[Tuple[float, int]]:
+        """
+        Best-first search of one layer.
+
+        Returns up to ef (distance, node) pairs, nearest first. When allowed is
+        given, only nodes where it is True are returned, though all nodes are
+        still traversed.
+        """
+        epoch = self._next_epoch()
+        visited = self._visited
+        candidates = []
+        results = []
+        for d, node in entries:
+            visited[node] = epoch
+            heapq.heappush(candidates, (d, node))
+            if allowed is None or allowed[node]:
+                heapq.heappush(results, (-d, node))
+
+        while candidates:
+            d, node = heapq.heappop(candidates)
+            if len(results) >= ef and d > -results[0][0]:
+                break
+            neighbors = self._neighbors(node, level)
+            neighbors = neighbors[visited[neighbors] != epoch]
+            if not len(neighbors):
+                continue
+            visited[neighbors] = epoch
+            dists = self._distances(q, neighbors)
+            if len(results) >= ef:
+                closer = dists < -results[0][0]
+                dists, neighbors = dists[closer], neighbors[closer]
+            for nd, nb in zip(dists.tolist(), neighbors.tolist()):
+                if len(results) < ef or nd < -results[0][0]:
+                    heapq.heappush(candidates, (nd, nb))
+                    if allowed is None or allowed[nb]:
+                        heapq.heappush(results, (-nd, nb))
+                        if len(results) > ef:
+                            heapq.heappop(results)
+
+        return sorted((-d, node) for d, node in results)
+
+    def _pairwise(self, nodes: np.ndarray) -> np.ndarray:
+        """Distance matrix between the given nodes"""
+        V = self._vectors[nodes]
+        if self.metric == 'cosine':
+            return 1.0 - V @ V.T
+        if self.metric == 'dot_product':
+            return -(V @ V.T)
+        if self.metric == 'l2':
+            sq = np.einsum('ij,ij->i', V, V)
+            return sq[:, None] + sq[None, :] - 2.0 * (V @ V.T)
+        # l1 has no matrix product form; the blocked kernel bounds the broadcast temporary
+        return pairwise_scores(V, V, metric='l1')
+
+    def _select_neighbors(self, candidates: List[Tuple[float, int]], M: int) -> np.ndarray:
+        """Keep candidates that are closer to the base point than to any already selected neighbour"""
+        if len(candidates) <= 1:
+            return np.asarray([node for _, node in candidates], dtype=np.int32)
+        dists = np.asarray([d for d, _ in candidates])
+        nodes = np.asarray([node for _, node in candidates], dtype=np.int32)
+        between = self._pairwise(nodes)
+        pruned = np.zeros(len(nodes), dtype=bool)
+        selected = []
+        for i in range(len(nodes)):
+            if pruned[i]:
+                continue
+            selected.append(i)
+            if len(selected) >= M:
+                break
+            pruned |= between[i] < dists
+        return nodes[selected]
+
+    def _connect(self, node: int, neighbor: int, level: int) -> None:
+        """Add a link from neighbor back to node, pruning neighbor's list if it is full"""
+        M = self.M0 if level == 0 else self.M
+        current = self._neighbors(neighbor, level)
+        if len(current) < M:
+            self._set_neighbors(neighbor, level, np.append(current, node))
+            return
+        pool = np.append(current, node)
+        dists = self._distances(self._vectors[neighbor], pool)
+        order = np.argsort(dists, kind='stable')
+        pruned = self._select_neighbors(list(zip(dists[order].tolist(), pool[order].tolist())), M)
+        self._set_neighbors(neighbor, level, pruned)
+
+    def _insert(self, id: int, vector: np.ndarray) -> None:
+        node = self._size
+        end = node + 1
+        if end > self._vectors.shape[0]:
+            self._vectors = grow(self._vectors, end)
+            self._ids = grow(self._ids, end)
+            self._deleted = np.concatenate([self._deleted, np.zeros(self._vectors.shape[0] - len(self._deleted), dtype=bool)])
+            self._visited = np.concatenate([self._visited, np.zeros(self._vectors.shape[0] - len(self._visited), dtype=np.uint32)])
+            self._links[0] = grow(self._links[0], end)
+            self._counts[0] = grow(self._counts[0], end)
+
+        self._vectors[node] = vector
+        self._ids[node] = id
+        self._counts[0][node] = 0
+        self._nodes[id] = node
+        self._size = end
+
+        level = int(-math.log(1.0 - self._rng.random()) * self._level_mult)
+        for lc in range(1, level + 1):
+            self._add_layer_slot(node, lc)
+
+        if self._entry < 0:
+            self._entry, self._max_level = node, level
+            return
+
+        q = self._vectors[node]
+        entry = self._entry
+        entries = [(float(self._distances(q, np.array([entry]))[0]), entry)]
+        for lc in range(self._max_level, level, -1):
+            entries = self._search_layer(q, entries, 1, lc)[:1]
+
+        for lc in range(min(level, self._max_level), -1, -1):
+            entries = self._search_layer(q, entries, self.ef_construction, lc)
+            neighbors = self._select_neighbors(entries, self.M0 if lc == 0 else self.M)
+            self._set_neighbors(node, lc, neighbors)
+            for neighbor in neighbors.tolist():
+                self._connect(node, neighbor, lc)
+
+        if level > self._max_level:
+            self._entry, self._max_level = node, level
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """
+        Insert vectors into the graph one at a time.
+
+        Args:
+            ids: Integer ids of shape (n,)
+            vectors: Array of shape (n, dim)
+        """
+        ids = as_ids(ids)
+        vectors = as_vectors(vectors, self.dim)
+        if len(ids) != len(vectors):
+            raise ValueError('ids and vectors must have the same length')
+        if len(np.unique(ids)) != len(ids) or any(int(i) in self._nodes for i in ids):
+            raise ValueError('ids must be unique and not already in the index')
+        if self.metric == 'cosine':
+            vectors = normalize(vectors).astype(np.float32, copy=False)
+
+        for id, vector in zip(ids.tolist(), vectors):
+            self._insert(id, vector)
+
+    def remove(self, ids: np.ndarray) -> int:
+        """Mark vectors as deleted. They stop appearing in results but stay in the graph until compact()."""
+        removed = 0
+        for id in as_ids(ids).tolist():
+            node = self._nodes.pop(id, None)
+            if node is None:
+                continue
+            self._deleted[node] = True
+            removed += 1
+        self._deleted_count += removed
+        return removed
+
+    def compact(self) -> None:
+        """Rebuild the graph from the live nodes, dropping tombstones"""
+        live = np.flatnonzero(~self._deleted[:self._size])
+        rebuilt = HNSWIndex(self.dim, self.metric, M=self.M, ef_construction=self.ef_construction,
+                            ef_search=self.ef_search, capacity=max(len(live), 16), seed=self.seed)
+        rebuilt.add(self._ids[live], self._vectors[live])
+        self.__dict__.update(rebuilt.__dict__)
+
+    def search(self,
+               queries: np.ndarray,
+               k: int = 10,
+               subset: Optional[np.ndarray] = None,
+               *,
+               ef: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find approximately the k best vectors for each query.
+
+        A subset small enough that the graph walk would mostly visit excluded
+        nodes (under brute_force_ratio of the index, or a few times ef) is
+        scored exactly instead; otherwise the walk only returns subset nodes.
+
+        Args:
+            queries: Array of shape (n, dim) or (dim,)
+            k: Number of results per query
+            subset: Optional ids to restrict the search to
+            ef: Candidate list size, defaulting to max(ef_search, k)
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: ids and scores of shape (n, k)
+        """
+        queries = as_vectors(queries, self.dim)
+        if self.metric == 'cosine':
+            queries = normalize(queries).astype(np.float32, copy=False)
+        ef = max(ef or self.ef_search, k)
+        allowed = ~self._deleted[:self._size] if self._deleted_count else None
+        if subset is not None:
+            member = in_subset(self._ids[:self._size], as_subset(subset))
+            allowed = member if allowed is None else allowed & member
+
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf if self.metric in SIMILARITY_METRICS else np.inf,
+                         dtype=np.float32)
+        if self._entry < 0:
+            return ids, scores
+
+        if subset is not None:
+            nodes = np.flatnonzero(allowed)
+            if len(nodes) <= max(self.brute_force_ratio * self._size, 4 * ef):
+                for i, q in enumerate(queries):
+                    order, dists = top_k(self._distances(q, nodes), k, metric='l2')
+                    ids[i, :len(order)] = self._ids[nodes[order]]
+                    scores[i, :len(order)] = self._to_scores(dists)
+                return ids, scores
+
+        for i, q in enumerate(queries):
+            entry = self._entry
+            entries = [(float(self._distances(q, np.array([entry]))[0]), entry)]
+            for lc in range(self._max_level, 0, -1):
+                entries = self._search_layer(q, entries, 1, lc)[:1]
+            found = self._search_layer(q, entries, ef, 0, allowed=allowed)[:k]
+            if found:
+                dists, nodes = zip(*found)
+                ids[i, :len(nodes)] = self._ids[list(nodes)]
+                scores[i, :len(nodes)] = self._to_scores(np.asarray(dists))
+        return ids, scores
+
+    def save(self, path: str) -> None:
+        """Write the graph to the directory at path"""
+        n = self._size
+        meta = {
+            'type': 'HNSWIndex', 'dim': self.dim, 'metric': self.metric, 'M': self.M,
+            'ef_construction': self.ef_construction, 'ef_search': self.ef_search, 'seed': self.seed,
+            'entry': self._entry, 'max_level': self._max_level, 'levels': len(self._links),
+        }
+        arrays = {
+            'vectors': self._vectors[:n], 'ids': self._ids[:n], 'deleted': self._deleted[:n],
+            'links_0': self._links[0][:n], 'counts_0': self._counts[0][:n],
+        }
+        for level in range(1, len(self._links)):
+            rows = len(self._slots[level])
+            arrays[f'links_{level}'] = self._links[level][:rows]
+            arrays[f'counts_{level}'] = self._counts[level][:rows]
+            arrays[f'slots_{level}'] = np.fromiter(self._slots[level], dtype=np.int64, count=rows)
+        save_arrays(path, meta, **arrays)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'HNSWIndex':
+        """Read a graph written by save(), memory-mapping its arrays when mmap is True"""
+        meta = read_meta(path)
+        index = cls(meta['dim'], metric=meta['metric'], M=meta['M'], ef_construction=meta['ef_construction'],
+                    ef_search=meta['ef_search'], capacity=0, seed=meta['seed'])
+        index._vectors = load_array(path, 'vectors', mmap)
+        index._ids = load_array(path, 'ids', mmap)
+        index._deleted = load_array(path, 'deleted', mmap)
+        index._size = len(index._ids)
+        index._deleted_count = int(index._deleted.sum())
+        index._visited = np.zeros(index._size, dtype=np.uint32)
+        index._node_map = None
+        index._links = [load_array(path, 'links_0', mmap)]
+        index._counts = [load_array(path, 'counts_0', mmap)]
+        index._slots = [None]
+        for level in range(1, meta['levels']):
+            index._links.append(load_array(path, f'links_{level}', mmap))
+            index._counts.append(load_array(path, f'counts_{level}', mmap))
+            slots = load_array(path, f'slots_{level}', mmap)
+            index._slots.append(dict(zip(slots.tolist(), range(len(slots)))))
+        index._entry = meta['entry']
+        index._max_level = meta['max_level']
+        return index
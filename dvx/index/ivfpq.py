@@ -0,0 +1,328 @@
+from typing import Dict, List, Optional, Tuple
+import os
+import numpy as np
+from .base import BaseIndex, load_array, pad_results, read_meta, save_arrays, validate_metric
+from dvx.utils.arrays import as_ids, as_subset, as_vectors, grow, in_subset
+from .flat import FlatIndex
+from dvx.utils.similarity import SIMILARITY_METRICS, normalize, pairwise_scores, pairwise_top_k, top_k
+
+
+def kmeans(X: np.ndarray,
+           k: int,
+           n_iter: int = 20,
+           max_points: int = 256,
+           seed: Optional[int] = None) -> np.ndarray:
+    """
+    Lloyd's k-means under L2 distance.
+
+    Args:
+        X: Training vectors of shape (n, dim), with n >= k
+        k: Number of centroids
+        n_iter: Maximum number of iterations
+        max_points: Train on at most max_points * k randomly sampled rows
+        seed: Seed for sampling and initialisation
+
+    Returns:
+        np.ndarray: Centroids of shape (k, dim)
+    """
+    X = np.asarray(X, dtype=np.float32)
+    if len(X) < k:
+        raise ValueError(f'Need at least {k} training vectors, got {len(X)}')
+    rng = np.random.default_rng(seed)
+    if len(X) > max_points * k:
+        X = X[rng.choice(len(X), max_points * k, replace=False)]
+
+    centroids = X[rng.choice(len(X), k, replace=False)].copy()
+    assign = None
+    for _ in range(n_iter):
+        new_assign = pairwise_top_k(X, centroids, 1, metric='l2')[0][:, 0]
+        if assign is not None and np.array_equal(assign, new_assign):
+            break
+        assign = new_assign
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, X)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty clusters from random training points
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = X[rng.choice(len(X), len(empty), replace=False)]
+    return centroids
+
+
+class IVFPQIndex(BaseIndex):
+    """
+    Inverted-file index with product quantization
+
+    Vectors are assigned to the nearest of nlist coarse centroids and their
+    residuals are compressed to m sub-quantizer codes of nbits each. Search
+    probes the nprobe closest lists and scores codes with per-query lookup
+    tables. With rerank > 0 the raw vectors are also kept and the best
+    rerank candidates are re-scored exactly.
+
+    Args:
+        dim: Dimension of the indexed vectors, divisible by m
+        metric: Similarity metric to use ('dot_product', 'cosine', 'l1', 'l2')
+        nlist: Number of coarse centroids (inverted lists)
+        m: Number of sub-vectors per vector
+        nbits: Bits per sub-vector code (at most 16)
+        nprobe: Number of lists scanned per query
+        rerank: Number of candidates re-scored exactly, 0 to disable
+        seed: Seed for k-means training
+    """
+
+    def __init__(self,
+                 dim: int,
+                 metric: str = 'l2',
+                 nlist: int = 256,
+                 m: int = 8,
+                 nbits: int = 8,
+                 nprobe: int = 8,
+                 rerank: int = 0,
+                 seed: Optional[int] = None) -> None:
+        validate_metric(metric)
+        if dim % m:
+            raise ValueError(f'dim ({dim}) must be divisible by m ({m})')
+        if not 1 <= nbits <= 16:
+            raise ValueError('nbits must be between 1 and 16')
+        self.dim = dim
+        self.metric = metric
+        self.nlist = nlist
+        self.m = m
+        self.nbits = nbits
+        self.ksub = 2 ** nbits
+        self.dsub = dim // m
+        self.nprobe = nprobe
+        self.rerank = rerank
+        self.seed = seed
+        self.code_dtype = np.uint8 if nbits <= 8 else np.uint16
+
+        self.centroids: Optional[np.ndarray] = None
+        self.codebooks: Optional[np.ndarray] = None
+        self._list_ids: List[np.ndarray] = [np.empty(0, dtype=np.int64) for _ in range(nlist)]
+        self._list_codes: List[np.ndarray] = [np.empty((0, m), dtype=self.code_dtype) for _ in range(nlist)]
+        self._list_sizes = np.zeros(nlist, dtype=np.int64)
+        self._where_map: Optional[Dict[int, Tuple[int, int]]] = {}
+        self._raw = FlatIndex(dim, metric) if rerank else None
+
+    def __len__(self) -> int:
+        return int(self._list_sizes.sum())
+
+    @property
+    def _where(self) -> Dict[int, Tuple[int, int]]:
+        # Built lazily so that loading a saved index does not walk every id
+        if self._where_map is None:
+            self._where_map = {}
+            for lst in range(self.nlist):
+                ids = self._list_ids[lst][:self._list_sizes[lst]].tolist()
+                self._where_map.update((id, (lst, pos)) for pos, id in enumerate(ids))
+        return self._where_map
+
+    def __contains__(self, id: int) -> bool:
+        return int(id) in self._where
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = as_vectors(vectors, self.dim)
+        if self.metric == 'cosine':
+            vectors = normalize(vectors).astype(np.float32, copy=False)
+        return vectors
+
+    def _assign(self, vectors: np.ndarray, n: int = 1) -> np.ndarray:
+        """Indices of the n closest coarse centroids for each vector"""
+        if self.metric in ('l1', 'l2'):
+            return pairwise_top_k(vectors, self.centroids, n, metric=self.metric)[0]
+        return pairwise_top_k(vectors, self.centroids, n, metric='dot_product')[0]
+
+    def train(self, vectors: np.ndarray) -> None:
+        """Learn the coarse centroids and the sub-quantizer codebooks from sample vectors"""
+        vectors = self._prepare(vectors)
+        self.centroids = kmeans(vectors, self.nlist, seed=self.seed)
+        residuals = vectors - self.centroids[self._assign(vectors)[:, 0]]
+        self.codebooks = np.stack([
+            kmeans(residuals[:, j * self.dsub:(j + 1) * self.dsub], self.ksub, seed=self.seed)
+            for j in range(self.m)
+        ])
+
+    def _encode(self, residuals: np.ndarray) -> np.ndarray:
+        codes = np.empty((len(residuals), self.m), dtype=self.code_dtype)
+        for j in range(self.m):
+            sub = residuals[:, j * self.dsub:(j + 1) * self.dsub]
+            codes[:, j] = pairwise_top_k(sub, self.codebooks[j], 1, metric='l2')[0][:, 0]
+        return codes
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """
+        Encode and add a batch of vectors. The index must be trained first.
+
+        Args:
+            ids: Integer ids of shape (n,)
+            vectors: Array of shape (n, dim)
+        """
+        if not self.is_trained:
+            raise RuntimeError('IVFPQIndex must be trained before adding vectors')
+        ids = as_ids(ids)
+        vectors = self._prepare(vectors)
+        if len(ids) != len(vectors):
+            raise ValueError('ids and vectors must have the same length')
+        if len(np.unique(ids)) != len(ids) or any(int(i) in self._where for i in ids):
+            raise ValueError('ids must be unique and not already in the index')
+
+        lists = self._assign(vectors)[:, 0]
+        codes = self._encode(vectors - self.centroids[lists])
+        order = np.argsort(lists, kind='stable')
+        bounds = np.flatnonzero(np.diff(lists[order])) + 1
+        for group in np.split(order, bounds):
+            if not len(group):
+                continue
+            lst = int(lists[group[0]])
+            start = int(self._list_sizes[lst])
+            end = start + len(group)
+            self._list_ids[lst] = grow(self._list_ids[lst], end)
+            self._list_codes[lst] = grow(self._list_codes[lst], end)
+            self._list_ids[lst][start:end] = ids[group]
+            self._list_codes[lst][start:end] = codes[group]
+            self._list_sizes[lst] = end
+            self._where.update((id, (lst, pos)) for pos, id in enumerate(ids[group].tolist(), start))
+
+        if self._raw is not None:
+            self._raw.add(ids, vectors)
+
+    def remove(self, ids: np.ndarray) -> int:
+        """Remove vectors by id, filling each hole with the last entry of its list"""
+        removed = 0
+        for id in as_ids(ids).tolist():
+            where = self._where.pop(id, None)
+            if where is None:
+                continue
+            lst, pos = where
+            last = int(self._list_sizes[lst]) - 1
+            if pos != last:
+                moved = int(self._list_ids[lst][last])
+                self._list_ids[lst][pos] = moved
+                self._list_codes[lst][pos] = self._list_codes[lst][last]
+                self._where[moved] = (lst, pos)
+            self._list_sizes[lst] = last
+            removed += 1
+        if self._raw is not None:
+            self._raw.remove(ids)
+        return removed
+
+    def _scan(self,
+              q: np.ndarray,
+              lists: np.ndarray,
+              subset: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate scores of every vector in the given lists for one query, or only of those in subset"""
+        offsets = np.arange(self.m) * self.ksub
+        q_sub = q.reshape(self.m, 1, self.dsub)
+        all_ids, all_scores = [], []
+        for lst in lists.tolist():
+            size = int(self._list_sizes[lst])
+            list_ids = self._list_ids[lst][:size]
+            codes = self._list_codes[lst][:size]
+            if subset is not None:
+                member = in_subset(list_ids, subset)
+                list_ids, codes = list_ids[member], codes[member]
+            if not len(list_ids):
+                continue
+            centroid = self.centroids[lst]
+            if self.metric in SIMILARITY_METRICS:
+                table = np.einsum('mkd,md->mk', self.codebooks, q_sub[:, 0, :])
+                base = float(q @ centroid)
+            else:
+                diff = (q - centroid).reshape(self.m, 1, self.dsub) - self.codebooks
+                table = (diff * diff).sum(-1) if self.metric == 'l2' else np.abs(diff).sum(-1)
+                base = 0.0
+            scores = table.ravel()[codes + offsets].sum(axis=1) + base
+            all_ids.append(list_ids)
+            all_scores.append(scores)
+        if not all_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = np.concatenate(all_scores)
+        if self.metric == 'l2':
+            scores = np.sqrt(np.maximum(scores, 0))
+        return np.concatenate(all_ids), scores.astype(np.float32)
+
+    def search(self,
+               queries: np.ndarray,
+               k: int = 10,
+               subset: Optional[np.ndarray] = None,
+               *,
+               nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find approximately the k best vectors for each query.
+
+        Args:
+            queries: Array of shape (n, dim) or (dim,)
+            k: Number of results per query
+            subset: Optional ids to restrict the search to; other codes in the probed lists are skipped
+            nprobe: Number of lists to scan, defaulting to self.nprobe
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: ids and scores of shape (n, k)
+        """
+        queries = self._prepare(queries)
+        if not self.is_trained:
+            return pad_results(np.empty((len(queries), 0), dtype=np.int64),
+                               np.empty((len(queries), 0), dtype=np.float32), k, self.metric)
+        probe = self._assign(queries, min(nprobe or self.nprobe, self.nlist))
+        n_candidates = max(k, self.rerank)
+        subset = as_subset(subset) if subset is not None else None
+
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf if self.metric in SIMILARITY_METRICS else np.inf,
+                         dtype=np.float32)
+        for i, q in enumerate(queries):
+            cand_ids, cand_scores = self._scan(q, probe[i], subset)
+            order, cand_scores = top_k(cand_scores, n_candidates, metric=self.metric)
+            cand_ids = cand_ids[order]
+            if self._raw is not None and len(cand_ids):
+                exact = pairwise_scores(q, self._raw.reconstruct(cand_ids), metric=self.metric)[0]
+                order, cand_scores = top_k(exact, k, metric=self.metric)
+                cand_ids = cand_ids[order]
+            found = min(k, len(cand_ids))
+            ids[i, :found] = cand_ids[:found]
+            scores[i, :found] = cand_scores[:found]
+        return ids, scores
+
+    def save(self, path: str) -> None:
+        """Write the index to the directory at path, with the inverted lists stored back to back"""
+        if not self.is_trained:
+            raise RuntimeError('IVFPQIndex must be trained before saving')
+        meta = {
+            'type': 'IVFPQIndex', 'dim': self.dim, 'metric': self.metric, 'nlist': self.nlist, 'm': self.m,
+            'nbits': self.nbits, 'nprobe': self.nprobe, 'rerank': self.rerank, 'seed': self.seed,
+        }
+        sizes = self._list_sizes
+        save_arrays(path, meta,
+                    centroids=self.centroids,
+                    codebooks=self.codebooks,
+                    offsets=np.concatenate([[0], np.cumsum(sizes)]),
+                    ids=np.concatenate([self._list_ids[l][:sizes[l]] for l in range(self.nlist)]),
+                    codes=np.concatenate([self._list_codes[l][:sizes[l]] for l in range(self.nlist)]))
+        if self._raw is not None:
+            self._raw.save(os.path.join(path, 'raw'))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'IVFPQIndex':
+        """Read an index written by save(), memory-mapping its arrays when mmap is True"""
+        meta = read_meta(path)
+        index = cls(meta['dim'], metric=meta['metric'], nlist=meta['nlist'], m=meta['m'], nbits=meta['nbits'],
+                    nprobe=meta['nprobe'], rerank=meta['rerank'], seed=meta['seed'])
+        index.centroids = np.array(load_array(path, 'centroids', mmap))
+        index.codebooks = np.array(load_array(path, 'codebooks', mmap))
+        offsets = np.asarray(load_array(path, 'offsets', mmap))
+        ids = load_array(path, 'ids', mmap)
+        codes = load_array(path, 'codes', mmap)
+        # Each list is a view into the shared arrays until it is next grown
+        index._list_ids = [ids[offsets[l]:offsets[l + 1]] for l in range(index.nlist)]
+        index._list_codes = [codes[offsets[l]:offsets[l + 1]] for l in range(index.nlist)]
+        index._list_sizes = np.diff(offsets)
+        index._where_map = None
+        if index.rerank:
+            index._raw = FlatIndex.load(os.path.join(path, 'raw'), mmap=mmap)
+        return index
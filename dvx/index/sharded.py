@@ -0,0 +1,266 @@
+from itertools import islice
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+import heapq
+import multiprocessing
+import os
+import weakref
+import numpy as np
+from .base import BaseIndex, load_index, read_meta, save_arrays, validate_metric
+from dvx.utils.arrays import as_ids, as_subset, as_vectors
+from dvx.utils.similarity import SIMILARITY_METRICS
+
+_HASH = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _serve(conn, source: Union[BaseIndex, str], mmap: bool) -> None:
+    """Worker loop: answer (method, args, kwargs) requests against one shard until told to stop"""
+    index = load_index(source, mmap=mmap) if isinstance(source, str) else source
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        method, args, kwargs = request
+        try:
+            result = getattr(index, method)(*args, **kwargs)
+        except Exception as e:
+            try:
+                conn.send((False, e))
+            except Exception:
+                conn.send((False, RuntimeError(repr(e))))
+        else:
+            conn.send((True, result))
+
+
+def _shutdown(conns: List[Any], processes: List[Any]) -> None:
+    for conn in conns:
+        try:
+            conn.send(None)
+            conn.close()
+        except (OSError, ValueError):
+            pass
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+
+
+class ShardedIndex(BaseIndex):
+    """
+    Index split across shards that each live in their own worker process
+
+    Every id is assigned to a shard by a multiplicative hash, so a given id
+    always lands on, and is removed from, the same shard. add() and remove()
+    send each shard only its part of the batch. search() sends the queries
+    to all shards at once, lets them search in parallel, one process and one
+    core each, and merges their top-k lists per query with a heap.
+
+    Shards talk to the parent over pipes, so a ShardedIndex must only be used
+    from one thread at a time. Since every shard searches on its own core,
+    limit BLAS threading in the workers (e.g. OMP_NUM_THREADS=1) to avoid
+    oversubscribing the machine.
+
+    Args:
+        dim: Dimension of the indexed vectors
+        metric: Similarity metric to use ('dot_product', 'cosine', 'l1', 'l2')
+        n_shards: Number of shards and worker processes; defaults to the number of CPUs
+        factory: Callable returning an empty shard index; defaults to a FlatIndex of the same dim and metric
+        start_method: multiprocessing start method, e.g. 'fork' or 'spawn'; defaults to the platform's
+    """
+
+    def __init__(self,
+                 dim: int,
+                 metric: str = 'cosine',
+                 n_shards: Optional[int] = None,
+                 factory: Optional[Callable[[], BaseIndex]] = None,
+                 start_method: Optional[str] = None) -> None:
+        validate_metric(metric)
+        if factory is None:
+            from .flat import FlatIndex
+            factory = lambda: FlatIndex(dim, metric=metric)
+        shards = [factory() for _ in range(n_shards or os.cpu_count() or 1)]
+        for shard in shards:
+            if shard.dim != dim or shard.metric != metric:
+                raise ValueError('Every shard must have the dimension and metric of the ShardedIndex')
+        self._start(dim, metric, shards, mmap=False, start_method=start_method)
+
+    def _start(self,
+               dim: int,
+               metric: str,
+               sources: Sequence[Union[BaseIndex, str]],
+               mmap: bool,
+               start_method: Optional[str],
+               size: int = 0) -> None:
+        self.dim = dim
+        self.metric = metric
+        self.n_shards = len(sources)
+        self.start_method = start_method
+        self._size = size
+        context = multiprocessing.get_context(start_method)
+        self._conns, self._processes = [], []
+        for source in sources:
+            parent, child = context.Pipe()
+            process = context.Process(target=_serve, args=(child, source, mmap), daemon=True)
+            process.start()
+            child.close()
+            self._conns.append(parent)
+            self._processes.append(process)
+        self._finalizer = weakref.finalize(self, _shutdown, self._conns, self._processes)
+
+    def close(self) -> None:
+        """Stop the worker processes"""
+        self._finalizer()
+
+    def __enter__(self) -> 'ShardedIndex':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def shard_of(self, ids: np.ndarray) -> np.ndarray:
+        """Shard number of each id"""
+        ids = as_ids(ids).view(np.uint64)
+        return ((ids * _HASH) >> np.uint64(32)) % np.uint64(self.n_shards)
+
+    def _split(self, ids: np.ndarray) -> Dict[int, np.ndarray]:
+        """Positions in ids belonging to each shard, for the shards that get any"""
+        shards = self.shard_of(ids)
+        order = np.argsort(shards, kind='stable')
+        bounds = np.searchsorted(shards[order], np.arange(self.n_shards + 1))
+        return {shard: order[bounds[shard]:bounds[shard + 1]]
+                for shard in range(self.n_shards) if bounds[shard + 1] > bounds[shard]}
+
+    def _call(self, calls: Dict[int, Tuple[str, tuple, dict]]) -> Dict[int, Any]:
+        """Send one request to each listed shard, then gather all the replies"""
+        if not self._finalizer.alive:
+            raise RuntimeError('ShardedIndex is closed')
+        sent, dead, error = [], [], None
+        for shard, request in calls.items():
+            try:
+                self._conns[shard].send(request)
+                sent.append(shard)
+            except OSError:
+                dead.append(shard)
+        results = {}
+        # Drain every reply before raising, so the pipes stay in step
+        for shard in sent:
+            conn = self._conns[shard]
+            try:
+                while not conn.poll(1.0):
+                    if not self._processes[shard].is_alive():
+                        raise EOFError
+                ok, value = conn.recv()
+            except EOFError:
+                dead.append(shard)
+                continue
+            if ok:
+                results[shard] = value
+            elif error is None:
+                error = value
+        if dead:
+            # The dead shard's vectors are gone, so the index cannot answer correctly any more
+            self.close()
+            raise RuntimeError(f'Shard {dead[0]} worker exited with code {self._processes[dead[0]].exitcode}')
+        if error is not None:
+            raise error
+        return results
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """
+        Add a batch of vectors, each to the shard its id hashes to.
+
+        Args:
+            ids: Integer ids of shape (n,)
+            vectors: Array of shape (n, dim)
+        """
+        ids = as_ids(ids)
+        vectors = as_vectors(vectors, self.dim)
+        if len(ids) != len(vectors):
+            raise ValueError('ids and vectors must have the same length')
+        try:
+            self._call({shard: ('add', (ids[rows], vectors[rows]), {}) for shard, rows in self._split(ids).items()})
+        except Exception:
+            # Other shards may have taken their part of the batch; recount rather than guess. A dead worker has
+            # already closed the index, and a failed recount must not hide the error that caused it.
+            if self._finalizer.alive:
+                try:
+                    self._size = sum(self._call({shard: ('__len__', (), {})
+                                                 for shard in range(self.n_shards)}).values())
+                except Exception:
+                    pass
+            raise
+        self._size += len(ids)
+
+    def remove(self, ids: np.ndarray) -> int:
+        """Remove vectors by id. Unknown ids are ignored."""
+        ids = as_ids(ids)
+        results = self._call({shard: ('remove', (ids[rows],), {}) for shard, rows in self._split(ids).items()})
+        removed = sum(results.values())
+        self._size -= removed
+        return removed
+
+    def search(self,
+               queries: np.ndarray,
+               k: int = 10,
+               subset: Optional[np.ndarray] = None,
+               **kwargs: Any) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k best stored vectors for each query across all shards.
+
+        Args:
+            queries: Array of shape (n, dim) or (dim,)
+            k: Number of results per query
+            subset: Optional ids to restrict the search to; each shard receives only its own
+            **kwargs: Passed on to each shard's search(), e.g. ef or nprobe
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: ids and scores of shape (n, k)
+        """
+        queries = as_vectors(queries, self.dim)
+        if subset is None:
+            calls = {shard: ('search', (queries, k), kwargs) for shard in range(self.n_shards)}
+        else:
+            subset = as_subset(subset)
+            calls = {shard: ('search', (queries, k), dict(kwargs, subset=subset[rows]))
+                     for shard, rows in self._split(subset).items()}
+        results = list(self._call(calls).values())
+
+        largest = self.metric in SIMILARITY_METRICS
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf if largest else np.inf, dtype=np.float32)
+        for q in range(len(queries)):
+            # Each shard's row is already best first, so a k-way heap merge yields the global order
+            rows = [zip(shard_scores[q].tolist(), shard_ids[q].tolist()) for shard_ids, shard_scores in results]
+            merged = heapq.merge(*rows, key=itemgetter(0), reverse=largest)
+            top = list(islice((pair for pair in merged if pair[1] >= 0), k))
+            if top:
+                scores[q, :len(top)], ids[q, :len(top)] = zip(*top)
+        return ids, scores
+
+    def save(self, path: str) -> None:
+        """Have every worker write its shard to path/shard-<i> in parallel, then write the sidecar"""
+        os.makedirs(path, exist_ok=True)
+        self._call({shard: ('save', (os.path.join(path, f'shard-{shard}'),), {}) for shard in range(self.n_shards)})
+        meta = {'type': 'ShardedIndex', 'dim': self.dim, 'metric': self.metric,
+                'n_shards': self.n_shards, 'size': self._size}
+        save_arrays(path, meta)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, start_method: Optional[str] = None) -> 'ShardedIndex':
+        """
+        Start one worker per saved shard, each loading its shard itself.
+
+        With mmap=True the workers memory-map their shard files, so startup
+        is fast and the parent never holds the vectors.
+        """
+        meta = read_meta(path)
+        index = cls.__new__(cls)
+        sources = [os.path.join(path, f'shard-{shard}') for shard in range(meta['n_shards'])]
+        index._start(meta['dim'], meta['metric'], sources, mmap=mmap, start_method=start_method, size=meta['size'])
+        return index
@@ -1,7 +1,9 @@
-import PyPDF2
 import re
-from dvx.utils.clean import clean
-from dvx.utils.chunking import sentence_based_chunk, fixed_size_chunk, paragraph_based_chunk, semantic_sentence_chunk
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from dvx.utils import instrument
+from dvx.utils.clean import fix_hyphenated_words, iter_clean, remove_garbled_text
 
 
 def is_prose_line(line: str) -> bool:
@@ -33,52 +35,130 @@ def is_prose_line(line: str) -> bool:
     return True
 
 
-def remove_garbled_text(text: str) -> str:
+def clean_page(text: str) -> str:
+    """Clean the extracted text of a single page."""
+    return remove_garbled_text(fix_hyphenated_words(text), strip=True)
+
+
+def count_pages(file_path: str) -> int:
+    """Return the number of pages in a PDF."""
+    import PyPDF2
+    with open(file_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def extract_pages(file_path: str, pages: Sequence[int], clean: bool = True) -> List[str]:
     """
-    Remove garbled text, encoding artifacts, and symbols while preserving newlines.
-    
+    Extract the given pages of a PDF.
+
     Args:
-        text (str): The raw text to clean.
-    
+        file_path (str): Path to the PDF file.
+        pages (Sequence[int]): Zero-based page numbers.
+        clean (bool): Whether to clean each page, or only rejoin hyphenated words.
+
     Returns:
-        str: Cleaned text with garbled content removed.
+        List[str]: Text of each page, in the order given.
     """
-    text = re.sub(r'[^\x20-\x7E\n]+', '', text)  
-    
-    text = re.sub(r'(\W|\d){4,}', '', text)  
-    text = re.sub(r'[~`@#$%^&*+=|<>/\[\]\{\}_]', '', text) 
-    
-    text = re.sub(r'\b[a-zA-Z0-9]\b', '', text)
-    
-    return text.strip()
+    import PyPDF2
+    process = clean_page if clean else fix_hyphenated_words
+    texts = []
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for i in pages:
+            with instrument.stage('pdf.page'):
+                texts.append(process(pdf_reader.pages[i].extract_text()))
+            instrument.count('pages')
+    return texts
+
+
+def _extract_batch(file_path: str,
+                   pages: Sequence[int],
+                   clean: bool,
+                   options: Optional[Dict[str, Any]] = None) -> Tuple[List[str], Optional[Dict[str, Any]]]:
+    """Extract pages in a worker process, collecting instrumentation there when the parent has it enabled"""
+    if options is None:
+        return extract_pages(file_path, pages, clean), None
+    with instrument.collect(**options) as stats:
+        texts = extract_pages(file_path, pages, clean)
+    return texts, stats.to_dict()
 
 
-def read(file_path: str) -> str:
+def _iter_pages(file_path: str,
+                pages: Optional[Sequence[int]],
+                workers: int,
+                batch_size: int,
+                clean: bool) -> Iterator[str]:
+    if workers <= 1:
+        import PyPDF2
+        process = clean_page if clean else fix_hyphenated_words
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            for i in (range(len(pdf_reader.pages)) if pages is None else pages):
+                with instrument.stage('pdf.page'):
+                    text = process(pdf_reader.pages[i].extract_text())
+                instrument.count('pages')
+                yield text
+        return
+
+    if pages is None:
+        pages = range(count_pages(file_path))
+    batches = iter([pages[i:i + batch_size] for i in range(0, len(pages), batch_size)])
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            while len(pending) < 2 * workers:
+                batch = next(batches, None)
+                if batch is None:
+                    break
+                pending.append(executor.submit(_extract_batch, file_path, batch, clean, instrument.options()))
+            if not pending:
+                break
+            texts, stats = pending.popleft().result()
+            if stats is not None:
+                instrument.stats().merge(stats)
+            yield from texts
+
+
+def iter_pages(file_path: str,
+               pages: Optional[Sequence[int]] = None,
+               workers: int = 1,
+               batch_size: int = 16) -> Iterator[str]:
+    """
+    Yield the cleaned text of each page of a PDF, in page order.
+
+    Pages are cleaned as they are extracted, so the whole document is never
+    held in memory. With workers > 1, batches of pages are extracted in
+    separate processes, each opening the file itself.
+
+    Args:
+        file_path (str): Path to the PDF file.
+        pages (Sequence[int], optional): Zero-based page numbers to extract, e.g. range(10, 20). Defaults to all pages.
+        workers (int): Number of worker processes.
+        batch_size (int): Number of pages handed to a worker at a time.
+
+    Yields:
+        str: Cleaned text of each page.
+    """
+    return _iter_pages(file_path, pages, workers, batch_size, clean=True)
+
+
+def read(file_path: str, pages: Optional[Sequence[int]] = None, workers: int = 1) -> str:
     """
     Extracts and cleans the entire text from a PDF while preserving structure.
+
+    Pages are cleaned incrementally as they arrive, giving the same result as
+    cleaning the concatenated document.
     
     Args:
         file_path (str): Path to the PDF file.
+        pages (Sequence[int], optional): Zero-based page numbers to extract. Defaults to all pages.
+        workers (int): Number of worker processes used for extraction.
     
     Returns:
         str: Cleaned, structured text from the PDF.
     """
-    def fix_hyphenated_words(text):
-        """
-        Fix hyphenated words split across lines.
-        """
-        return re.sub(r'-\n(\w+)', r'\1', text) 
-
-    with open(file_path, 'rb') as file:
-        pdf_reader = PyPDF2.PdfReader(file)
-        all_text = ""
-
-        for page in pdf_reader.pages:
-            page_text = page.extract_text()
-            page_text = fix_hyphenated_words(page_text)
-            all_text += page_text + "\n" 
-        
-        return remove_garbled_text(all_text)
+    raw_pages = _iter_pages(file_path, pages, workers, batch_size=16, clean=False)
+    return ''.join(iter_clean(page + '\n' for page in raw_pages)).strip()
 
 
 """path = r'data\A GENERATIVE INFINITE GAME OF SIMULATION.pdf'
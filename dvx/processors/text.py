@@ -1,23 +1,4 @@
-import re
-from dvx.utils.chunking import fixed_size_chunk, sentence_based_chunk, paragraph_based_chunk, semantic_sentence_chunk
-
-def remove_garbled_text(text: str) -> str:
-    """
-    Remove garbled text, encoding artifacts, and symbols while preserving paragraph structure and newlines.
-    
-    Args:
-        text (str): The raw text to clean.
-    
-    Returns:
-        str: Cleaned text with garbled content removed, preserving paragraph structure.
-    """
-    text = re.sub(r'[^\x20-\x7E\n]+', '', text)
-    text = re.sub(r'(\W|\d){4,}', '', text)  
-    text = re.sub(r'[~`@#$%^&*+=|<>/\[\]\{\}_]', '', text)  
-    text = re.sub(r'\b[a-zA-Z0-9]\b', '', text)
-    
-    return text
-
+from dvx.utils.clean import iter_clean, remove_garbled_text
 
 def read(file_path: str) -> str:
     """
@@ -30,9 +11,8 @@ def read(file_path: str) -> str:
         str: Cleaned, structured text from the TXT file.
     """
     with open(file_path, 'r', encoding='utf-8') as file:
-        all_text = file.read()
-
-    return remove_garbled_text(all_text)
+        blocks = iter(lambda: file.read(1 << 20), '')
+        return ''.join(iter_clean(blocks))
 
 
 """path = r'data\message.txt'
@@ -0,0 +1,190 @@
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from dvx.core.encoder import BaseEncoder
+from dvx.index.base import BaseIndex
+
+
+class _Request(NamedTuple):
+    query: str
+    k: int
+    future: asyncio.Future
+
+
+class BatchingRetriever:
+    """
+    Asyncio front end that micro-batches concurrent queries
+
+    Queries submitted with search() wait in a bounded queue. A single worker
+    task takes the first waiting query, keeps collecting until max_batch_size
+    queries are gathered or max_wait_ms has passed, then encodes the batch
+    with one encode_batch() call and runs one index search for it in an
+    executor, so the event loop never blocks. Each caller gets its own rows
+    back through its future.
+
+    When the queue is full, search() waits for room, which pushes back on
+    callers instead of letting the backlog grow without bound. A per-request
+    timeout covers the time spent queued as well as the search itself.
+
+    Use it as an async context manager, or call start() and close().
+
+    Args:
+        encoder: Encoder used to embed queries
+        index: Index to search
+        k: Default number of results per query
+        max_batch_size: Largest number of queries searched together
+        max_wait_ms: Longest time the first query of a batch waits for company
+        max_queue: Number of queries allowed to wait before search() blocks
+        timeout: Default per-request timeout in seconds, or None for no limit
+        executor: Executor for encoding and searching; defaults to a single worker thread
+        **search_kwargs: Extra keyword arguments passed to index.search()
+    """
+
+    def __init__(self,
+                 encoder: BaseEncoder,
+                 index: BaseIndex,
+                 k: int = 10,
+                 max_batch_size: int = 64,
+                 max_wait_ms: float = 2.0,
+                 max_queue: int = 1024,
+                 timeout: Optional[float] = None,
+                 executor: Optional[Executor] = None,
+                 **search_kwargs: Any) -> None:
+        if max_batch_size < 1:
+            raise ValueError('max_batch_size must be at least 1')
+        self.encoder = encoder
+        self.index = index
+        self.k = k
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.search_kwargs: Dict[str, Any] = search_kwargs
+        self.batches = 0
+        self.queries = 0
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._batch: List[_Request] = []
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.queries / self.batches if self.batches else 0.0
+
+    async def start(self) -> None:
+        if self._worker is not None:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='dvx-batcher')
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._worker = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the worker and fail any queries still waiting"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        while not self._queue.empty():
+            self._batch.append(self._queue.get_nowait())
+        for request in self._batch:
+            if not request.future.done():
+                request.future.set_exception(RuntimeError('BatchingRetriever was closed'))
+        self._batch = []
+        if self._owns_executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def __aenter__(self) -> 'BatchingRetriever':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def search(self, query: str, k: Optional[int] = None, timeout: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search for one query as part of the next batch.
+
+        Args:
+            query: Query text
+            k: Number of results, defaulting to self.k
+            timeout: Seconds to wait, defaulting to self.timeout
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: ids and scores of shape (k,)
+
+        Raises:
+            asyncio.TimeoutError: If the results are not ready within the timeout
+        """
+        if self._worker is None:
+            raise RuntimeError('BatchingRetriever is not started')
+        future = asyncio.get_running_loop().create_future()
+        request = _Request(query, k or self.k, future)
+        timeout = timeout if timeout is not None else self.timeout
+        # The whole round trip, including waiting for room in the queue, shares one deadline
+        return await asyncio.wait_for(self._submit(request), timeout)
+
+    async def _submit(self, request: _Request) -> Tuple[np.ndarray, np.ndarray]:
+        try:
+            await self._queue.put(request)
+            return await request.future
+        finally:
+            # On timeout the request may still be queued; a cancelled future tells the worker to skip it
+            request.future.cancel()
+
+    async def _collect(self) -> List[_Request]:
+        loop = asyncio.get_running_loop()
+        # Kept on self so that close() can fail a batch interrupted while collecting or searching
+        self._batch = batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            getter = asyncio.ensure_future(self._queue.get())
+            try:
+                done, _ = await asyncio.wait({getter}, timeout=remaining)
+            finally:
+                if not getter.done():
+                    getter.cancel()
+            if getter not in done:
+                break
+            batch.append(getter.result())
+        return batch
+
+    def _search_batch(self, queries: Sequence[str], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        vectors = self.encoder.encode_batch(queries, batch_size=len(queries))
+        return self.index.search(vectors, k, **self.search_kwargs)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = self._batch = [request for request in await self._collect() if not request.future.done()]
+            if not batch:
+                continue
+            k = max(request.k for request in batch)
+            try:
+                ids, scores = await loop.run_in_executor(self._executor, self._search_batch,
+                                                         [request.query for request in batch], k)
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+            self.batches += 1
+            self.queries += len(batch)
+            for i, request in enumerate(batch):
+                if not request.future.done():
+                    request.future.set_result((ids[i, :request.k], scores[i, :request.k]))
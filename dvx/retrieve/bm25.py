@@ -0,0 +1,261 @@
+from array import array
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+import math
+import re
+import numpy as np
+from dvx.utils.arrays import grow, in_subset
+
+_TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; keeps digits and short tokens so part numbers match exactly"""
+    return _TOKEN.findall(text.lower())
+
+
+class Postings:
+    """
+    Postings list of one term, stored in compact arrays
+
+    Document numbers are delta-encoded against the previous posting in a
+    uint32 array, alongside a uint32 array of term frequencies. Every
+    BLOCK postings the absolute document number is also recorded, so any
+    block can be decoded on its own and lookups can skip to the blocks
+    that matter.
+    """
+
+    BLOCK = 128
+
+    __slots__ = ('deltas', 'tfs', 'block_docs', 'last', 'max_tf', 'min_len')
+
+    def __init__(self) -> None:
+        self.deltas = array('I')
+        self.tfs = array('I')
+        self.block_docs = array('I')
+        self.last = 0
+        self.max_tf = 0
+        self.min_len = 1 << 31
+
+    def __len__(self) -> int:
+        return len(self.tfs)
+
+    def append(self, doc: int, tf: int, length: int) -> None:
+        if len(self.tfs) % self.BLOCK == 0:
+            self.block_docs.append(doc)
+        self.deltas.append(doc - self.last if self.tfs else doc)
+        self.tfs.append(tf)
+        self.last = doc
+        self.max_tf = max(self.max_tf, tf)
+        self.min_len = min(self.min_len, length)
+
+    def decode(self, blocks: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Document numbers and term frequencies, for every posting or only the given blocks"""
+        deltas = np.frombuffer(self.deltas, dtype=np.uint32).astype(np.int64)
+        # Copies, so callers never pin the arrays' buffers and block further appends
+        tfs = np.frombuffer(self.tfs, dtype=np.uint32).astype(np.int64)
+        if blocks is None:
+            return np.cumsum(deltas), tfs
+        starts = blocks * self.BLOCK
+        ends = np.minimum(starts + self.BLOCK, len(deltas))
+        rows = np.concatenate([np.arange(start, end) for start, end in zip(starts.tolist(), ends.tolist())])
+        # Restart the running sum at each block from its recorded absolute document number
+        deltas = deltas[rows]
+        firsts = np.concatenate([[0], np.cumsum(ends - starts)[:-1]])
+        deltas[firsts] = np.frombuffer(self.block_docs, dtype=np.uint32)[blocks]
+        sums = np.cumsum(deltas)
+        docs = sums - np.repeat(sums[firsts] - deltas[firsts], ends - starts)
+        return docs, tfs[rows]
+
+    def lookup(self, docs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Term frequencies of the given sorted document numbers, decoding only the blocks that can hold them"""
+        block_docs = np.frombuffer(self.block_docs, dtype=np.uint32)
+        blocks = np.unique(np.searchsorted(block_docs, docs, side='right') - 1)
+        blocks = blocks[blocks >= 0]
+        if not len(blocks):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        posted, tfs = self.decode(blocks)
+        pos = np.minimum(np.searchsorted(docs, posted), len(docs) - 1)
+        hit = docs[pos] == posted
+        return posted[hit], tfs[hit]
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index with incremental adds and pruned top-k search
+
+    Documents get consecutive internal numbers as they arrive and are
+    referred to by caller-supplied keys. Removing a document leaves a
+    tombstone; its postings still count towards document frequencies until
+    compact() is called, as in most inverted-index engines.
+
+    Search is term-at-a-time with MaxScore pruning: query terms are taken
+    in decreasing order of their score upper bound, and once the remaining
+    terms together cannot lift an unseen document above the current k-th
+    best score, those terms are only looked up for surviving candidates,
+    decoding just the postings blocks that contain them.
+
+    Args:
+        k1: Term frequency saturation
+        b: Length normalisation strength
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Postings] = {}
+        self.keys: List[Any] = []
+        self._numbers: Dict[Hashable, int] = {}
+        self._lengths = np.zeros(1024, dtype=np.uint32)
+        self._deleted = np.zeros(1024, dtype=bool)
+        self._live = 0
+        # Documents counted in the collection statistics: live ones plus tombstones not yet compacted
+        self._indexed = 0
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return self._live
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._numbers
+
+    @property
+    def avg_length(self) -> float:
+        return self._total_length / self._indexed if self._indexed else 0.0
+
+    def add(self, key: Hashable, text: str) -> None:
+        """Index text under key, replacing any document already stored under it"""
+        if key in self._numbers:
+            self.remove([key])
+        tokens = tokenize(text)
+        doc = len(self.keys)
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, tf in counts.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = Postings()
+            postings.append(doc, tf, len(tokens))
+        self._lengths = grow(self._lengths, doc + 1)
+        self._deleted = grow(self._deleted, doc + 1)
+        self._lengths[doc] = len(tokens)
+        self._deleted[doc] = False
+        self.keys.append(key)
+        self._numbers[key] = doc
+        self._live += 1
+        self._indexed += 1
+        self._total_length += len(tokens)
+
+    def add_many(self, texts: Iterable[str], keys: Optional[Iterable[Hashable]] = None) -> None:
+        """
+        Index a stream of texts, e.g. the chunks yielded by iter_parse().
+
+        Args:
+            texts: Texts to index
+            keys: Keys aligned with texts; defaults to consecutive integers continuing from len(self.keys)
+        """
+        if keys is None:
+            for text in texts:
+                self.add(len(self.keys), text)
+        else:
+            for key, text in zip(keys, texts):
+                self.add(key, text)
+
+    def remove(self, keys: Iterable[Hashable]) -> int:
+        """Tombstone documents by key and return how many were removed"""
+        removed = 0
+        for key in keys:
+            doc = self._numbers.pop(key, None)
+            if doc is None:
+                continue
+            self._deleted[doc] = True
+            self._live -= 1
+            removed += 1
+        return removed
+
+    def compact(self) -> None:
+        """Drop tombstoned documents from the postings and the collection statistics"""
+        if self._indexed == self._live:
+            return
+        n = len(self.keys)
+        deleted, lengths = self._deleted[:n], self._lengths[:n]
+        for term in list(self.postings):
+            docs, tfs = self.postings[term].decode()
+            keep = ~deleted[docs]
+            if not keep.any():
+                del self.postings[term]
+                continue
+            postings = Postings()
+            for doc, tf in zip(docs[keep].tolist(), tfs[keep].tolist()):
+                postings.append(doc, tf, int(lengths[doc]))
+            self.postings[term] = postings
+        # Tombstoned numbers stay allocated, with length 0, so live numbers do not move
+        self._total_length -= int(lengths[deleted].sum())
+        self._indexed = self._live
+        lengths[deleted] = 0
+
+    def _idf(self, df: int) -> float:
+        return math.log(1 + (self._indexed - df + 0.5) / (df + 0.5))
+
+    def _term_scores(self, idf: float, tfs: np.ndarray, docs: np.ndarray) -> np.ndarray:
+        tfs = tfs.astype(np.float64)
+        norm = self.k1 * (1 - self.b + self.b * self._lengths[docs] / self.avg_length)
+        return idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+    def _upper_bound(self, idf: float, postings: Postings) -> float:
+        norm = self.k1 * (1 - self.b + self.b * postings.min_len / self.avg_length)
+        return idf * postings.max_tf * (self.k1 + 1) / (postings.max_tf + norm)
+
+    def search(self,
+               query: str,
+               k: int = 10,
+               subset: Optional[Iterable[Hashable]] = None) -> List[Tuple[Any, float]]:
+        """
+        Return the k best (key, score) pairs for query, best first.
+
+        Args:
+            query: Query text
+            k: Number of results
+            subset: Optional keys to restrict the search to
+        """
+        terms = [term for term in dict.fromkeys(tokenize(query)) if term in self.postings]
+        if not terms or k <= 0:
+            return []
+        allowed = None
+        if subset is not None:
+            allowed = np.unique(np.fromiter((self._numbers[key] for key in subset if key in self._numbers),
+                                            dtype=np.int64))
+
+        idfs = [self._idf(len(self.postings[term])) for term in terms]
+        bounds = [self._upper_bound(idf, self.postings[term]) for idf, term in zip(idfs, terms)]
+        order = sorted(range(len(terms)), key=lambda i: -bounds[i])
+        remaining = np.cumsum([bounds[i] for i in order][::-1])[::-1]
+
+        cand_docs = np.empty(0, dtype=np.int64)
+        cand_scores = np.empty(0, dtype=np.float64)
+        threshold = -np.inf
+        for step, i in enumerate(order):
+            postings = self.postings[terms[i]]
+            if len(cand_docs) >= k and remaining[step] <= threshold:
+                # No unseen document can reach the top k any more: only update live candidates
+                alive = cand_scores + remaining[step] > threshold
+                cand_docs, cand_scores = cand_docs[alive], cand_scores[alive]
+                docs, tfs = postings.lookup(cand_docs)
+                if len(docs):
+                    cand_scores[np.searchsorted(cand_docs, docs)] += self._term_scores(idfs[i], tfs, docs)
+            else:
+                docs, tfs = postings.decode()
+                live = ~self._deleted[docs]
+                if allowed is not None:
+                    live &= in_subset(docs, allowed)
+                docs, tfs = docs[live], tfs[live]
+                scores = self._term_scores(idfs[i], tfs, docs)
+                merged, inverse = np.unique(np.concatenate([cand_docs, docs]), return_inverse=True)
+                cand_scores = np.bincount(inverse, weights=np.concatenate([cand_scores, scores]),
+                                          minlength=len(merged))
+                cand_docs = merged
+            if len(cand_scores) >= k:
+                threshold = np.partition(cand_scores, len(cand_scores) - k)[len(cand_scores) - k]
+
+        best = np.argsort(-cand_scores, kind='stable')[:k]
+        return [(self.keys[doc], float(score)) for doc, score in zip(cand_docs[best].tolist(), cand_scores[best].tolist())]
@@ -0,0 +1,108 @@
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+import numpy as np
+from dvx.core.document import Document
+from dvx.core.encoder import BaseEncoder
+from dvx.core.store import VectorStore
+from dvx.retrieve.bm25 import BM25Index
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]],
+                           k: int = 60,
+                           weights: Optional[Sequence[float]] = None) -> List[Tuple[Hashable, float]]:
+    """
+    Fuse ranked lists of keys with reciprocal rank fusion.
+
+    Each key scores sum(weight / (k + rank)) over the lists it appears in,
+    with ranks starting at 1, so only positions matter and BM25 and vector
+    scores never need to be put on a common scale.
+
+    Returns:
+        List[Tuple[Hashable, float]]: (key, fused score) pairs, best first
+    """
+    weights = weights if weights is not None else [1.0] * len(rankings)
+    fused: Dict[Hashable, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, key in enumerate(ranking, start=1):
+            fused[key] = fused.get(key, 0.0) + weight / (k + rank)
+    return sorted(fused.items(), key=lambda item: -item[1])
+
+
+def linear_fusion(results: Sequence[Sequence[Tuple[Hashable, float]]],
+                  weights: Optional[Sequence[float]] = None) -> List[Tuple[Hashable, float]]:
+    """
+    Fuse scored result lists by a weighted sum of min-max normalised scores.
+
+    Every list must be ordered best first with higher scores better.
+
+    Returns:
+        List[Tuple[Hashable, float]]: (key, fused score) pairs, best first
+    """
+    weights = weights if weights is not None else [1.0] * len(results)
+    fused: Dict[Hashable, float] = {}
+    for result, weight in zip(results, weights):
+        if not result:
+            continue
+        scores = np.array([score for _, score in result], dtype=np.float64)
+        spread = scores.max() - scores.min()
+        scores = (scores - scores.min()) / spread if spread > 0 else np.ones_like(scores)
+        for (key, _), score in zip(result, scores.tolist()):
+            fused[key] = fused.get(key, 0.0) + weight * score
+    return sorted(fused.items(), key=lambda item: -item[1])
+
+
+class HybridRetriever:
+    """
+    Combines BM25 and vector search over the same documents
+
+    The BM25 index must be keyed by document id, e.g. filled with
+    bm25.add_many(texts, keys=ids) alongside store.upsert(). Metadata filters
+    are resolved once by the store and applied to both retrievers.
+
+    Args:
+        bm25: Lexical index keyed by document id
+        store: Vector store holding the same documents
+        encoder: Encoder used to embed queries, matching the stored vectors
+        method: 'rrf' for reciprocal rank fusion or 'linear' for normalised score fusion
+        weights: Weights of the lexical and vector results, in that order
+        rrf_k: Rank offset for reciprocal rank fusion
+    """
+
+    def __init__(self,
+                 bm25: BM25Index,
+                 store: VectorStore,
+                 encoder: BaseEncoder,
+                 method: str = 'rrf',
+                 weights: Tuple[float, float] = (1.0, 1.0),
+                 rrf_k: int = 60) -> None:
+        if method not in ('rrf', 'linear'):
+            raise ValueError("method must be 'rrf' or 'linear'")
+        self.bm25 = bm25
+        self.store = store
+        self.encoder = encoder
+        self.method = method
+        self.weights = weights
+        self.rrf_k = rrf_k
+
+    def search(self, query: str, k: int = 10, candidates: int = 50, **filters: Any) -> List[Tuple[Document, float]]:
+        """
+        Return the k best documents for query by fused lexical and vector rank.
+
+        Args:
+            query: Query text
+            k: Number of results
+            candidates: Number of results taken from each retriever before fusion
+            **filters: Metadata conditions, as for VectorStore.search()
+        """
+        subset = self.store.select(**filters) if filters else None
+        lexical = self.bm25.search(query, candidates, subset=subset)
+        vector = self.store.search(self.encoder.encode_batch([query]), candidates, **filters)[0]
+        vector = [(document.id, score) for document, score in vector]
+        if self.store.index is not None and self.store.index.metric in ('l1', 'l2'):
+            vector = [(id, -score) for id, score in vector]
+
+        if self.method == 'rrf':
+            fused = reciprocal_rank_fusion([[id for id, _ in lexical], [id for id, _ in vector]],
+                                           k=self.rrf_k, weights=self.weights)
+        else:
+            fused = linear_fusion([lexical, vector], weights=self.weights)
+        return [(self.store.documents[id], score) for id, score in fused[:k] if id in self.store.documents]
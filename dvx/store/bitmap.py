@@ -0,0 +1,334 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+import os
+import numpy as np
+
+DATE_FIELDS = ('created_on', 'modified_on')
+
+Date = Union[str, float, datetime]
+
+
+class Entry(NamedTuple):
+    """What a MetadataIndex indexes for one document"""
+    doc_type: str
+    prefixes: List[str]
+    dates: Tuple[float, ...]
+
+
+class Bitmap:
+    """Growable bitset over integer labels, packed eight labels per byte"""
+
+    __slots__ = ('bits',)
+
+    def __init__(self, bits: Optional[np.ndarray] = None) -> None:
+        self.bits = bits if bits is not None else np.zeros(0, dtype=np.uint8)
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray) -> 'Bitmap':
+        return cls(np.packbits(mask, bitorder='little'))
+
+    def _reserve(self, label: int) -> None:
+        size = label // 8 + 1
+        if size > len(self.bits):
+            grown = np.zeros(max(size, 2 * len(self.bits)), dtype=np.uint8)
+            grown[:len(self.bits)] = self.bits
+            self.bits = grown
+
+    def set(self, labels: np.ndarray) -> None:
+        labels = np.asarray(labels, dtype=np.int64)
+        if not len(labels):
+            return
+        self._reserve(int(labels.max()))
+        np.bitwise_or.at(self.bits, labels >> 3, (1 << (labels & 7)).astype(np.uint8))
+
+    def clear(self, labels: np.ndarray) -> None:
+        labels = np.asarray(labels, dtype=np.int64)
+        labels = labels[labels < 8 * len(self.bits)]
+        np.bitwise_and.at(self.bits, labels >> 3, ~(1 << (labels & 7)).astype(np.uint8))
+
+    def __and__(self, other: 'Bitmap') -> 'Bitmap':
+        size = min(len(self.bits), len(other.bits))
+        return Bitmap(self.bits[:size] & other.bits[:size])
+
+    def __or__(self, other: 'Bitmap') -> 'Bitmap':
+        short, long = sorted((self.bits, other.bits), key=len)
+        bits = long.copy()
+        bits[:len(short)] |= short
+        return Bitmap(bits)
+
+    def __len__(self) -> int:
+        return int(np.unpackbits(self.bits).sum())
+
+    def contains(self, labels: np.ndarray) -> np.ndarray:
+        """Boolean mask of the labels that are set"""
+        labels = np.asarray(labels, dtype=np.int64)
+        inside = labels < 8 * len(self.bits)
+        mask = np.zeros(len(labels), dtype=bool)
+        mask[inside] = (self.bits[labels[inside] >> 3] >> (labels[inside] & 7)) & 1 == 1
+        return mask
+
+    def labels(self) -> np.ndarray:
+        """Set labels in ascending order"""
+        return np.flatnonzero(np.unpackbits(self.bits, bitorder='little')).astype(np.int64)
+
+
+class LabelSet:
+    """
+    Set of labels kept as a sorted array while sparse and as a Bitmap once dense
+
+    A Bitmap takes one bit per label up to the largest one, however few are
+    set, so a key that only a handful of documents carry, such as one
+    tenant's folder, is stored as a sorted int64 array instead. The set
+    switches to a Bitmap once the array would be the larger of the two.
+    """
+
+    __slots__ = ('array', 'bitmap')
+
+    def __init__(self, array: Optional[np.ndarray] = None, bitmap: Optional[Bitmap] = None) -> None:
+        self.bitmap = bitmap
+        self.array = None if bitmap is not None else (array if array is not None else np.zeros(0, dtype=np.int64))
+
+    def _densify(self) -> None:
+        array = self.array
+        if array is not None and len(array) and 64 * len(array) > int(array[-1]) + 1:
+            self.bitmap = Bitmap()
+            self.bitmap.set(array)
+            self.array = None
+
+    def set(self, labels: Iterable[int]) -> None:
+        labels = np.asarray(labels, dtype=np.int64)
+        if self.array is None:
+            self.bitmap.set(labels)
+        else:
+            self.array = np.union1d(self.array, labels)
+            self._densify()
+
+    def clear(self, labels: Iterable[int]) -> None:
+        labels = np.asarray(labels, dtype=np.int64)
+        if self.array is None:
+            self.bitmap.clear(labels)
+        else:
+            self.array = np.setdiff1d(self.array, labels)
+
+    def contains(self, labels: np.ndarray) -> np.ndarray:
+        """Boolean mask of the labels in the set"""
+        if self.array is None:
+            return self.bitmap.contains(labels)
+        labels = np.asarray(labels, dtype=np.int64)
+        if not len(self.array):
+            return np.zeros(len(labels), dtype=bool)
+        pos = np.minimum(np.searchsorted(self.array, labels), len(self.array) - 1)
+        return self.array[pos] == labels
+
+    def __and__(self, other: 'LabelSet') -> 'LabelSet':
+        if self.array is not None:
+            return LabelSet(self.array[other.contains(self.array)])
+        if other.array is not None:
+            return LabelSet(other.array[self.contains(other.array)])
+        return LabelSet(bitmap=self.bitmap & other.bitmap)
+
+    def __or__(self, other: 'LabelSet') -> 'LabelSet':
+        if self.array is not None and other.array is not None:
+            union = LabelSet(np.union1d(self.array, other.array))
+            union._densify()
+            return union
+        dense, sparse = (self, other) if self.array is None else (other, self)
+        union = LabelSet(bitmap=dense.bitmap | Bitmap())
+        union.set(sparse.labels())
+        return union
+
+    def __len__(self) -> int:
+        return len(self.array) if self.array is not None else len(self.bitmap)
+
+    @property
+    def nbytes(self) -> int:
+        return self.array.nbytes if self.array is not None else self.bitmap.bits.nbytes
+
+    def labels(self) -> np.ndarray:
+        """Labels in ascending order"""
+        return self.array if self.array is not None else self.bitmap.labels()
+
+
+def _timestamp(value: Any) -> float:
+    if value is None:
+        return np.nan
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    return float(value)
+
+
+def _prefixes(path: str) -> List[str]:
+    """Every ancestor folder of path, normalised, from the nearest up"""
+    prefixes = []
+    folder = os.path.dirname(os.path.normpath(path))
+    while folder and folder not in prefixes:
+        prefixes.append(folder)
+        parent = os.path.dirname(folder)
+        if parent == folder:
+            break
+        folder = parent
+    return prefixes
+
+
+class MetadataIndex:
+    """
+    Inverted label sets over document metadata, keyed by integer labels
+
+    Each document type and each folder on a document's path maps to a
+    LabelSet of the labels carrying it, so equality and path-prefix filters
+    are a dictionary lookup plus an intersection. Folders holding few
+    documents stay sorted arrays, so memory grows with the number of
+    (folder, document) pairs rather than folders times labels. Dates
+    ('created_on', 'modified_on') are kept as float timestamp columns
+    indexed by label, and a range filter turns one vectorised comparison
+    into a Bitmap.
+
+    Records are metadata dicts as produced by DocumentMetaData; the document
+    type is read from 'doc_type' or, failing that, from the path's extension.
+    """
+
+    def __init__(self) -> None:
+        self.doc_types: Dict[str, LabelSet] = {}
+        self.paths: Dict[str, LabelSet] = {}
+        self.alive = LabelSet()
+        self._dates = {field: np.full(0, np.nan) for field in DATE_FIELDS}
+        self._keys: Dict[int, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, labels: Iterable[int], records: Iterable[Dict[str, Any]]) -> None:
+        """Index the metadata of each label, replacing whatever the label had before"""
+        self.add_entries(labels, self.parse(records))
+
+    def parse(self, records: Iterable[Dict[str, Any]]) -> List[Entry]:
+        """
+        Read the document type, folders and dates that add() indexes from each record.
+
+        Nothing is changed, so a caller can validate a batch before making
+        other writes that must not happen if its metadata is invalid.
+
+        Raises:
+            ValueError: If a record has a date or path that cannot be read
+        """
+        entries = []
+        for record in records:
+            try:
+                path = record.get('path') or ''
+                doc_type = record.get('doc_type') or os.path.splitext(path)[1].lstrip('.').lower()
+                prefixes = _prefixes(path) if path else []
+                dates = tuple(_timestamp(record.get(field)) for field in DATE_FIELDS)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f'Invalid metadata {record!r}: {e}') from e
+            entries.append(Entry(doc_type, prefixes, dates))
+        return entries
+
+    def add_entries(self, labels: Iterable[int], entries: Sequence[Entry]) -> None:
+        """Index entries returned by parse(), replacing whatever the labels had before"""
+        labels = np.asarray(list(labels), dtype=np.int64)
+        if not len(labels):
+            return
+        self.remove(labels)
+
+        by_type: Dict[str, List[int]] = {}
+        by_path: Dict[str, List[int]] = {}
+        size = int(labels.max()) + 1
+        for field in DATE_FIELDS:
+            if size > len(self._dates[field]):
+                grown = np.full(max(size, 2 * len(self._dates[field])), np.nan)
+                grown[:len(self._dates[field])] = self._dates[field]
+                self._dates[field] = grown
+
+        for label, (doc_type, prefixes, dates) in zip(labels.tolist(), entries):
+            by_type.setdefault(doc_type, []).append(label)
+            for prefix in prefixes:
+                by_path.setdefault(prefix, []).append(label)
+            for field, date in zip(DATE_FIELDS, dates):
+                self._dates[field][label] = date
+            self._keys[label] = (doc_type, prefixes)
+
+        for doc_type, members in by_type.items():
+            self.doc_types.setdefault(doc_type, LabelSet()).set(members)
+        for prefix, members in by_path.items():
+            self.paths.setdefault(prefix, LabelSet()).set(members)
+        self.alive.set(labels)
+
+    def remove(self, labels: Iterable[int]) -> None:
+        by_type: Dict[str, List[int]] = {}
+        by_path: Dict[str, List[int]] = {}
+        removed = []
+        for label in labels:
+            label = int(label)
+            keys = self._keys.pop(label, None)
+            if keys is None:
+                continue
+            doc_type, prefixes = keys
+            by_type.setdefault(doc_type, []).append(label)
+            for prefix in prefixes:
+                by_path.setdefault(prefix, []).append(label)
+            removed.append(label)
+        if not removed:
+            return
+
+        for doc_type, members in by_type.items():
+            self.doc_types[doc_type].clear(members)
+        for prefix, members in by_path.items():
+            self.paths[prefix].clear(members)
+            if not len(self.paths[prefix]):
+                del self.paths[prefix]
+        for field in DATE_FIELDS:
+            self._dates[field][removed] = np.nan
+        self.alive.clear(removed)
+
+    def _date_range(self, field: str, after: Optional[Date], before: Optional[Date]) -> LabelSet:
+        dates = self._dates[field]
+        mask = ~np.isnan(dates)
+        if after is not None:
+            mask &= dates >= _timestamp(after)
+        if before is not None:
+            mask &= dates < _timestamp(before)
+        return LabelSet(bitmap=Bitmap.from_mask(mask))
+
+    def select(self,
+               doc_type: Optional[Union[str, Iterable[str]]] = None,
+               path_prefix: Optional[str] = None,
+               created_after: Optional[Date] = None,
+               created_before: Optional[Date] = None,
+               modified_after: Optional[Date] = None,
+               modified_before: Optional[Date] = None) -> Optional[np.ndarray]:
+        """
+        Labels matching every given condition.
+
+        Args:
+            doc_type: Document type (e.g. 'pdf'), or several of which any may match
+            path_prefix: Folder the document must be under
+            created_after, modified_after: Inclusive lower bounds, as datetimes, ISO strings or timestamps
+            created_before, modified_before: Exclusive upper bounds
+
+        Returns:
+            Optional[np.ndarray]: Sorted labels, or None when no condition was given
+        """
+        selected: Optional[LabelSet] = None
+
+        def narrow(labels: LabelSet) -> None:
+            nonlocal selected
+            selected = labels if selected is None else selected & labels
+
+        if doc_type is not None:
+            types = [doc_type] if isinstance(doc_type, str) else list(doc_type)
+            union = LabelSet()
+            for name in types:
+                union = union | self.doc_types.get(name.lstrip('.').lower(), LabelSet())
+            narrow(union)
+        if path_prefix is not None:
+            narrow(self.paths.get(os.path.normpath(path_prefix), LabelSet()))
+        if created_after is not None or created_before is not None:
+            narrow(self._date_range('created_on', created_after, created_before))
+        if modified_after is not None or modified_before is not None:
+            narrow(self._date_range('modified_on', modified_after, modified_before))
+
+        if selected is None:
+            return None
+        return (selected & self.alive).labels()
@@ -0,0 +1,443 @@
+from threading import Event, Lock, RLock, Thread
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import json
+import os
+import shutil
+import struct
+import warnings
+import numpy as np
+from dvx.index.base import BaseIndex, INDEX_META, pad_results, read_meta, validate_metric
+from dvx.index.flat import FlatIndex
+from dvx.store.wal import WriteAheadLog
+from dvx.utils.arrays import as_ids, as_subset, as_vectors
+from dvx.utils.similarity import SIMILARITY_METRICS, top_k
+
+_ADD = 1
+_REMOVE = 2
+_REPLACE = 3
+_OP = struct.Struct('<BII')
+
+
+class Segment:
+    """
+    An immutable, memory-mapped FlatIndex on disk plus the ids deleted from it since it was written
+
+    The rows never change, but the tombstones do: deleted and its cached
+    array are only read or written under the owning SegmentedIndex's lock.
+    """
+
+    __slots__ = ('name', 'index', 'deleted', '_deleted_ids')
+
+    def __init__(self, name: str, index: FlatIndex, deleted: Iterable[int] = ()) -> None:
+        self.name = name
+        self.index = index
+        self.deleted: Set[int] = set(deleted)
+        self._deleted_ids: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.index) - len(self.deleted)
+
+    def delete(self, id: int) -> None:
+        self.deleted.add(id)
+        self._deleted_ids = None
+
+    @property
+    def deleted_ids(self) -> np.ndarray:
+        if self._deleted_ids is None:
+            self._deleted_ids = np.array(sorted(self.deleted), dtype=np.int64)
+        return self._deleted_ids
+
+    def live_ids(self) -> np.ndarray:
+        return self.index.ids[~np.isin(self.index.ids, self.deleted_ids)]
+
+    def live(self, deleted: Set[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and vectors of the rows not in deleted, a copy of the tombstones taken under the lock"""
+        keep = ~np.isin(self.index.ids, np.fromiter(deleted, dtype=np.int64, count=len(deleted)))
+        return self.index.ids[keep], self.index.vectors[keep]
+
+
+class SegmentedIndex(BaseIndex):
+    """
+    Durable vector index made of a write-ahead log, a memtable and immutable segments
+
+    Every add() and remove() is appended to a write-ahead log before it is
+    applied, so acknowledged writes survive a crash. New vectors go to an
+    in-memory FlatIndex (the memtable); once it holds flush_size vectors it
+    is written out as a new segment, a FlatIndex directory that is never
+    modified again and is memory-mapped from then on, and the log starts
+    afresh. Inserting therefore never rewrites existing index files.
+
+    Removing a vector that is already in a segment records a tombstone
+    against that segment. Searches query the memtable and every segment,
+    asking each segment for extra results to cover its tombstones, or,
+    once it has more than k of them, restricting it to its live ids, and
+    merge the results. When there are more than max_segments segments, a
+    background thread merges the smallest ones, together with any segment
+    that is mostly tombstones, into one new segment without the deleted
+    rows. compact() merges everything in the foreground.
+
+    The list of segments, their tombstones and the current log live in
+    path/index.json, which is replaced atomically. Opening an existing
+    directory loads the segments, replays the log, truncating a torn final
+    record, and removes files left behind by an interrupted flush or merge.
+
+    Args:
+        path: Directory of the index, created if missing
+        dim: Dimension of the vectors; required for a new index, checked for an existing one
+        metric: Similarity metric of a new index ('dot_product', 'cosine', 'l1', 'l2')
+        flush_size: Number of memtable vectors that triggers a flush to a segment
+        max_segments: Number of segments above which a background merge starts
+        merge_factor: Number of segments merged at a time in the background
+        sync: fsync the log after every write
+        background: Merge segments in a background thread; otherwise only compact() merges
+    """
+
+    def __init__(self,
+                 path: str,
+                 dim: Optional[int] = None,
+                 metric: str = 'cosine',
+                 flush_size: int = 50000,
+                 max_segments: int = 8,
+                 merge_factor: int = 4,
+                 sync: bool = True,
+                 background: bool = True) -> None:
+        if merge_factor < 2:
+            raise ValueError('merge_factor must be at least 2')
+        self.path = path
+        self.flush_size = flush_size
+        self.max_segments = max_segments
+        self.merge_factor = merge_factor
+        self.sync = sync
+        self.compaction_error: Optional[BaseException] = None
+        self._lock = RLock()
+        self._merge_lock = Lock()
+        self._segments: List[Segment] = []
+        self._where: Dict[int, Optional[str]] = {}
+        self._next_file = 0
+
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, INDEX_META)):
+            self._open(dim)
+        else:
+            if dim is None:
+                raise ValueError('dim is required to create a new SegmentedIndex')
+            validate_metric(metric)
+            self.dim, self.metric = dim, metric
+            self._memtable = FlatIndex(dim, metric)
+            self._wal = WriteAheadLog(os.path.join(path, self._new_name('wal') + '.log'), sync)
+            self._write_meta()
+
+        self._merge_requested = Event()
+        self._stopping = False
+        self._worker: Optional[Thread] = None
+        if background:
+            self._worker = Thread(target=self._merge_loop, name='dvx-segment-merge', daemon=True)
+            self._worker.start()
+            self._maybe_merge()
+
+    def _new_name(self, prefix: str) -> str:
+        name = f'{prefix}-{self._next_file:06d}'
+        self._next_file += 1
+        return name
+
+    def _write_meta(self) -> None:
+        meta = {'type': 'SegmentedIndex', 'dim': self.dim, 'metric': self.metric, 'next_file': self._next_file,
+                'wal': os.path.basename(self._wal.path),
+                'segments': [{'name': segment.name, 'deleted': sorted(segment.deleted)}
+                             for segment in self._segments]}
+        meta_path = os.path.join(self.path, INDEX_META)
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(meta, file)
+            file.flush()
+            if self.sync:
+                os.fsync(file.fileno())
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def _open(self, dim: Optional[int]) -> None:
+        meta = read_meta(self.path)
+        if dim is not None and dim != meta['dim']:
+            raise ValueError(f"Index at {self.path} has dimension {meta['dim']}, not {dim}")
+        self.dim, self.metric = meta['dim'], meta['metric']
+        self._next_file = meta['next_file']
+        for entry in meta['segments']:
+            index = FlatIndex.load(os.path.join(self.path, entry['name']), mmap=True)
+            segment = Segment(entry['name'], index, entry['deleted'])
+            self._segments.append(segment)
+            self._where.update(dict.fromkeys(segment.live_ids().tolist(), segment.name))
+
+        # Anything not named in index.json was left by a flush or merge that never committed
+        known = {segment.name for segment in self._segments} | {meta['wal'], INDEX_META}
+        for name in os.listdir(self.path):
+            if name not in known:
+                target = os.path.join(self.path, name)
+                if os.path.isdir(target):
+                    shutil.rmtree(target, ignore_errors=True)
+                else:
+                    os.remove(target)
+
+        self._memtable = FlatIndex(self.dim, self.metric)
+        self._wal = WriteAheadLog(os.path.join(self.path, meta['wal']), self.sync)
+        for record in self._wal.replay():
+            op, n, dim = _OP.unpack_from(record)
+            ids = np.frombuffer(record, dtype=np.int64, count=n, offset=_OP.size)
+            if op == _REMOVE:
+                self._apply_remove(ids)
+                continue
+            vectors = np.frombuffer(record, dtype=np.float32, offset=_OP.size + 8 * n).reshape(n, dim)
+            if op == _REPLACE:
+                self._apply_remove(ids)
+            self._apply_add(ids, vectors)
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, id: int) -> bool:
+        return int(id) in self._where
+
+    @property
+    def segments(self) -> List[Segment]:
+        return list(self._segments)
+
+    @property
+    def ids(self) -> np.ndarray:
+        """Ids of every live vector, in no particular order"""
+        with self._lock:
+            return np.fromiter(self._where, dtype=np.int64, count=len(self._where))
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """
+        Log and add a batch of vectors.
+
+        Args:
+            ids: Integer ids of shape (n,)
+            vectors: Array of shape (n, dim)
+        """
+        ids = as_ids(ids)
+        vectors = as_vectors(vectors, self.dim)
+        if len(ids) != len(vectors):
+            raise ValueError('ids and vectors must have the same length')
+        with self._lock:
+            if len(np.unique(ids)) != len(ids) or any(id in self._where for id in ids.tolist()):
+                raise ValueError('ids must be unique and not already in the index')
+            self._wal.append(_OP.pack(_ADD, len(ids), self.dim) + ids.tobytes() + vectors.tobytes())
+            self._apply_add(ids, vectors)
+            if len(self._memtable) >= self.flush_size:
+                self.flush()
+
+    def replace(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """
+        Log and add a batch of vectors, removing any already stored under the same ids.
+
+        The removal and the addition are one log record, so a crash cannot
+        leave an id with its old vector gone and no new one.
+
+        Args:
+            ids: Integer ids of shape (n,)
+            vectors: Array of shape (n, dim)
+        """
+        ids = as_ids(ids)
+        vectors = as_vectors(vectors, self.dim)
+        if len(ids) != len(vectors):
+            raise ValueError('ids and vectors must have the same length')
+        if len(np.unique(ids)) != len(ids):
+            raise ValueError('ids must be unique')
+        with self._lock:
+            self._wal.append(_OP.pack(_REPLACE, len(ids), self.dim) + ids.tobytes() + vectors.tobytes())
+            self._apply_remove(ids)
+            self._apply_add(ids, vectors)
+            if len(self._memtable) >= self.flush_size:
+                self.flush()
+
+    def _apply_add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        self._memtable.add(ids, vectors)
+        self._where.update(dict.fromkeys(ids.tolist()))
+
+    def remove(self, ids: np.ndarray) -> int:
+        """Log and remove vectors by id, returning how many were removed. Unknown ids are ignored."""
+        ids = as_ids(ids)
+        with self._lock:
+            ids = np.array([id for id in ids.tolist() if id in self._where], dtype=np.int64)
+            if not len(ids):
+                return 0
+            self._wal.append(_OP.pack(_REMOVE, len(ids), 0) + ids.tobytes())
+            return self._apply_remove(ids)
+
+    def _apply_remove(self, ids: np.ndarray) -> int:
+        segments = {segment.name: segment for segment in self._segments}
+        memtable_ids = []
+        removed = 0
+        for id in ids.tolist():
+            if id not in self._where:
+                continue
+            name = self._where.pop(id)
+            removed += 1
+            if name is None:
+                memtable_ids.append(id)
+            else:
+                segments[name].delete(id)
+        if memtable_ids:
+            self._memtable.remove(np.asarray(memtable_ids, dtype=np.int64))
+        return removed
+
+    def search(self, queries: np.ndarray, k: int = 10, subset: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k best live vectors for each query across the memtable and all segments.
+
+        Args:
+            queries: Array of shape (n, dim) or (dim,)
+            k: Number of results per query
+            subset: Optional ids to restrict the search to
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: ids and scores of shape (n, k)
+        """
+        queries = as_vectors(queries, self.dim)
+        if subset is not None:
+            subset = as_subset(subset)
+        worst = -np.inf if self.metric in SIMILARITY_METRICS else np.inf
+        with self._lock:
+            parts = [self._memtable.search(queries, k, subset=subset)] if len(self._memtable) else []
+            for segment in self._segments:
+                if not len(segment):
+                    continue
+                if len(segment.deleted) > k:
+                    # Over-fetching by this many tombstones would approach a full sort of the segment's
+                    # scores; restrict the search to its live ids instead, at the cost of one pass over them
+                    live = segment.live_ids()
+                    ids, scores = segment.index.search(
+                        queries, k, subset=live if subset is None else np.intersect1d(live, subset))
+                    parts.append((ids, scores))
+                    continue
+                # Over-fetch by the number of tombstones, so k live results remain after dropping them
+                ids, scores = segment.index.search(queries, k + len(segment.deleted), subset=subset)
+                if segment.deleted:
+                    dead = np.isin(ids, segment.deleted_ids)
+                    ids[dead], scores[dead] = -1, worst
+                parts.append((ids, scores))
+        if not parts:
+            return pad_results(np.empty((len(queries), 0), dtype=np.int64),
+                               np.empty((len(queries), 0), dtype=np.float32), k, self.metric)
+        ids = np.concatenate([part[0] for part in parts], axis=1)
+        scores = np.concatenate([part[1] for part in parts], axis=1)
+        order, scores = top_k(scores, k, metric=self.metric)
+        return pad_results(np.take_along_axis(ids, order, axis=1), scores, k, self.metric)
+
+    def flush(self) -> None:
+        """Write the memtable out as a new segment and start a new log"""
+        with self._lock:
+            if len(self._memtable):
+                name = self._new_name('segment')
+                self._memtable.save(os.path.join(self.path, name))
+                segment = Segment(name, FlatIndex.load(os.path.join(self.path, name), mmap=True))
+                self._segments.append(segment)
+                self._where.update(dict.fromkeys(segment.index.ids.tolist(), name))
+                self._memtable = FlatIndex(self.dim, self.metric)
+            old_wal = self._wal
+            self._wal = WriteAheadLog(os.path.join(self.path, self._new_name('wal') + '.log'), self.sync)
+            # The new segment and tombstones are committed here; until then the old log still holds them
+            self._write_meta()
+            old_wal.close()
+            os.remove(old_wal.path)
+        self._maybe_merge()
+
+    def _merge_candidates(self, everything: bool) -> List[Segment]:
+        with self._lock:
+            segments = list(self._segments)
+        if everything:
+            return segments if len(segments) > 1 or any(segment.deleted for segment in segments) else []
+        mostly_deleted = [segment for segment in segments if len(segment.deleted) * 2 > len(segment.index)]
+        if len(segments) <= self.max_segments and not mostly_deleted:
+            return []
+        rest = sorted((segment for segment in segments if segment not in mostly_deleted), key=len)
+        chosen = mostly_deleted + rest[:max(self.merge_factor - len(mostly_deleted), 0)]
+        return chosen if len(chosen) > 1 or mostly_deleted else []
+
+    def _merge(self, everything: bool) -> bool:
+        """Replace the chosen segments with one segment holding their live rows; False if none needed merging"""
+        with self._merge_lock:
+            segments = self._merge_candidates(everything)
+            if segments:
+                self._merge_segments(segments)
+            return bool(segments)
+
+    def _merge_segments(self, segments: List[Segment]) -> None:
+        with self._lock:
+            snapshot = {segment.name: set(segment.deleted) for segment in segments}
+            name = self._new_name('segment')
+        # The rows of a segment never change, so its live rows can be copied without holding the lock, as
+        # long as only the snapshot of its tombstones is read: remove() keeps adding to segment.deleted
+        live = [segment.live(snapshot[segment.name]) for segment in segments]
+        ids = np.concatenate([part[0] for part in live])
+        merged = FlatIndex(self.dim, self.metric, capacity=max(len(ids), 1))
+        if len(ids):
+            merged.add(ids, np.concatenate([part[1] for part in live]))
+        merged.save(os.path.join(self.path, name))
+        merged = Segment(name, FlatIndex.load(os.path.join(self.path, name), mmap=True))
+
+        with self._lock:
+            names = {segment.name for segment in segments}
+            # Ids deleted while the merge ran are still present in the merged rows
+            for segment in segments:
+                for id in segment.deleted - snapshot[segment.name]:
+                    merged.delete(id)
+            position = min(i for i, segment in enumerate(self._segments) if segment.name in names)
+            self._segments = [segment for segment in self._segments if segment.name not in names]
+            if len(merged.index):
+                self._segments.insert(position, merged)
+            for id in ids.tolist():
+                if self._where.get(id, '') in names:
+                    self._where[id] = name
+            self._write_meta()
+        for segment in segments:
+            shutil.rmtree(os.path.join(self.path, segment.name), ignore_errors=True)
+        if not len(merged.index):
+            shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def compact(self) -> None:
+        """Flush the memtable and merge every segment into one, dropping all tombstones"""
+        self.flush()
+        self._merge(everything=True)
+
+    def _maybe_merge(self) -> None:
+        if self._worker is not None and self._merge_candidates(everything=False):
+            self._merge_requested.set()
+
+    def _merge_loop(self) -> None:
+        while True:
+            self._merge_requested.wait()
+            self._merge_requested.clear()
+            if self._stopping:
+                return
+            try:
+                while not self._stopping and self._merge(everything=False):
+                    pass
+            except Exception as e:
+                self.compaction_error = e
+                warnings.warn(f'Segment merge in {self.path} failed: {type(e).__name__}: {e}', RuntimeWarning)
+
+    def close(self) -> None:
+        """Stop the merge thread and close the log; everything logged is already durable"""
+        if self._worker is not None:
+            self._stopping = True
+            self._merge_requested.set()
+            self._worker.join()
+            self._worker = None
+        self._wal.close()
+
+    def save(self, path: str) -> None:
+        """Flush, then copy the index to the directory at path (a flush only, if path is this index's own)"""
+        self.flush()
+        if os.path.abspath(path) == os.path.abspath(self.path):
+            return
+        with self._lock:
+            os.makedirs(path, exist_ok=True)
+            for segment in self._segments:
+                shutil.copytree(os.path.join(self.path, segment.name), os.path.join(path, segment.name),
+                                dirs_exist_ok=True)
+            open(os.path.join(path, os.path.basename(self._wal.path)), 'wb').close()
+            shutil.copyfile(os.path.join(self.path, INDEX_META), os.path.join(path, INDEX_META))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, **kwargs: Any) -> 'SegmentedIndex':
+        """Open the index at path; segments are always memory-mapped"""
+        return cls(path, **kwargs)
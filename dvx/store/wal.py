@@ -0,0 +1,74 @@
+from typing import Iterator
+import os
+import struct
+import warnings
+import zlib
+
+_HEADER = struct.Struct('<II')
+
+
+class WriteAheadLog:
+    """
+    Append-only log of length-prefixed, CRC32-checked records
+
+    Each record is written as its payload length and CRC32, followed by the
+    payload, and is flushed (and, with sync=True, fsynced) before append()
+    returns, so an acknowledged write survives a crash. A crash mid-append
+    leaves at most one torn record at the end of the file, which replay()
+    detects by its length or checksum and truncates away.
+
+    Args:
+        path: Log file, created if missing
+        sync: fsync after every append
+    """
+
+    def __init__(self, path: str, sync: bool = True) -> None:
+        self.path = path
+        self.sync = sync
+        self._file = open(path, 'ab')
+
+    def append(self, payload: bytes) -> None:
+        self._file.write(_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+
+    def replay(self) -> Iterator[bytes]:
+        """
+        Yield the payload of every intact record in order.
+
+        Reading stops at the first torn or corrupt record, and the file is
+        truncated there so that later appends follow the last good record.
+        Call this before appending.
+        """
+        good = 0
+        with open(self.path, 'rb') as file:
+            while True:
+                header = file.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    break
+                length, crc = _HEADER.unpack(header)
+                payload = file.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+                good += _HEADER.size + length
+                yield payload
+        if good < os.path.getsize(self.path):
+            warnings.warn(f'Truncating {os.path.getsize(self.path) - good} bytes of torn records from {self.path}')
+            self._file.flush()
+            os.truncate(self.path, good)
+
+    def reset(self) -> None:
+        """Empty the log"""
+        self._file.truncate(0)
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the log in bytes"""
+        return os.fstat(self._file.fileno()).st_size
@@ -0,0 +1,45 @@
+import numpy as np
+
+
+def as_ids(ids) -> np.ndarray:
+    """Convert ids to a 1-D int64 array"""
+    ids = np.asarray(ids, dtype=np.int64)
+    if ids.ndim == 0:
+        ids = ids[None]
+    if ids.ndim != 1:
+        raise ValueError('ids must be a scalar or a 1-D array')
+    return ids
+
+
+def as_subset(ids) -> np.ndarray:
+    """Convert a search subset to a sorted, duplicate-free int64 array"""
+    return np.unique(as_ids(ids))
+
+
+def in_subset(ids: np.ndarray, subset: np.ndarray) -> np.ndarray:
+    """Boolean mask of the entries of ids found in the sorted array subset"""
+    if not len(subset):
+        return np.zeros(len(ids), dtype=bool)
+    pos = np.minimum(np.searchsorted(subset, ids), len(subset) - 1)
+    return subset[pos] == ids
+
+
+def as_vectors(vectors, dim: int) -> np.ndarray:
+    """Convert vectors to a C-contiguous (n, dim) float32 array"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    if vectors.ndim != 2 or vectors.shape[1] != dim:
+        raise ValueError(f'Expected vectors of dimension {dim}, got shape {vectors.shape}')
+    return vectors
+
+
+def grow(array: np.ndarray, size: int) -> np.ndarray:
+    """Return array with room for at least size rows, doubling its capacity as needed"""
+    capacity = array.shape[0]
+    if size <= capacity:
+        return array
+    capacity = max(size, 2 * capacity, 16)
+    grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:array.shape[0]] = array
+    return grown
@@ -0,0 +1,161 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+import hashlib
+import sqlite3
+import numpy as np
+
+
+class LRUCache:
+    """Thread-safe, bounded least-recently-used mapping"""
+
+    def __init__(self, maxsize: int = 65536) -> None:
+        if maxsize <= 0:
+            raise ValueError('maxsize must be positive')
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed embedding cache backed by SQLite
+
+    Vectors are stored as float32 blobs under a hash of (model id, text) and
+    evicted least-recently-used first once their total size exceeds max_bytes.
+
+    Args:
+        path: SQLite database file, or ':memory:' for a process-local cache
+        max_bytes: Upper bound on the total size of stored vectors
+    """
+
+    def __init__(self, path: str = ':memory:', max_bytes: int = 1 << 30) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS embeddings '
+                           '(key BLOB PRIMARY KEY, vector BLOB NOT NULL, used INTEGER NOT NULL)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS embeddings_used ON embeddings (used)')
+        total, clock = self._conn.execute(
+            'SELECT COALESCE(SUM(LENGTH(vector)), 0), COALESCE(MAX(used), 0) FROM embeddings').fetchone()
+        self._bytes = total
+        self._clock = clock
+
+    @staticmethod
+    def key(model_id: str, text: str) -> bytes:
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(model_id.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        return digest.digest()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def get_many(self, keys: Sequence[bytes]) -> List[Optional[np.ndarray]]:
+        """Look up vectors by key, returning None for misses and marking hits as recently used"""
+        found: Dict[bytes, np.ndarray] = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                batch = list(keys[i:i + 500])
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f'SELECT key, vector FROM embeddings WHERE key IN ({placeholders})', batch).fetchall()
+                found.update((key, np.frombuffer(vector, dtype=np.float32)) for key, vector in rows)
+            if found:
+                self._clock += 1
+                self._conn.executemany('UPDATE embeddings SET used = ? WHERE key = ?',
+                                       [(self._clock, key) for key in found])
+                self._conn.commit()
+            # Counted per key looked up, so a key repeated in the batch is a hit every time it is found
+            hits = sum(key in found for key in keys)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return [found.get(key) for key in keys]
+
+    def put_many(self, keys: Sequence[bytes], vectors: np.ndarray) -> None:
+        """Store vectors under keys, then evict least-recently-used entries beyond max_bytes"""
+        # A key repeated in the batch is stored once, with its last vector
+        entries = dict(zip(keys, (np.ascontiguousarray(vector, dtype=np.float32).tobytes() for vector in vectors)))
+        unique = list(entries)
+        with self._lock:
+            self._clock += 1
+            replaced = 0
+            for i in range(0, len(unique), 500):
+                batch = unique[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                replaced += self._conn.execute(
+                    f'SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings WHERE key IN ({placeholders})',
+                    batch).fetchone()[0]
+            self._conn.executemany('INSERT OR REPLACE INTO embeddings (key, vector, used) VALUES (?, ?, ?)',
+                                   [(key, blob, self._clock) for key, blob in entries.items()])
+            self._bytes += sum(len(blob) for blob in entries.values()) - replaced
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes:
+            rows = self._conn.execute(
+                'SELECT key, LENGTH(vector) FROM embeddings ORDER BY used LIMIT 256').fetchall()
+            if not rows:
+                break
+            excess = self._bytes - self.max_bytes
+            victims = []
+            for key, size in rows:
+                victims.append((key,))
+                excess -= size
+                self._bytes -= size
+                if excess <= 0:
+                    break
+            self._conn.executemany('DELETE FROM embeddings WHERE key = ?', victims)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute('DELETE FROM embeddings')
+            self._conn.commit()
+            self._bytes = 0
+
+    def close(self) -> None:
+        self._conn.close()
@@ -1,4 +1,19 @@
-from dvx.utils.similarity import SemanticScore
+from typing import Optional
+import re
+import numpy as np
+from dvx.core.encoder import BaseEncoder
+from dvx.utils import instrument
+from dvx.utils.similarity import SemanticScore, paired_scores
+
+# Matches one sentence of sentence_based_chunk() with surrounding whitespace stripped
+_SENTENCE = re.compile(r'[^.\s](?:[^.]*\.|(?:[^.]*[^.\s])?)')
+
+# Lookup table of the code points str.split() treats as whitespace; the last
+# entry stands for every code point above the table
+_SPACE_CHARS = '\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005' \
+               '\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000'
+_IS_SPACE = np.zeros(0x3002, dtype=bool)
+_IS_SPACE[[ord(char) for char in _SPACE_CHARS]] = True
 
 
 def fixed_size_chunk(text: str, chunk_size: int = 50) -> list[str]:
@@ -30,6 +45,47 @@ def semantic_similarity_score(sentence1: str,
     return score
 
 
+def _group_starts(sentences: list[str],
+                  tokenizer: str,
+                  metric: str,
+                  threshold: float,
+                  chunk_size: int,
+                  encoder: Optional[BaseEncoder]) -> list[int]:
+    """Index of the first sentence of every semantic group, in order"""
+    if encoder is None:
+        encoder = SemanticScore(tokenizer=tokenizer, metric=metric)
+    instrument.count('sentences', len(sentences))
+    with instrument.stage('encode'):
+        vectors = encoder.encode_batch(sentences)
+    scores = paired_scores(vectors[:-1], vectors[1:], metric=metric)
+    if metric in ['l1', 'l2']:
+        similar = (scores < threshold).tolist()
+    else:
+        similar = (scores > threshold).tolist()
+
+    starts = [0]
+    for i, is_similar in enumerate(similar, start=1):
+        if not is_similar or i - starts[-1] >= chunk_size:
+            starts.append(i)
+    return starts
+
+
+def _select_threshold(metric: str,
+                      dot_product_threshold: float,
+                      cosine_threshold: float,
+                      l1_threshold: float,
+                      l2_threshold: float) -> float:
+    if metric == 'dot_product':
+        return dot_product_threshold
+    elif metric == 'cosine':
+        return cosine_threshold
+    elif metric == 'l1':
+        return l1_threshold
+    elif metric == 'l2':
+        return l2_threshold
+    raise ValueError(f'Invalid similarity metric: {metric}')
+
+
 def semantic_sentence_chunk(text: str, 
                   tokenizer: str = 'bert-base-uncased', 
                   metric: str = 'cosine',
@@ -37,9 +93,14 @@ def semantic_sentence_chunk(text: str,
                   cosine_threshold: float = 0.5, 
                   l1_threshold: float = 10000.0,
                   l2_threshold: float = 1000.0,
-                  chunk_size: int = 5) -> list[str]:
+                  chunk_size: int = 5,
+                  encoder: Optional[BaseEncoder] = None) -> list[str]:
     """
     Split text on the basis of semantics
+
+    Every sentence is encoded once, in a single batch, and the similarities
+    of all adjacent sentence pairs are computed in one vectorized call before
+    sentences are grouped.
     
     Args:
         text: Input text to be chunked
@@ -47,59 +108,89 @@ def semantic_sentence_chunk(text: str,
         metric: Similarity metric to use ('dot_product', 'cosine', 'l1', 'l2')
         *_threshold: Threshold values for different metrics
         chunk_size: Maximum size of each chunk in sentences
+        encoder: Encoder used to embed sentences; defaults to padded token ids from tokenizer
     """
     if not text.strip():
         return []
 
-    if metric == 'dot_product':
-        threshold = dot_product_threshold
-    elif metric == 'cosine':
-        threshold = cosine_threshold
-    elif metric == 'l1':
-        threshold = l1_threshold
-    elif metric == 'l2':
-        threshold = l2_threshold
-    else:
-        raise ValueError(f'Invalid similarity metric: {metric}')
+    threshold = _select_threshold(metric, dot_product_threshold, cosine_threshold, l1_threshold, l2_threshold)
 
     sentences = sentence_based_chunk(text)
     if not sentences:
         return []
 
-    chunks = []
-    calc = SemanticScore(tokenizer=tokenizer, metric=metric)
-    
-    current_chunk = []
-    current_size = 0
-    
-    for i in range(len(sentences)):
-        if not sentences[i].strip():
-            continue
-            
-        if not current_chunk:
-            current_chunk.append(sentences[i])
-            current_size = 1
-            continue
-            
-        score = calc.calculate(current_chunk[-1], sentences[i])
-        
-        if metric in ['l1', 'l2']:
-            is_similar = score < threshold
-        else:
-            is_similar = score > threshold
-            
-        if is_similar and current_size < chunk_size:
-            current_chunk.append(sentences[i])
-            current_size += 1
-        else:
-            chunks.append(' '.join(current_chunk))
-            current_chunk = [sentences[i]]
-            current_size = 1
-    
-    if current_chunk:
-        chunks.append(' '.join(current_chunk))
+    starts = _group_starts(sentences, tokenizer, metric, threshold, chunk_size, encoder)
+    return [' '.join(sentences[i:j]) for i, j in zip(starts, starts[1:] + [len(sentences)])]
+
+
+def _word_spans(text: str) -> np.ndarray:
+    """(start, end) offsets of the words of text.split(), found with array operations over code points"""
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+    space = _IS_SPACE[np.minimum(codes, len(_IS_SPACE) - 1)]
+    word = ~space
+    starts = np.flatnonzero(word & np.concatenate(([True], space[:-1])))
+    ends = np.flatnonzero(word & np.concatenate((space[1:], [True]))) + 1
+    return np.column_stack([starts, ends]).astype(np.int64)
 
-    return chunks
+
+def fixed_size_spans(text: str, chunk_size: int = 50) -> np.ndarray:
+    """
+    Offsets of the chunks of fixed_size_chunk(), as an (n, 2) array of (start, end)
+
+    Each span runs from the first to the last character of its words, so the
+    source whitespace between words is kept rather than collapsed.
+    """
+    words = _word_spans(text)
+    last = np.minimum(np.arange(chunk_size - 1, len(words) + chunk_size - 1, chunk_size), len(words) - 1)
+    return np.column_stack([words[::chunk_size, 0], words[last, 1]]).astype(np.int64)
+
+
+def sentence_spans(text: str) -> np.ndarray:
+    """
+    Offsets of the sentences of sentence_based_chunk(), as an (n, 2) array of (start, end)
+
+    A sentence's span includes its closing '.', if the text has one.
+    """
+    return np.array([match.span() for match in _SENTENCE.finditer(text)], dtype=np.int64).reshape(-1, 2)
+
+
+def paragraph_spans(text: str) -> np.ndarray:
+    """Offsets of the paragraphs of paragraph_based_chunk(), as an (n, 2) array of (start, end)"""
+    spans = []
+    offset = 0
+    for piece in text.split('\n\n'):
+        stripped = piece.strip()
+        if stripped:
+            start = offset + len(piece) - len(piece.lstrip())
+            spans.append((start, start + len(stripped)))
+        offset += len(piece) + 2
+    return np.array(spans, dtype=np.int64).reshape(-1, 2)
+
+
+def semantic_sentence_spans(text: str,
+                            tokenizer: str = 'bert-base-uncased',
+                            metric: str = 'cosine',
+                            dot_product_threshold: float = 1000.0,
+                            cosine_threshold: float = 0.5,
+                            l1_threshold: float = 10000.0,
+                            l2_threshold: float = 1000.0,
+                            chunk_size: int = 5,
+                            encoder: Optional[BaseEncoder] = None) -> np.ndarray:
+    """
+    Offsets of the chunks of semantic_sentence_chunk(), as an (n, 2) array of (start, end)
+
+    Groups are decided exactly as in semantic_sentence_chunk(); each span runs
+    from the start of a group's first sentence to the end of its last.
+    """
+    threshold = _select_threshold(metric, dot_product_threshold, cosine_threshold, l1_threshold, l2_threshold)
+    spans = sentence_spans(text)
+    if not len(spans):
+        return spans
+    # Rebuild the exact sentence strings of sentence_based_chunk() so the encoder sees the same input
+    sentences = [text[start:end].removesuffix('.').strip() + '.' for start, end in spans.tolist()]
+    starts = np.array(_group_starts(sentences, tokenizer, metric, threshold, chunk_size, encoder))
+    ends = np.append(starts[1:], len(spans)) - 1
+    return np.column_stack([spans[starts, 0], spans[ends, 1]])
 
 
 sample_text = """
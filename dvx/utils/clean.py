@@ -1,4 +1,148 @@
 import re
+from typing import Iterable, Iterator
+
+# Characters outside printable ASCII other than newline. Non-ASCII characters
+# are dropped by an ASCII encode, the remaining control characters by this table.
+_CONTROL_CHARS = {i: None for i in [*range(0x20), 0x7F] if i != ord('\n')}
+
+# Runs of 4+ non-word characters or digits, or a single stray symbol. Matching
+# both in one alternation is equivalent to removing the runs first and the
+# symbols second, since every symbol but '_' is itself a non-word character.
+_GARBLED = re.compile(r'(?:\W|\d){4,}|[~`@#$%^&*+=|<>/\[\]\{\}_]')
+_SINGLE_CHARS = re.compile(r'\b[a-zA-Z0-9]\b')
+_HYPHENATED = re.compile(r'-\n(\w+)')
+_BLANK_LINES = re.compile(r'\n\s*\n')
+_SPACES = re.compile(r'\s+')
+
+# Streaming cuts are made inside a run of 4+ letters: no cleaning pass can
+# delete those letters or see past them, so both halves clean independently.
+_SAFE_CUT = re.compile(r'[a-zA-Z]{4}')
+
+
+def _remove_non_printable(text: str) -> str:
+    return text.encode('ascii', 'ignore').decode('ascii').translate(_CONTROL_CHARS)
+
+
+def remove_garbled_text(text: str, strip: bool = False) -> str:
+    """
+    Remove garbled text, encoding artifacts, and symbols while preserving newlines.
+
+    Drops characters outside printable ASCII, runs of four or more
+    non-word characters or digits, stray symbols, and isolated single
+    characters, in that order.
+
+    Args:
+        text (str): The raw text to clean.
+        strip (bool): Whether to strip leading and trailing whitespace from the result.
+
+    Returns:
+        str: Cleaned text with garbled content removed.
+    """
+    text = _remove_non_printable(text)
+    text = _GARBLED.sub('', text)
+    text = _SINGLE_CHARS.sub('', text)
+    return text.strip() if strip else text
+
+
+class GarbledTextCleaner:
+    """
+    Incremental version of remove_garbled_text for streaming input.
+
+    Text passed to feed() is cleaned up to the last point where a cut cannot
+    change the result; the remainder is held back until more text or flush()
+    arrives. Concatenating every returned piece gives exactly
+    remove_garbled_text() of the concatenated input.
+    """
+
+    def __init__(self, min_chunk: int = 4096) -> None:
+        self.min_chunk = min_chunk
+        self._buffer = ''
+
+    def feed(self, text: str) -> str:
+        self._buffer += _remove_non_printable(text)
+        if len(self._buffer) < self.min_chunk:
+            return ''
+        cut = None
+        for match in _SAFE_CUT.finditer(self._buffer, len(self._buffer) // 2):
+            cut = match.start() + 2
+        if cut is None:
+            return ''
+        head, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        return _SINGLE_CHARS.sub('', _GARBLED.sub('', head))
+
+    def flush(self) -> str:
+        head, self._buffer = self._buffer, ''
+        return _SINGLE_CHARS.sub('', _GARBLED.sub('', head))
+
+
+def iter_clean(chunks: Iterable[str]) -> Iterator[str]:
+    """Apply remove_garbled_text across a stream of text chunks, yielding cleaned pieces."""
+    cleaner = GarbledTextCleaner()
+    for chunk in chunks:
+        cleaned = cleaner.feed(chunk)
+        if cleaned:
+            yield cleaned
+    cleaned = cleaner.flush()
+    if cleaned:
+        yield cleaned
+
+
+CONTRACTIONS = {
+    "aren't": "are not",
+    "can't": "cannot",
+    "couldn't": "could not",
+    "didn't": "did not",
+    "doesn't": "does not",
+    "don't": "do not",
+    "hadn't": "had not",
+    "hasn't": "has not",
+    "haven't": "have not",
+    "he'd": "he would",
+    "he'll": "he will",
+    "he's": "he is",
+    "i'd": "i would",
+    "i'll": "i will",
+    "i'm": "i am",
+    "i've": "i have",
+    "isn't": "is not",
+    "it's": "it is",
+    "let's": "let us",
+    "shouldn't": "should not",
+    "that's": "that is",
+    "there's": "there is",
+    "they'd": "they would",
+    "they'll": "they will",
+    "they're": "they are",
+    "they've": "they have",
+    "we'd": "we would",
+    "we're": "we are",
+    "we've": "we have",
+    "weren't": "were not",
+    "what's": "what is",
+    "where's": "where is",
+    "who's": "who is",
+    "won't": "will not",
+    "wouldn't": "would not",
+    "you'd": "you would",
+    "you'll": "you will",
+    "you're": "you are",
+    "you've": "you have"
+}
+
+_CONTRACTION_PATTERN = re.compile(r'\b(' + '|'.join(CONTRACTIONS) + r')\b', re.IGNORECASE)
+
+
+def _replace_contraction(match: re.Match) -> str:
+    word = match.group(0)
+    return CONTRACTIONS.get(word.lower(), word)
+
+
+def fix_hyphenated_words(text: str) -> str:
+    """
+    Fix hyphenated words split across lines.
+    """
+    return _HYPHENATED.sub(r'\1', text)
+
 
 def clean(text: str) -> str:
     """
@@ -28,62 +172,15 @@ def whitespace(text: str) -> str:
     - Replacing multiple spaces with single space
     """
     text = text.strip()
-    text = re.sub(r'\n\s*\n', '\n', text)
-    text = re.sub(r'\s+', ' ', text)
+    text = _BLANK_LINES.sub('\n', text)
+    text = _SPACES.sub(' ', text)
     return text
 
 def expand(text: str) -> str:
     """
     Expand common contractions and shortened syllables.
     """
-    contractions = {
-        "aren't": "are not",
-        "can't": "cannot",
-        "couldn't": "could not",
-        "didn't": "did not",
-        "doesn't": "does not",
-        "don't": "do not",
-        "hadn't": "had not",
-        "hasn't": "has not",
-        "haven't": "have not",
-        "he'd": "he would",
-        "he'll": "he will",
-        "he's": "he is",
-        "i'd": "i would",
-        "i'll": "i will",
-        "i'm": "i am",
-        "i've": "i have",
-        "isn't": "is not",
-        "it's": "it is",
-        "let's": "let us",
-        "shouldn't": "should not",
-        "that's": "that is",
-        "there's": "there is",
-        "they'd": "they would",
-        "they'll": "they will",
-        "they're": "they are",
-        "they've": "they have",
-        "we'd": "we would",
-        "we're": "we are",
-        "we've": "we have",
-        "weren't": "were not",
-        "what's": "what is",
-        "where's": "where is",
-        "who's": "who is",
-        "won't": "will not",
-        "wouldn't": "would not",
-        "you'd": "you would",
-        "you'll": "you will",
-        "you're": "you are",
-        "you've": "you have"
-    }
-    
-    pattern = re.compile(r'\b(' + '|'.join(contractions.keys()) + r')\b', re.IGNORECASE)
-    
-    def replace(match):
-        word = match.group(0)
-        return contractions.get(word.lower(), word)   
-    return pattern.sub(replace, text)
+    return _CONTRACTION_PATTERN.sub(_replace_contraction, text)
 
 text = """Big data refers to large, diverse sets of information that grow at ever-increasing 
 rates. It encompasses the volume of information, the velocity or speed at which it 
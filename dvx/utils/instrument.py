@@ -0,0 +1,319 @@
+"""
+Lightweight instrumentation of the ingestion pipeline.
+
+Instrumented code calls stage() around the work it wants timed and count()
+for the quantities it processes. Both return immediately while
+instrumentation is disabled, which is the default, so the hooks can stay in
+hot paths. Once enabled, every stage records its call count, total, minimum
+and maximum time and, with trace_memory=True, its peak traced memory, and
+counters accumulate in one process-wide Stats object.
+
+    from dvx.utils import instrument
+
+    with instrument.collect(trace_memory=True) as stats:
+        parse('data/')
+    print(stats.report())
+    stats.to_json('parse-stats.json')
+
+Stages run in parse or PDF page worker processes are collected there and
+merged into the parent's stats, but hooks only see the stages that run
+in-process.
+"""
+from contextlib import contextmanager, nullcontext
+from threading import Lock, local
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+import json
+import time
+import tracemalloc
+import warnings
+
+
+class StageStats:
+    """Timing, and optionally memory, totals of one stage"""
+
+    __slots__ = ('calls', 'seconds', 'min_seconds', 'max_seconds', 'memory_peak')
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.seconds = 0.0
+        self.min_seconds = float('inf')
+        self.max_seconds = 0.0
+        self.memory_peak: Optional[int] = None
+
+    def add(self, seconds: float, memory_peak: Optional[int] = None, calls: int = 1) -> None:
+        self.calls += calls
+        self.seconds += seconds
+        self.min_seconds = min(self.min_seconds, seconds)
+        self.max_seconds = max(self.max_seconds, seconds)
+        if memory_peak is not None:
+            self.memory_peak = max(self.memory_peak or 0, memory_peak)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'calls': self.calls, 'seconds': self.seconds,
+                'mean_seconds': self.seconds / self.calls if self.calls else 0.0,
+                'min_seconds': self.min_seconds if self.calls else 0.0, 'max_seconds': self.max_seconds,
+                'memory_peak': self.memory_peak}
+
+
+class Stats:
+    """
+    Per-stage timings, counters and memory snapshots collected while instrumentation is enabled
+
+    Safe to update from several threads. Use to_dict() or to_json() to
+    export, report() for a readable table and merge() to combine stats
+    gathered in other processes.
+    """
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, StageStats] = {}
+        self.counters: Dict[str, int] = {}
+        self.snapshots: List[Tuple[str, List[str]]] = []
+        self._lock = Lock()
+
+    def record(self, stage: str, seconds: float, memory_peak: Optional[int] = None) -> None:
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats()
+            stats.add(seconds, memory_peak)
+
+    def add(self, counter: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def add_snapshot(self, label: str, lines: List[str]) -> None:
+        with self._lock:
+            self.snapshots.append((label, lines))
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages.clear()
+            self.counters.clear()
+            self.snapshots.clear()
+
+    def merge(self, other: Dict[str, Any]) -> None:
+        """Add stats exported with to_dict(), e.g. from a worker process"""
+        with self._lock:
+            for name, stage in other['stages'].items():
+                stats = self.stages.get(name)
+                if stats is None:
+                    stats = self.stages[name] = StageStats()
+                stats.calls += stage['calls']
+                stats.seconds += stage['seconds']
+                if stage['calls']:
+                    stats.min_seconds = min(stats.min_seconds, stage['min_seconds'])
+                stats.max_seconds = max(stats.max_seconds, stage['max_seconds'])
+                if stage['memory_peak'] is not None:
+                    stats.memory_peak = max(stats.memory_peak or 0, stage['memory_peak'])
+            for name, n in other['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + n
+            self.snapshots.extend((label, list(lines)) for label, lines in other['snapshots'])
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'stages': {name: stats.to_dict() for name, stats in self.stages.items()},
+                    'counters': dict(self.counters),
+                    'snapshots': [[label, list(lines)] for label, lines in self.snapshots]}
+
+    def to_json(self, path: Optional[str] = None) -> str:
+        """Serialise the stats as JSON, also writing them to path if given"""
+        text = json.dumps(self.to_dict(), indent=2)
+        if path is not None:
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(text)
+        return text
+
+    def report(self) -> str:
+        """Stages sorted by total time, followed by the counters"""
+        stats = self.to_dict()
+        lines = [f"{'stage':24} {'calls':>8} {'total s':>10} {'mean ms':>10} {'max ms':>10} {'peak MB':>9}"]
+        for name, stage in sorted(stats['stages'].items(), key=lambda item: -item[1]['seconds']):
+            peak = f"{stage['memory_peak'] / 2 ** 20:9.2f}" if stage['memory_peak'] is not None else f"{'-':>9}"
+            lines.append(f"{name:24} {stage['calls']:8} {stage['seconds']:10.3f} "
+                         f"{stage['mean_seconds'] * 1000:10.3f} {stage['max_seconds'] * 1000:10.3f} {peak}")
+        for name, n in sorted(stats['counters'].items()):
+            lines.append(f'{name:24} {n:8}')
+        return '\n'.join(lines)
+
+    def __repr__(self) -> str:
+        return f'Stats(stages={len(self.stages)}, counters={self.counters})'
+
+
+class StageEvent(NamedTuple):
+    """Passed to hooks when a stage ends"""
+    stage: str
+    seconds: float
+    memory_peak: Optional[int]
+    info: Dict[str, Any]
+
+
+_enabled = False
+_trace_memory = False
+_started_tracemalloc = False
+_stats = Stats()
+_hooks: List[Callable[[StageEvent], Any]] = []
+_local = local()
+_NULL = nullcontext()
+
+
+def _memory_frames() -> List['_Stage']:
+    frames = getattr(_local, 'frames', None)
+    if frames is None:
+        frames = _local.frames = []
+    return frames
+
+
+def _fold_peak(frames: List['_Stage']) -> int:
+    """Credit the traced peak since the last reset to every open stage, then start a new peak"""
+    current, peak = tracemalloc.get_traced_memory()
+    for frame in frames:
+        frame.memory_peak = max(frame.memory_peak, peak)
+    tracemalloc.reset_peak()
+    return current
+
+
+class _Stage:
+    __slots__ = ('name', 'info', 'start', 'memory_start', 'memory_peak')
+
+    def __init__(self, name: str, info: Dict[str, Any]) -> None:
+        self.name = name
+        self.info = info
+        self.memory_start: Optional[int] = None
+        self.memory_peak = 0
+
+    def __enter__(self) -> '_Stage':
+        if _trace_memory and tracemalloc.is_tracing():
+            frames = _memory_frames()
+            self.memory_start = self.memory_peak = _fold_peak(frames)
+            frames.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        seconds = time.perf_counter() - self.start
+        memory_peak = None
+        if self.memory_start is not None:
+            frames = _memory_frames()
+            if tracemalloc.is_tracing():
+                _fold_peak(frames)
+            if frames and frames[-1] is self:
+                frames.pop()
+            memory_peak = max(self.memory_peak - self.memory_start, 0)
+        _stats.record(self.name, seconds, memory_peak)
+        if _hooks:
+            event = StageEvent(self.name, seconds, memory_peak, self.info)
+            for hook in list(_hooks):
+                try:
+                    hook(event)
+                except Exception as e:
+                    warnings.warn(f'Instrumentation hook {hook!r} failed: {type(e).__name__}: {e}', RuntimeWarning)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def enable(trace_memory: bool = False) -> None:
+    """
+    Start collecting stats.
+
+    Args:
+        trace_memory: Also record each stage's peak memory with tracemalloc,
+            which slows allocation-heavy code down noticeably
+    """
+    global _enabled, _trace_memory, _started_tracemalloc
+    _enabled = True
+    _trace_memory = trace_memory
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+
+
+def disable() -> None:
+    """Stop collecting stats; what was collected so far is kept"""
+    global _enabled, _trace_memory, _started_tracemalloc
+    _enabled = False
+    _trace_memory = False
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+
+
+def stats() -> Stats:
+    """The process-wide stats object"""
+    return _stats
+
+
+def reset() -> None:
+    _stats.reset()
+
+
+def add_hook(hook: Callable[[StageEvent], Any]) -> None:
+    """Call hook with a StageEvent whenever a stage ends while instrumentation is enabled"""
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Callable[[StageEvent], Any]) -> None:
+    _hooks.remove(hook)
+
+
+def stage(name: str, **info: Any) -> Any:
+    """
+    Context manager timing one run of a stage.
+
+    Keyword arguments are passed to hooks as the event's info, e.g. the path
+    of the file being read. Returns a shared no-op context when disabled.
+    """
+    if not _enabled:
+        return _NULL
+    return _Stage(name, info)
+
+
+def count(counter: str, n: int = 1) -> None:
+    """Add n to a counter"""
+    if _enabled:
+        _stats.add(counter, n)
+
+
+def wrap(name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    """fn timed as a stage on every call if instrumentation is enabled now, otherwise fn itself"""
+    if not _enabled:
+        return fn
+
+    def timed(*args: Any, **kwargs: Any) -> Any:
+        with stage(name):
+            return fn(*args, **kwargs)
+    return timed
+
+
+def snapshot(label: str, limit: int = 10) -> None:
+    """Record the top allocation sites by size under label, if memory is being traced"""
+    if _enabled and tracemalloc.is_tracing():
+        top = tracemalloc.take_snapshot().statistics('lineno')[:limit]
+        _stats.add_snapshot(label, [str(statistic) for statistic in top])
+
+
+def options() -> Optional[Dict[str, Any]]:
+    """Settings to pass to a worker process so it collects the same way, or None when disabled"""
+    return {'trace_memory': _trace_memory} if _enabled else None
+
+
+@contextmanager
+def collect(trace_memory: bool = False) -> Iterator[Stats]:
+    """
+    Enable instrumentation with fresh stats for the duration of a block.
+
+    The previous stats and settings are restored afterwards, and the stats
+    gathered in the block are yielded for inspection.
+    """
+    global _stats
+    previous = _stats, _enabled, _trace_memory
+    _stats = Stats()
+    enable(trace_memory)
+    try:
+        yield _stats
+    finally:
+        disable()
+        _stats = previous[0]
+        if previous[1]:
+            enable(previous[2])
@@ -1,30 +1,97 @@
-from typing import Tuple
-from dvx.utils.chunking import sentence_based_chunk, paragraph_based_chunk, semantic_sentence_chunk
+from typing import List, Pattern, Tuple
+import re
+from dvx.utils.chunking import _SENTENCE, semantic_sentence_spans
 
-def fixed_size_overlap(text1 : str, text2 : str, overlap_size : int = 20) -> Tuple[str, str]:
-    """Return overlapping chunks of fixed dimensions with a specified overlap token size."""
+_TOKEN = re.compile(r'\S+')
+
+
+def _tail_spans(text : str, pattern : Pattern[str], count : int) -> List[Tuple[int, int]]:
+    """
+    Return the (start, end) offsets of the last count matches of pattern in text.
+
+    Scans a window at the end of text, doubling it until it holds a match
+    more than needed (the first match in a window may be cut short by it),
+    so the cost depends on the size of the overlap rather than of the whole
+    text. pattern must not match across the boundaries that separate its
+    matches, as is the case for tokens and sentences.
+    """
+    if count <= 0:
+        return []
+    window = 64 * (count + 1)
+    while True:
+        offset = max(len(text) - window, 0)
+        spans = [match.span() for match in pattern.finditer(text, offset)]
+        if offset == 0 or len(spans) > count:
+            return spans[-count:]
+        window *= 2
+
+
+def _paragraph_spans(text : str, count : int) -> List[Tuple[int, int]]:
+    """Return the (start, end) offsets of the last count paragraphs of text, stripped as in paragraph_based_chunk"""
+    spans: List[Tuple[int, int]] = []
+    end = len(text)
+    while len(spans) < count and end > 0:
+        separator = text.rfind('\n\n', 0, end)
+        start = separator + 2 if separator >= 0 else 0
+        piece = text[start:end]
+        stripped = piece.strip()
+        if stripped:
+            first = start + len(piece) - len(piece.lstrip())
+            spans.append((first, first + len(stripped)))
+        end = separator if separator >= 0 else 0
+    return spans[::-1]
+
+
+def fixed_size_overlap(text1 : str, text2 : str, overlap_size : int = 20) -> str:
+    """Return text2 prefixed with the last overlap_size characters of text1."""
+    if overlap_size <= 0:
+        return text2
     overlap = text1[-overlap_size:]
     return overlap+text2
+
+
+def token_overlap(text1 : str, text2 : str, overlap_size : int = 20) -> str:
+    """Return text2 prefixed with the last overlap_size whitespace-separated tokens of text1, as they appear there."""
+    spans = _tail_spans(text1, _TOKEN, overlap_size)
+    if not spans:
+        return text2
+    return text1[spans[0][0]:spans[-1][1]] + ' ' + text2
     
 
-def sentence_overlap(text1 : str, text2 : str, overlap_size : int = 1) -> Tuple[str, str]:
-    """Return overlapping chunks of sentence based chunks with a specified overlap token size."""
-    sentences = sentence_based_chunk(text1)
-    overlap = ''.join(i for i in sentences[-overlap_size:])
+def sentence_overlap(text1 : str, text2 : str, overlap_size : int = 1) -> str:
+    """Return text2 prefixed with the last overlap_size sentences of text1."""
+    overlap = ''.join(text1[start:end].removesuffix('.').strip() + '.'
+                      for start, end in _tail_spans(text1, _SENTENCE, overlap_size))
     return overlap+text2
 
 
-def paragraph_overlap(text1 : str, text2 : str, overlap_size : int = 1) -> Tuple[str, str]:
-    """Return overlapping chunks of paragraph based chunks with a specified overlap token size."""
-    paragraphs = paragraph_based_chunk(text1)
-    overlap = ''.join(i for i in paragraphs[-overlap_size:])
+def paragraph_overlap(text1 : str, text2 : str, overlap_size : int = 1) -> str:
+    """Return text2 prefixed with the last overlap_size paragraphs of text1."""
+    overlap = ''.join(text1[start:end] for start, end in _paragraph_spans(text1, overlap_size))
     return overlap+text2
     
 
-def semantic_sentence_overlap(text1 : str, text2 : str, overlap_size : int = 100) -> Tuple[str, str]:
-    """Return overlapping chunks of semantic chunks with a specified overlap token size."""
-    semantic = semantic_sentence_chunk(text1)
-    overlap = text1[-overlap_size:]
+def semantic_sentence_overlap(text1 : str,
+                              text2 : str,
+                              overlap_size : int = 100,
+                              tokenizer : str = 'bert-base-uncased',
+                              metric : str = 'cosine',
+                              chunk_size : int = 5) -> str:
+    """
+    Return text2 prefixed with the trailing semantic group of text1, cut to overlap_size characters.
+
+    Only the last chunk_size sentences of text1 are scored, since no semantic
+    group produced by semantic_sentence_chunk can be longer than that. The
+    overlap is sliced from text1 itself, so it ends exactly where text1's
+    last sentence does.
+    """
+    spans = _tail_spans(text1, _SENTENCE, chunk_size)
+    if not spans:
+        return text2
+    tail = text1[spans[0][0]:spans[-1][1]]
+    groups = semantic_sentence_spans(tail, tokenizer = tokenizer, metric = metric, chunk_size = chunk_size)
+    start, end = groups[-1].tolist()
+    overlap = tail[max(start, end - overlap_size):end]
     return overlap+text2
     
 
@@ -1,7 +1,291 @@
 import numpy as np
-from transformers import AutoTokenizer
 from numpy.linalg import norm
-from typing import Any, Tuple
+from typing import Any, Dict, List, Sequence, Tuple, Optional
+from threading import Lock
+from dvx.utils import instrument
+from dvx.utils.cache import LRUCache
+
+
+METRICS = ('dot_product', 'cosine', 'l1', 'l2')
+SIMILARITY_METRICS = ('dot_product', 'cosine')
+DISTANCE_METRICS = ('l1', 'l2')
+
+
+_TOKENIZERS: Dict[str, Any] = {}
+_TOKENIZERS_LOCK = Lock()
+_TOKEN_IDS = LRUCache(maxsize=65536)
+
+
+def get_tokenizer(name: str = 'bert-base-uncased') -> Any:
+    """Return the process-wide tokenizer for name, loading it on first use."""
+    tokenizer = _TOKENIZERS.get(name)
+    if tokenizer is None:
+        with _TOKENIZERS_LOCK:
+            tokenizer = _TOKENIZERS.get(name)
+            if tokenizer is None:
+                from transformers import AutoTokenizer
+                tokenizer = AutoTokenizer.from_pretrained(name)
+                _TOKENIZERS[name] = tokenizer
+    return tokenizer
+
+
+def token_ids(text: str, tokenizer: str = 'bert-base-uncased') -> np.ndarray:
+    """
+    Tokenize text into a 1-D array of input ids, memoised per (tokenizer, text).
+
+    The returned array is shared between callers and is marked read-only.
+    """
+    key = (tokenizer, text)
+    ids = _TOKEN_IDS.get(key)
+    if ids is None:
+        instrument.count('tokenizer_calls')
+        instrument.count('tokenized_texts')
+        ids = get_tokenizer(tokenizer)(text, return_tensors='np')['input_ids'].squeeze()
+        ids.setflags(write=False)
+        _TOKEN_IDS.put(key, ids)
+    return ids
+
+
+def token_ids_batch(texts: Sequence[str], tokenizer: str = 'bert-base-uncased') -> List[np.ndarray]:
+    """
+    Tokenize many texts like token_ids(), sending all uncached texts to the
+    tokenizer in a single call.
+    """
+    ids: List[Optional[np.ndarray]] = [_TOKEN_IDS.get((tokenizer, text)) for text in texts]
+    misses = list(dict.fromkeys(text for text, found in zip(texts, ids) if found is None))
+    if misses:
+        instrument.count('tokenizer_calls')
+        instrument.count('tokenized_texts', len(misses))
+        encoded = {}
+        for text, row in zip(misses, get_tokenizer(tokenizer)(misses)['input_ids']):
+            row = np.asarray(row, dtype=np.int64)
+            row.setflags(write=False)
+            _TOKEN_IDS.put((tokenizer, text), row)
+            encoded[text] = row
+        ids = [found if found is not None else encoded[text] for text, found in zip(texts, ids)]
+    return ids
+
+
+def set_token_cache_size(maxsize: int) -> None:
+    """Resize the token id cache, dropping its current contents."""
+    global _TOKEN_IDS
+    _TOKEN_IDS = LRUCache(maxsize=maxsize)
+
+
+def _validate_metric(metric: str) -> None:
+    if metric not in METRICS:
+        raise ValueError(f'Invalid metric. Must be one of {list(METRICS)}')
+
+
+def _as_matrix(X: np.ndarray) -> np.ndarray:
+    X = np.asarray(X)
+    if X.ndim == 1:
+        X = X[None, :]
+    if X.ndim != 2:
+        raise ValueError('Expected a 1-D or 2-D array')
+    if X.dtype.kind != 'f':
+        X = X.astype(np.float64)
+    return X
+
+
+def squared_norms(X: np.ndarray) -> np.ndarray:
+    """Row-wise squared L2 norms of a 2-D array."""
+    return np.einsum('ij,ij->i', X, X)
+
+
+def normalize(X: np.ndarray) -> np.ndarray:
+    """Scale the rows of X to unit L2 norm, leaving all-zero rows untouched."""
+    X = _as_matrix(X)
+    norms = np.sqrt(squared_norms(X))
+    norms[norms == 0] = 1.0
+    return X / norms[:, None]
+
+
+def _block_scores(A: np.ndarray,
+                  B: np.ndarray,
+                  metric: str,
+                  A_sq: Optional[np.ndarray] = None,
+                  B_sq: Optional[np.ndarray] = None,
+                  block_size: int = 1024) -> np.ndarray:
+    """Scores between every row of A and every row of B, with B fitting in one block."""
+    if metric == 'dot_product':
+        return A @ B.T
+    if metric == 'cosine':
+        return normalize(A) @ normalize(B).T
+    if metric == 'l2':
+        if A_sq is None:
+            A_sq = squared_norms(A)
+        if B_sq is None:
+            B_sq = squared_norms(B)
+        dist = A_sq[:, None] + B_sq[None, :] - 2.0 * (A @ B.T)
+        np.maximum(dist, 0, out=dist)
+        return np.sqrt(dist, out=dist)
+
+    # l1 has no matrix product form, so bound the (rows, cols, dim) broadcast
+    # to roughly block_size * block_size elements per step.
+    out = np.empty((A.shape[0], B.shape[0]), dtype=np.result_type(A, B))
+    rows = max(1, (block_size * block_size) // max(1, B.shape[0] * A.shape[1]))
+    for i in range(0, A.shape[0], rows):
+        out[i:i + rows] = np.abs(A[i:i + rows, None, :] - B[None, :, :]).sum(axis=-1)
+    return out
+
+
+def pairwise_scores(A: np.ndarray,
+                    B: np.ndarray,
+                    metric: str = 'cosine',
+                    block_size: int = 1024) -> np.ndarray:
+    """
+    Compute the metric between every row of A and every row of B.
+
+    Args:
+        A: Array of shape (n, dim) or (dim,)
+        B: Array of shape (m, dim) or (dim,)
+        metric: Similarity metric to use ('dot_product', 'cosine', 'l1', 'l2')
+        block_size: Number of rows of B scored at a time, bounding temporary memory
+
+    Returns:
+        np.ndarray: Score matrix of shape (n, m)
+    """
+    _validate_metric(metric)
+    A, B = _as_matrix(A), _as_matrix(B)
+    if A.shape[1] != B.shape[1]:
+        raise ValueError('Arrays must have the same dimension')
+
+    if metric == 'cosine':
+        A, B, metric = normalize(A), normalize(B), 'dot_product'
+    A_sq = squared_norms(A) if metric == 'l2' else None
+
+    out = np.empty((A.shape[0], B.shape[0]), dtype=np.result_type(A, B))
+    for j in range(0, B.shape[0], block_size):
+        out[:, j:j + block_size] = _block_scores(A, B[j:j + block_size], metric, A_sq=A_sq, block_size=block_size)
+    return out
+
+
+def batch_scores(A: np.ndarray, b: np.ndarray, metric: str = 'cosine', block_size: int = 1024) -> np.ndarray:
+    """
+    Compute the metric between every row of A and a single vector b.
+
+    Returns:
+        np.ndarray: Scores of shape (n,)
+    """
+    b = np.asarray(b)
+    if b.ndim != 1:
+        raise ValueError('Expected a 1-D query vector')
+    return pairwise_scores(A, b, metric=metric, block_size=block_size)[:, 0]
+
+
+def paired_scores(A: np.ndarray, B: np.ndarray, metric: str = 'cosine') -> np.ndarray:
+    """
+    Compute the metric between corresponding rows of A and B.
+
+    Matches SemanticScore applied row by row, including a cosine of 0 for
+    all-zero rows.
+
+    Returns:
+        np.ndarray: Scores of shape (n,)
+    """
+    _validate_metric(metric)
+    A, B = _as_matrix(A), _as_matrix(B)
+    if A.shape != B.shape:
+        raise ValueError('Arrays must have the same shape')
+
+    if metric == 'dot_product':
+        return np.einsum('ij,ij->i', A, B)
+    if metric == 'cosine':
+        denom = np.sqrt(squared_norms(A)) * np.sqrt(squared_norms(B))
+        dots = np.einsum('ij,ij->i', A, B)
+        return np.divide(dots, denom, out=np.zeros_like(dots), where=denom != 0)
+    diff = A - B
+    if metric == 'l1':
+        return np.abs(diff).sum(axis=1)
+    return np.sqrt(squared_norms(diff))
+
+
+def top_k(scores: np.ndarray, k: int, metric: str = 'cosine') -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Select the k best entries along the last axis of a score array.
+
+    Uses a partial sort, so only the selected entries are fully ordered. Larger
+    scores are better for 'dot_product' and 'cosine', smaller for 'l1' and 'l2'.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Indices and scores of the best entries, best first
+    """
+    _validate_metric(metric)
+    scores = np.asarray(scores)
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        empty = scores[..., :0]
+        return np.zeros(empty.shape, dtype=np.int64), empty
+
+    if k == 1:
+        best = np.argmax if metric in SIMILARITY_METRICS else np.argmin
+        idx = best(scores, axis=-1)[..., None]
+        return idx, np.take_along_axis(scores, idx, axis=-1)
+
+    keys = -scores if metric in SIMILARITY_METRICS else scores
+    if k < n:
+        idx = np.argpartition(keys, k - 1, axis=-1)[..., :k]
+    else:
+        idx = np.broadcast_to(np.arange(n), keys.shape).copy()
+    order = np.argsort(np.take_along_axis(keys, idx, axis=-1), axis=-1, kind='stable')
+    idx = np.take_along_axis(idx, order, axis=-1)
+    return idx, np.take_along_axis(scores, idx, axis=-1)
+
+
+def pairwise_top_k(A: np.ndarray,
+                   B: np.ndarray,
+                   k: int,
+                   metric: str = 'cosine',
+                   block_size: int = 4096,
+                   B_sq: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the k best rows of B for every row of A.
+
+    B is scanned in blocks of block_size rows and the running top-k is merged
+    after each block, so the full (n, m) score matrix is never materialised.
+
+    Args:
+        A: Query array of shape (n, dim) or (dim,)
+        B: Data array of shape (m, dim)
+        k: Number of results per query
+        metric: Similarity metric to use ('dot_product', 'cosine', 'l1', 'l2')
+        block_size: Number of rows of B scored at a time
+        B_sq: Optional precomputed squared norms of B, used by 'l2'
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Row indices into B and scores, both of shape (n, min(k, m))
+    """
+    _validate_metric(metric)
+    A, B = _as_matrix(A), _as_matrix(B)
+    if A.shape[1] != B.shape[1]:
+        raise ValueError('Arrays must have the same dimension')
+
+    if metric == 'cosine':
+        A, B, metric = normalize(A), normalize(B), 'dot_product'
+    A_sq = squared_norms(A) if metric == 'l2' else None
+
+    best_idx = np.zeros((A.shape[0], 0), dtype=np.int64)
+    best_scores = np.zeros((A.shape[0], 0), dtype=np.result_type(A, B))
+    for j in range(0, B.shape[0], block_size):
+        block_sq = B_sq[j:j + block_size] if B_sq is not None else None
+        scores = _block_scores(A, B[j:j + block_size], metric, A_sq=A_sq, B_sq=block_sq)
+        idx, scores = top_k(scores, k, metric=metric)
+        best_idx, best_scores = _merge_top_k(best_idx, best_scores, idx + j, scores, k, metric)
+    return best_idx, best_scores
+
+
+def _merge_top_k(idx1: np.ndarray,
+                 scores1: np.ndarray,
+                 idx2: np.ndarray,
+                 scores2: np.ndarray,
+                 k: int,
+                 metric: str) -> Tuple[np.ndarray, np.ndarray]:
+    idx = np.concatenate([idx1, idx2], axis=-1)
+    scores = np.concatenate([scores1, scores2], axis=-1)
+    order, scores = top_k(scores, k, metric=metric)
+    return np.take_along_axis(idx, order, axis=-1), scores
 
 
 class SemanticScore:
@@ -10,13 +294,13 @@ class SemanticScore:
         metric: str = 'cosine',
         max_length: int = 100 
     ) -> None:
-        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer)
+        self.tokenizer_name = tokenizer
+        self.tokenizer = get_tokenizer(tokenizer)
         self.max_length = max_length
         
-        valid_metrics = ['dot_product', 'cosine', 'l1', 'l2']
-        if metric not in valid_metrics:
-            raise ValueError(f'Invalid metric. Must be one of {valid_metrics}')
+        _validate_metric(metric)
         self.metric = metric
+        self._score = getattr(self, metric)
     
     def dot_product(self, A: np.ndarray, B: np.ndarray) -> float:
         """Dot Product is the sum after element wise multiplication of the arrays."""
@@ -45,20 +329,23 @@ class SemanticScore:
         return float(np.sqrt(np.sum((A-B)**2)))
 
     def calculate_score(self, A: np.ndarray, B: np.ndarray) -> float:
-        assert A.shape == B.shape, 'Arrays must have the same shape'
-        
-        metric_functions = {
-            'dot_product': self.dot_product,
-            'cosine': self.cosine,
-            'l1': self.l1,
-            'l2': self.l2
-        }
-        
-        return metric_functions[self.metric](A, B)
+        return self._score(A, B)
+
+    def calculate_batch(self, A: np.ndarray, B: np.ndarray) -> np.ndarray:
+        """Score every row of A against every row of B with the configured metric."""
+        return pairwise_scores(A, B, metric=self.metric)
+
+    def encode_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """Tokenize texts in one pass into a (len(texts), max_length) matrix of padded token ids"""
+        out = np.zeros((len(texts), self.max_length), dtype=np.int64)
+        for row, ids in zip(out, token_ids_batch(texts, self.tokenizer_name)):
+            ids = ids[:self.max_length]
+            row[:len(ids)] = ids
+        return out
 
     def calculate(self, A: str, B: str) -> float:
-        A_encoded = self.tokenizer(A, return_tensors='np')['input_ids'].squeeze()
-        B_encoded = self.tokenizer(B, return_tensors='np')['input_ids'].squeeze()
+        A_encoded = token_ids(A, self.tokenizer_name)
+        B_encoded = token_ids(B, self.tokenizer_name)
         
         A_padded, B_padded = self.padding(A_encoded, B_encoded)
         
@@ -0,0 +1,62 @@
+import numpy as np
+from dvx.core.encoder import BaseEncoder, CachedEncoder
+from dvx.utils.cache import EmbeddingCache
+
+
+class CountingEncoder(BaseEncoder):
+    """Deterministic encoder that records every text it is asked to encode"""
+
+    def __init__(self) -> None:
+        self.seen = []
+
+    def encode(self, text: str) -> np.ndarray:
+        self.seen.append(text)
+        return np.array([len(text), sum(map(ord, text)), 1.0], dtype=np.float32)
+
+
+def test_cached_encoder_matches_encoder():
+    texts = ['alpha', 'beta', 'alpha', 'gamma', 'beta', '']
+    encoder = CountingEncoder()
+    cached = CachedEncoder(encoder)
+    expected = CountingEncoder().encode_batch(texts)
+    np.testing.assert_array_equal(cached.encode_batch(texts, batch_size=2), expected)
+    # Each distinct text is encoded once, and a second pass is served from the cache
+    assert sorted(encoder.seen) == sorted(set(texts))
+    np.testing.assert_array_equal(cached.encode_batch(texts), expected)
+    assert len(encoder.seen) == 4
+    assert cached.cache.hits == 6 and cached.cache.misses == 6
+
+
+def test_put_many_counts_repeated_keys_once():
+    cache = EmbeddingCache()
+    keys = [EmbeddingCache.key('model', text) for text in ['a', 'b', 'a', 'a']]
+    vectors = np.arange(12, dtype=np.float32).reshape(4, 3)
+    cache.put_many(keys, vectors)
+    assert len(cache) == 2
+    assert cache.nbytes == 2 * 3 * 4
+    # The last vector of a repeated key wins
+    np.testing.assert_array_equal(cache.get_many(keys[:2])[0], vectors[3])
+    cache.put_many(keys[:1], vectors[:1])
+    assert cache.nbytes == 2 * 3 * 4
+
+
+def test_eviction_keeps_recently_used(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = EmbeddingCache(path, max_bytes=10 * 16)
+    keys = [EmbeddingCache.key('model', str(i)) for i in range(15)]
+    vectors = np.ones((15, 4), dtype=np.float32)
+    cache.put_many(keys[:10], vectors[:10])
+    cache.get_many(keys[:3])
+    cache.put_many(keys[10:], vectors[10:])
+    assert cache.nbytes <= cache.max_bytes and len(cache) == 10
+    assert all(vector is not None for vector in cache.get_many(keys[:3] + keys[10:]))
+    cache.close()
+
+    reopened = EmbeddingCache(path, max_bytes=10 * 16)
+    assert reopened.nbytes == 10 * 16 and len(reopened) == 10
+    reopened.close()
+
+
+def test_keys_depend_on_model():
+    assert EmbeddingCache.key('a', 'text') != EmbeddingCache.key('b', 'text')
+    assert EmbeddingCache.key('ab', 'c') != EmbeddingCache.key('a', 'bc')
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from dvx.encoders.text.hashing import HashingEncoder
+
+TEXTS = ['Part 7 of model A', 'Part 8 of model B', 'the the the cat', '', 'Vector index, vector search!']
+
+
+@pytest.mark.parametrize('options', [{}, {'ngram_range': (1, 2)}, {'ngram_range': (2, 3)}, {'sublinear_tf': True},
+                                     {'alternate_sign': False, 'norm': None}, {'lowercase': False}])
+def test_dense_and_sparse_agree(options):
+    encoder = HashingEncoder(n_features=64, **options)
+    for fitted in (False, True):
+        if fitted:
+            encoder.fit(TEXTS)
+        dense = encoder.encode_batch(TEXTS, batch_size=2)
+        assert dense.shape == (len(TEXTS), 64) and dense.dtype == np.float32
+        np.testing.assert_allclose(encoder.encode_sparse(TEXTS).toarray(), dense, atol=1e-6)
+        np.testing.assert_allclose(encoder.encode(TEXTS[0]), dense[0], atol=1e-6)
+
+
+def test_counts_and_norm():
+    encoder = HashingEncoder(n_features=1 << 20, alternate_sign=False, norm=None)
+    vector = encoder.encode('the the the cat')
+    assert sorted(vector[vector != 0].tolist()) == [1.0, 3.0]
+    normed = HashingEncoder(n_features=1 << 20).encode('the the the cat')
+    assert np.linalg.norm(normed) == pytest.approx(1.0)
+    assert not HashingEncoder().encode('').any()
+
+
+def test_single_characters_are_tokens():
+    encoder = HashingEncoder(n_features=1 << 16)
+    first, second = encoder.encode_batch(['Part 7 of model A', 'Part 8 of model B'])
+    assert not np.allclose(first, second)
+    # The old pattern dropped them, which remains available
+    legacy = HashingEncoder(n_features=1 << 16, token_pattern=r'\b\w\w+\b')
+    first, second = legacy.encode_batch(['Part 7 of model A', 'Part 8 of model B'])
+    np.testing.assert_array_equal(first, second)
+
+
+def test_model_id_tracks_settings():
+    ids = {HashingEncoder().model_id, HashingEncoder(token_pattern=r'\b\w\w+\b').model_id,
+           HashingEncoder(n_features=512).model_id, HashingEncoder(ngram_range=(1, 2)).model_id,
+           HashingEncoder().fit(TEXTS).model_id}
+    assert len(ids) == 5
+    assert HashingEncoder().model_id == HashingEncoder().model_id
+
+
+def test_invalid_norm():
+    with pytest.raises(ValueError):
+        HashingEncoder(norm='l1')
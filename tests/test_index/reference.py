@@ -0,0 +1,41 @@
+from typing import Optional, Tuple
+import numpy as np
+
+METRICS = ['cosine', 'dot_product', 'l1', 'l2']
+
+
+def brute_force_search(ids: np.ndarray,
+                       vectors: np.ndarray,
+                       queries: np.ndarray,
+                       k: int,
+                       metric: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Reference top-k computed directly from the definition of each metric"""
+    vectors = vectors.astype(np.float64)
+    queries = queries.astype(np.float64)
+    if metric == 'cosine':
+        scores = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ \
+                 (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).T
+    elif metric == 'dot_product':
+        scores = queries @ vectors.T
+    elif metric == 'l1':
+        scores = np.abs(queries[:, None, :] - vectors[None, :, :]).sum(axis=-1)
+    else:
+        scores = np.sqrt(((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=-1))
+    order = np.argsort(-scores if metric in ('cosine', 'dot_product') else scores, axis=1, kind='stable')[:, :k]
+    return ids[order], np.take_along_axis(scores, order, axis=1)
+
+
+def recall(found: np.ndarray, expected: np.ndarray) -> float:
+    """Fraction of the expected ids found, averaged over queries"""
+    return float(np.mean([len(set(f.tolist()) & set(e.tolist())) / len(e) for f, e in zip(found, expected)]))
+
+
+def make_data(n: int = 2000, dim: int = 32, n_queries: int = 20, seed: Optional[int] = 0
+              ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(ids, vectors, queries) drawn from a few Gaussian clusters, like real embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((16, dim)) * 3
+    vectors = (centers[rng.integers(0, 16, n)] + rng.standard_normal((n, dim))).astype(np.float32)
+    queries = (centers[rng.integers(0, 16, n_queries)] + rng.standard_normal((n_queries, dim))).astype(np.float32)
+    ids = rng.permutation(10 * n)[:n].astype(np.int64)
+    return ids, vectors, queries
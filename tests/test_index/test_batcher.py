@@ -0,0 +1,161 @@
+import asyncio
+import threading
+import numpy as np
+import pytest
+from dvx.core.encoder import BaseEncoder
+from dvx.index.flat import FlatIndex
+from dvx.retrieve.batcher import BatchingRetriever
+
+VECTORS = np.random.default_rng(0).standard_normal((100, 8)).astype(np.float32)
+
+
+class LookupEncoder(BaseEncoder):
+    """Encodes 'q<i>' as row i of VECTORS and records every batch it is given"""
+
+    def __init__(self) -> None:
+        self.batches = []
+
+    def encode(self, text: str) -> np.ndarray:
+        return VECTORS[int(text[1:])]
+
+    def encode_batch(self, texts, batch_size=32):
+        self.batches.append(list(texts))
+        if 'fail' in texts:
+            raise ValueError('cannot encode')
+        return super().encode_batch(texts, batch_size)
+
+
+class GatedIndex(FlatIndex):
+    """FlatIndex whose searches are counted and can be held back until the gate opens"""
+
+    def __init__(self) -> None:
+        super().__init__(8, 'l2')
+        self.add(np.arange(100), VECTORS)
+        self.searches = 0
+        self.gate = threading.Event()
+        self.gate.set()
+        self.entered = threading.Event()
+
+    def search(self, queries, k=10, subset=None):
+        self.searches += 1
+        self.entered.set()
+        self.gate.wait(5)
+        return super().search(queries, k, subset=subset)
+
+
+def run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, 10))
+
+
+async def wait_until(condition):
+    while not condition():
+        await asyncio.sleep(0.001)
+
+
+def test_window_collects_one_batch():
+    async def main():
+        encoder, index = LookupEncoder(), GatedIndex()
+        async with BatchingRetriever(encoder, index, k=3, max_wait_ms=50) as retriever:
+            results = await asyncio.gather(*(retriever.search(f'q{i}') for i in range(10)))
+        # One encode and one search for the whole batch, and each caller gets its own row
+        assert encoder.batches == [[f'q{i}' for i in range(10)]]
+        assert index.searches == 1 and retriever.batches == 1 and retriever.mean_batch_size == 10
+        for i, (ids, scores) in enumerate(results):
+            assert ids.shape == scores.shape == (3,) and ids[0] == i
+    run(main())
+
+
+def test_max_batch_size_flushes_early():
+    async def main():
+        encoder, index = LookupEncoder(), GatedIndex()
+        loop = asyncio.get_running_loop()
+        async with BatchingRetriever(encoder, index, max_batch_size=4, max_wait_ms=5000) as retriever:
+            start = loop.time()
+            results = await asyncio.gather(*(retriever.search(f'q{i}', k=1 + i % 3) for i in range(8)))
+            # Full batches do not wait out the window
+            assert loop.time() - start < 2
+        assert [len(batch) for batch in encoder.batches] == [4, 4] and index.searches == 2
+        assert [ids.tolist()[0] for ids, _ in results] == list(range(8))
+        assert [len(ids) for ids, _ in results] == [1 + i % 3 for i in range(8)]
+    run(main())
+
+
+def test_timeout_and_skipped_requests():
+    async def main():
+        encoder, index = LookupEncoder(), GatedIndex()
+        index.gate.clear()
+        async with BatchingRetriever(encoder, index, max_batch_size=1, max_wait_ms=0) as retriever:
+            first = asyncio.ensure_future(retriever.search('q1'))
+            await wait_until(index.entered.is_set)
+            # Both wait in the queue behind the held search: one times out, the other's caller is cancelled
+            with pytest.raises(asyncio.TimeoutError):
+                await retriever.search('q2', timeout=0.05)
+            cancelled = asyncio.ensure_future(retriever.search('q3'))
+            await wait_until(lambda: retriever._queue.qsize() == 2)
+            cancelled.cancel()
+            index.gate.set()
+            assert (await first)[0][0] == 1
+            assert (await retriever.search('q4'))[0][0] == 4
+        # Neither abandoned query reached the encoder
+        assert encoder.batches == [['q1'], ['q4']]
+    run(main())
+
+
+def test_backpressure():
+    async def main():
+        encoder, index = LookupEncoder(), GatedIndex()
+        index.gate.clear()
+        async with BatchingRetriever(encoder, index, max_batch_size=1, max_wait_ms=0, max_queue=2) as retriever:
+            tasks = [asyncio.ensure_future(retriever.search('q0'))]
+            await wait_until(index.entered.is_set)
+            tasks += [asyncio.ensure_future(retriever.search(f'q{i}')) for i in (1, 2, 3)]
+            await asyncio.sleep(0.05)
+            # One query is being searched, two fill the queue and the fourth caller waits for room
+            assert retriever._queue.full() and not any(task.done() for task in tasks)
+            with pytest.raises(asyncio.TimeoutError):
+                await retriever.search('q4', timeout=0.05)
+            index.gate.set()
+            results = await asyncio.gather(*tasks)
+        assert [ids[0] for ids, _ in results] == [0, 1, 2, 3]
+        assert encoder.batches == [['q0'], ['q1'], ['q2'], ['q3']]
+    run(main())
+
+
+def test_close_fails_pending_requests():
+    async def main():
+        encoder, index = LookupEncoder(), GatedIndex()
+        index.gate.clear()
+        retriever = BatchingRetriever(encoder, index, max_batch_size=1, max_wait_ms=0)
+        await retriever.start()
+        try:
+            tasks = [asyncio.ensure_future(retriever.search(f'q{i}')) for i in range(3)]
+            await wait_until(index.entered.is_set)
+            await wait_until(lambda: retriever._queue.qsize() == 2)
+            await retriever.close()
+            # The query being searched and the two still queued all fail
+            for task in tasks:
+                with pytest.raises(RuntimeError, match='closed'):
+                    await task
+            await retriever.close()
+            with pytest.raises(RuntimeError, match='not started'):
+                await retriever.search('q0')
+        finally:
+            index.gate.set()
+    run(main())
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    async def main():
+        encoder = LookupEncoder()
+        async with BatchingRetriever(encoder, GatedIndex(), max_wait_ms=50) as retriever:
+            results = await asyncio.gather(retriever.search('q1'), retriever.search('fail'),
+                                           return_exceptions=True)
+            assert all(isinstance(result, ValueError) for result in results)
+            # The worker carries on with the next batch
+            assert (await retriever.search('q5'))[0][0] == 5
+    run(main())
+
+
+def test_invalid_batch_size():
+    with pytest.raises(ValueError):
+        BatchingRetriever(LookupEncoder(), GatedIndex(), max_batch_size=0)
@@ -0,0 +1,128 @@
+import math
+import random
+from collections import Counter
+import pytest
+from dvx.retrieve.bm25 import BM25Index, tokenize
+
+VOCABULARY = [f'term{i}' for i in range(400)]
+# Zipfian weights, so common terms have long multi-block postings and rare ones short postings
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+
+class Reference:
+    """Exhaustive BM25 over every live document, with the index's collection statistics"""
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1, self.b = k1, b
+        self.docs = {}
+        self.counted = []
+
+    def add(self, key, text):
+        self.remove([key])
+        self.docs[key] = Counter(tokenize(text))
+        self.counted.append(self.docs[key])
+
+    def remove(self, keys):
+        for key in keys:
+            self.docs.pop(key, None)
+
+    def compact(self):
+        self.counted = list(self.docs.values())
+
+    def scores(self, query, subset=None):
+        n = len(self.counted)
+        avg_length = sum(sum(counts.values()) for counts in self.counted) / n
+        idfs = {}
+        for term in dict.fromkeys(tokenize(query)):
+            df = sum(term in counts for counts in self.counted)
+            idfs[term] = math.log(1 + (n - df + 0.5) / (df + 0.5))
+        results = {}
+        for key, counts in self.docs.items():
+            if subset is not None and key not in subset:
+                continue
+            length = sum(counts.values())
+            score, matched = 0.0, False
+            for term, idf in idfs.items():
+                tf = counts.get(term, 0)
+                if not tf:
+                    continue
+                score += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_length))
+                matched = True
+            if matched:
+                results[key] = score
+        return results
+
+
+def random_doc(rng):
+    return ' '.join(rng.choices(VOCABULARY, WEIGHTS, k=rng.randint(1, 40)))
+
+
+def check(index, reference, query, k, subset=None):
+    found = index.search(query, k, subset=subset)
+    expected = reference.scores(query, None if subset is None else set(subset))
+    best = sorted(expected.values(), reverse=True)[:k]
+    assert len(found) == len(best)
+    assert [score for _, score in found] == pytest.approx(best, rel=1e-9)
+    for key, score in found:
+        assert expected[key] == pytest.approx(score, rel=1e-9)
+
+
+def build(n=600, seed=0):
+    rng = random.Random(seed)
+    index, reference = BM25Index(), Reference()
+    texts = [random_doc(rng) for _ in range(n)]
+    index.add_many(texts)
+    for key, text in enumerate(texts):
+        reference.add(key, text)
+    return rng, index, reference
+
+
+def queries(rng, n=30):
+    for _ in range(n):
+        # Pair common and rare terms, so MaxScore stops scanning the long postings lists
+        yield ' '.join(rng.choices(VOCABULARY[:5], k=2) + rng.choices(VOCABULARY, k=rng.randint(0, 3)))
+
+
+@pytest.mark.parametrize('k', [1, 5, 20])
+def test_search_matches_exhaustive_scoring(k):
+    rng, index, reference = build()
+    for query in queries(rng):
+        check(index, reference, query, k)
+
+
+def test_subset():
+    rng, index, reference = build()
+    for query in queries(rng):
+        subset = rng.sample(range(len(index)), 100)
+        check(index, reference, query, 10, subset=subset)
+
+
+def test_remove_replace_and_compact():
+    rng, index, reference = build()
+    removed = rng.sample(range(600), 200)
+    assert index.remove(removed + [10_000]) == 200
+    reference.remove(removed)
+    # Re-adding under a live key replaces the document
+    for key in rng.sample(sorted(set(range(600)) - set(removed)), 50):
+        text = random_doc(rng)
+        index.add(key, text)
+        reference.add(key, text)
+    assert len(index) == 400
+    for query in queries(rng):
+        check(index, reference, query, 10)
+    index.compact()
+    reference.compact()
+    for query in queries(rng):
+        check(index, reference, query, 10)
+        found = {key for key, _ in index.search(query, 600)}
+        assert not found & set(removed)
+
+
+def test_edge_cases():
+    index = BM25Index()
+    assert index.search('anything') == []
+    index.add('a', 'Part AB-12 fits model 7')
+    assert index.search('ab 12', k=0) == []
+    assert index.search('unknown words') == []
+    assert [key for key, _ in index.search('AB 7')] == ['a']
+    assert 'a' in index and 'b' not in index
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from dvx.index.flat import FlatIndex
+from .reference import METRICS, brute_force_search, make_data
+
+
+@pytest.mark.parametrize('metric', METRICS)
+def test_search_matches_brute_force(metric):
+    ids, vectors, queries = make_data()
+    index = FlatIndex(vectors.shape[1], metric, block_size=300)
+    index.add(ids, vectors)
+
+    found, scores = index.search(queries, k=10)
+    expected, expected_scores = brute_force_search(ids, vectors, queries, 10, metric)
+    np.testing.assert_array_equal(found, expected)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-4, atol=1e-3)
+
+
+@pytest.mark.parametrize('metric', METRICS)
+def test_subset_search_matches_brute_force(metric):
+    ids, vectors, queries = make_data()
+    index = FlatIndex(vectors.shape[1], metric)
+    index.add(ids, vectors)
+    rows = np.random.default_rng(1).choice(len(ids), 150, replace=False)
+
+    found, _ = index.search(queries, k=10, subset=ids[rows])
+    expected, _ = brute_force_search(ids[rows], vectors[rows], queries, 10, metric)
+    np.testing.assert_array_equal(found, expected)
+
+
+def test_remove_and_readd():
+    ids, vectors, queries = make_data(n=500)
+    index = FlatIndex(vectors.shape[1], 'l2')
+    index.add(ids, vectors)
+    assert index.remove(ids[:100]) == 100
+    assert index.remove(ids[:100]) == 0
+    assert len(index) == 400
+
+    found, _ = index.search(queries, k=5)
+    expected, _ = brute_force_search(ids[100:], vectors[100:], queries, 5, 'l2')
+    np.testing.assert_array_equal(found, expected)
+
+    index.add(ids[:100], vectors[:100])
+    found, _ = index.search(queries, k=5)
+    expected, _ = brute_force_search(ids, vectors, queries, 5, 'l2')
+    np.testing.assert_array_equal(found, expected)
+
+
+def test_results_are_padded():
+    index = FlatIndex(4, 'cosine')
+    index.add([1, 2], np.eye(4, dtype=np.float32)[:2])
+    found, scores = index.search(np.ones(4, dtype=np.float32), k=4)
+    assert found.shape == scores.shape == (1, 4)
+    assert found[0, 2:].tolist() == [-1, -1]
+    assert np.all(np.isneginf(scores[0, 2:]))
+
+
+def test_rejects_bad_input():
+    index = FlatIndex(4)
+    with pytest.raises(ValueError):
+        index.add([1], np.ones((1, 3)))
+    index.add([1], np.ones((1, 4)))
+    with pytest.raises(ValueError):
+        index.add([1], np.ones((1, 4)))
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from dvx.index.hnsw import HNSWIndex
+from .reference import METRICS, brute_force_search, make_data, recall
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    return make_data(n=1000, dim=16)
+
+
+@pytest.mark.parametrize('metric', METRICS)
+def test_recall_against_brute_force(dataset, metric):
+    ids, vectors, queries = dataset
+    index = HNSWIndex(vectors.shape[1], metric, M=8, ef_construction=64, seed=0)
+    index.add(ids, vectors)
+
+    found, scores = index.search(queries, k=10, ef=64)
+    expected, _ = brute_force_search(ids, vectors, queries, 10, metric)
+    assert recall(found, expected) >= 0.9
+    # Scores are best first
+    ordered = scores if metric in ('l1', 'l2') else -scores
+    assert np.all(np.diff(ordered, axis=1) >= -1e-5)
+
+
+def test_removed_ids_are_not_returned_and_compact_keeps_recall(dataset):
+    ids, vectors, queries = dataset
+    index = HNSWIndex(vectors.shape[1], 'l2', M=8, ef_construction=64, seed=0)
+    index.add(ids, vectors)
+    removed = ids[::3]
+    assert index.remove(removed) == len(removed)
+    assert len(index) == len(ids) - len(removed)
+    keep = np.setdiff1d(np.arange(len(ids)), np.arange(0, len(ids), 3))
+    expected, _ = brute_force_search(ids[keep], vectors[keep], queries, 10, 'l2')
+
+    found, _ = index.search(queries, k=10)
+    assert not np.isin(found, removed).any()
+    assert recall(found, expected) >= 0.9
+
+    index.compact()
+    found, _ = index.search(queries, k=10)
+    assert len(index) == len(keep)
+    assert recall(found, expected) >= 0.9
+
+
+@pytest.mark.parametrize('size', [20, 600])
+def test_subset_search_only_returns_subset(dataset, size):
+    ids, vectors, queries = dataset
+    index = HNSWIndex(vectors.shape[1], 'cosine', M=8, ef_construction=64, seed=0)
+    index.add(ids, vectors)
+    rows = np.random.default_rng(2).choice(len(ids), size, replace=False)
+
+    found, _ = index.search(queries, k=10, subset=ids[rows])
+    expected, _ = brute_force_search(ids[rows], vectors[rows], queries, 10, 'cosine')
+    assert np.isin(found[found >= 0], ids[rows]).all()
+    assert recall(found, expected) >= 0.9
+    # subset is third, as in BaseIndex.search, and ef can only be given by keyword
+    np.testing.assert_array_equal(index.search(queries, 10, ids[rows])[0], found)
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from dvx.index.ivfpq import IVFPQIndex, kmeans
+from .reference import brute_force_search, make_data, recall
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    return make_data(n=3000, dim=32)
+
+
+def build(ids, vectors, metric='l2', **kwargs):
+    index = IVFPQIndex(vectors.shape[1], metric, nlist=16, m=8, nbits=6, seed=0, **kwargs)
+    index.train(vectors)
+    index.add(ids, vectors)
+    return index
+
+
+def test_probing_every_list_with_rerank_is_exact(dataset):
+    ids, vectors, queries = dataset
+    index = build(ids, vectors, rerank=200)
+    found, scores = index.search(queries, k=10, nprobe=16)
+    expected, expected_scores = brute_force_search(ids, vectors, queries, 10, 'l2')
+    assert recall(found, expected) >= 0.99
+    np.testing.assert_allclose(scores[found == expected], expected_scores[found == expected], rtol=1e-3, atol=1e-3)
+
+
+# Unit vectors of clustered data differ little in angle, so cosine needs a deeper rerank
+@pytest.mark.parametrize('metric, rerank', [('l2', 50), ('dot_product', 50), ('cosine', 200)])
+def test_recall_grows_with_nprobe(dataset, metric, rerank):
+    ids, vectors, queries = dataset
+    index = build(ids, vectors, metric, rerank=rerank)
+    expected, _ = brute_force_search(ids, vectors, queries, 10, metric)
+    recalls = [recall(index.search(queries, k=10, nprobe=nprobe)[0], expected) for nprobe in (1, 4, 16)]
+    assert recalls[0] <= recalls[1] + 0.02 <= recalls[2] + 0.04
+    assert recalls[2] >= 0.9
+
+
+def test_remove_and_subset(dataset):
+    ids, vectors, queries = dataset
+    index = build(ids, vectors, rerank=100)
+    assert index.remove(ids[:500]) == 500
+    assert len(index) == len(ids) - 500
+    found, _ = index.search(queries, k=10, nprobe=16)
+    assert not np.isin(found, ids[:500]).any()
+
+    subset = ids[1000:1200]
+    found, _ = index.search(queries, k=10, nprobe=16, subset=subset)
+    expected, _ = brute_force_search(ids[1000:1200], vectors[1000:1200], queries, 10, 'l2')
+    assert np.isin(found[found >= 0], subset).all()
+    assert recall(found, expected) >= 0.9
+    # subset is third, as in BaseIndex.search, and nprobe can only be given by keyword
+    np.testing.assert_array_equal(index.search(queries, 10, subset, nprobe=16)[0], found)
+
+
+def test_search_requires_training():
+    index = IVFPQIndex(8, nlist=4, m=2)
+    with pytest.raises(RuntimeError):
+        index.add([1], np.ones((1, 8)))
+
+
+def test_kmeans_finds_separated_clusters():
+    rng = np.random.default_rng(0)
+    centers = np.array([[0, 0], [10, 10], [-10, 10]], dtype=np.float32)
+    X = np.concatenate([center + rng.standard_normal((100, 2)) for center in centers])
+    found = kmeans(X, 3, seed=0)
+    distances = np.linalg.norm(found[:, None] - centers[None], axis=-1)
+    assert np.all(distances.min(axis=0) < 1.0)
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from dvx.index.base import load_index
+from dvx.index.flat import FlatIndex
+from dvx.index.hnsw import HNSWIndex
+from dvx.index.ivfpq import IVFPQIndex
+from .reference import make_data
+
+
+def flat(dim):
+    return FlatIndex(dim, 'cosine')
+
+
+def hnsw(dim):
+    return HNSWIndex(dim, 'l2', M=8, ef_construction=32, seed=0)
+
+
+def ivfpq(dim):
+    return IVFPQIndex(dim, 'l2', nlist=8, m=4, nbits=4, rerank=20, seed=0)
+
+
+@pytest.mark.parametrize('factory', [flat, hnsw, ivfpq])
+@pytest.mark.parametrize('mmap', [True, False])
+def test_reload_gives_same_results(tmp_path, factory, mmap):
+    ids, vectors, queries = make_data(n=500, dim=16)
+    index = factory(16)
+    if isinstance(index, IVFPQIndex):
+        index.train(vectors)
+    index.add(ids, vectors)
+    index.remove(ids[:50])
+    before = index.search(queries, k=10)
+
+    index.save(str(tmp_path / 'index'))
+    loaded = load_index(str(tmp_path / 'index'), mmap=mmap)
+    assert type(loaded) is type(index)
+    assert len(loaded) == len(index)
+    after = loaded.search(queries, k=10)
+    np.testing.assert_array_equal(after[0], before[0])
+    np.testing.assert_allclose(after[1], before[1], rtol=1e-6)
+
+
+@pytest.mark.parametrize('factory', [flat, hnsw, ivfpq])
+def test_loaded_index_accepts_writes_without_touching_files(tmp_path, factory):
+    ids, vectors, queries = make_data(n=300, dim=16)
+    index = factory(16)
+    if isinstance(index, IVFPQIndex):
+        index.train(vectors)
+    index.add(ids[:200], vectors[:200])
+    index.save(str(tmp_path / 'index'))
+
+    loaded = load_index(str(tmp_path / 'index'), mmap=True)
+    loaded.add(ids[200:], vectors[200:])
+    loaded.remove(ids[:10])
+    assert len(loaded) == 290
+    # The mapping is copy-on-write, so the saved index is unchanged
+    assert len(load_index(str(tmp_path / 'index'))) == 200
+
+
+def test_unknown_type_is_rejected(tmp_path):
+    (tmp_path / 'index.json').write_text('{"type": "NoSuchIndex"}')
+    with pytest.raises(ValueError):
+        load_index(str(tmp_path))
@@ -0,0 +1,269 @@
+import os
+import sys
+import threading
+import numpy as np
+import pytest
+from dvx.index.base import load_index
+from dvx.store.segments import Segment, SegmentedIndex
+from dvx.store.wal import WriteAheadLog
+from .reference import brute_force_search, make_data
+
+
+def check(index, live, queries, k=10, subset=None):
+    """Compare index.search with brute force over live, a dict of id -> vector"""
+    ids = np.array(sorted(live), dtype=np.int64)
+    vectors = np.array([live[id] for id in ids.tolist()])
+    found, scores = index.search(queries, k, subset=subset)
+    if subset is not None:
+        keep = np.isin(ids, subset)
+        ids, vectors = ids[keep], vectors[keep]
+    expected, expected_scores = brute_force_search(ids, vectors, queries, k, 'l2')
+    np.testing.assert_array_equal(found[:, :expected.shape[1]], expected)
+    np.testing.assert_allclose(scores[:, :expected.shape[1]], expected_scores, rtol=1e-4, atol=1e-3)
+    assert len(index) == len(live)
+    assert sorted(index.ids.tolist()) == sorted(live)
+
+
+def open_index(path, **options):
+    options = dict(dict(dim=16, metric='l2', flush_size=100, max_segments=100, sync=False, background=False),
+                   **options)
+    return SegmentedIndex(str(path), **options)
+
+
+def fill(index, ids, vectors, batch=37):
+    live = {}
+    for start in range(0, len(ids), batch):
+        index.add(ids[start:start + batch], vectors[start:start + batch])
+        live.update(zip(ids[start:start + batch].tolist(), vectors[start:start + batch]))
+    return live
+
+
+def test_wal_replays_appended_records(tmp_path):
+    path = str(tmp_path / 'log')
+    wal = WriteAheadLog(path, sync=False)
+    payloads = [os.urandom(n) for n in (0, 1, 100, 5000)]
+    for payload in payloads:
+        wal.append(payload)
+    wal.close()
+    wal = WriteAheadLog(path, sync=False)
+    assert list(wal.replay()) == payloads
+    wal.reset()
+    assert wal.nbytes == 0 and list(wal.replay()) == []
+    wal.close()
+
+
+@pytest.mark.parametrize('damage', ['cut_payload', 'cut_header', 'flip_byte'])
+def test_wal_truncates_torn_tail(tmp_path, damage):
+    path = str(tmp_path / 'log')
+    wal = WriteAheadLog(path, sync=False)
+    for i in range(5):
+        wal.append(bytes([i]) * 50)
+    good = wal.nbytes
+    wal.append(b'torn' * 50)
+    wal.close()
+
+    with open(path, 'r+b') as file:
+        if damage == 'cut_payload':
+            file.truncate(good + 20)
+        elif damage == 'cut_header':
+            file.truncate(good + 3)
+        else:
+            file.seek(good + 30)
+            file.write(b'X')
+
+    wal = WriteAheadLog(path, sync=False)
+    with pytest.warns(UserWarning, match='Truncating'):
+        assert list(wal.replay()) == [bytes([i]) * 50 for i in range(5)]
+    assert os.path.getsize(path) == good
+    # Appends after the replay follow the last good record
+    wal.append(b'after')
+    wal.close()
+    assert list(WriteAheadLog(path, sync=False).replay())[-2:] == [bytes([4]) * 50, b'after']
+
+
+def test_search_matches_brute_force_across_segments(tmp_path):
+    ids, vectors, queries = make_data(n=1000, dim=16)
+    index = open_index(tmp_path)
+    live = fill(index, ids, vectors)
+    assert len(index.segments) == 9
+    # Tombstones in segments and removals from the memtable
+    removed = np.random.default_rng(0).choice(ids, 300, replace=False)
+    assert index.remove(np.append(removed, -5)) == 300
+    for id in removed.tolist():
+        del live[id]
+    # Every segment has more than 10 tombstones and fewer than 50, covering both ways of skipping them
+    assert all(10 < len(segment.deleted) < 50 for segment in index.segments)
+    check(index, live, queries)
+    check(index, live, queries, k=50)
+    check(index, live, queries, subset=ids[::3])
+    # Asking for more than there is returns every live id once, then padding
+    found, scores = index.search(queries, k=len(live) + 10)
+    assert all(sorted(row[:len(live)].tolist()) == sorted(live) for row in found)
+    assert (found[:, len(live):] == -1).all() and np.isinf(scores[:, len(live):]).all()
+    index.close()
+
+
+def test_reopen_replays_log(tmp_path):
+    ids, vectors, queries = make_data(n=450, dim=16)
+    index = open_index(tmp_path)
+    live = fill(index, ids[:400], vectors[:400])
+    index.remove(ids[:50])
+    index.replace(ids[50:100], vectors[400:450])
+    for id in ids[:50].tolist():
+        del live[id]
+    live.update(zip(ids[50:100].tolist(), vectors[400:450]))
+    # Not closed: everything since the last flush must come back from the log
+    reopened = open_index(tmp_path)
+    check(reopened, live, queries)
+    reopened.close()
+    index.close()
+
+    loaded = load_index(str(tmp_path))
+    assert isinstance(loaded, SegmentedIndex)
+    check(loaded, live, queries)
+    loaded.close()
+
+
+def test_reopen_after_torn_log_record(tmp_path):
+    ids, vectors, queries = make_data(n=160, dim=16)
+    index = open_index(tmp_path)
+    live = fill(index, ids[:150], vectors[:150], batch=50)
+    index.add(ids[150:], vectors[150:])
+    wal_path = index._wal.path
+    index.close()
+    # The last add was torn mid-write
+    with open(wal_path, 'r+b') as file:
+        file.truncate(os.path.getsize(wal_path) - 7)
+
+    with pytest.warns(UserWarning, match='Truncating'):
+        reopened = open_index(tmp_path)
+    check(reopened, live, queries)
+    reopened.add(ids[150:], vectors[150:])
+    live.update(zip(ids[150:].tolist(), vectors[150:]))
+    reopened.close()
+    check(open_index(tmp_path), live, queries)
+
+
+def test_reopen_removes_uncommitted_files(tmp_path):
+    index = open_index(tmp_path)
+    index.close()
+    os.makedirs(tmp_path / 'segment-999999')
+    (tmp_path / 'wal-999999.log').write_bytes(b'stale')
+    open_index(tmp_path).close()
+    assert not (tmp_path / 'segment-999999').exists()
+    assert not (tmp_path / 'wal-999999.log').exists()
+
+
+def test_compact_drops_tombstones(tmp_path):
+    ids, vectors, queries = make_data(n=500, dim=16)
+    index = open_index(tmp_path)
+    live = fill(index, ids, vectors)
+    index.remove(ids[::2])
+    for id in ids[::2].tolist():
+        del live[id]
+    index.compact()
+    assert len(index.segments) == 1
+    assert not index.segments[0].deleted and len(index.segments[0].index) == len(live)
+    check(index, live, queries)
+    index.close()
+    assert sorted(os.listdir(tmp_path)) == sorted([index.segments[0].name, os.path.basename(index._wal.path),
+                                                   'index.json'])
+    check(open_index(tmp_path), live, queries)
+
+
+def test_replace(tmp_path):
+    ids, vectors, queries = make_data(n=600, dim=16)
+    index = open_index(tmp_path)
+    live = fill(index, ids[:300], vectors[:300])
+    # Ids in segments, in the memtable and new ones, replaced in one batch
+    replaced = np.concatenate([ids[:20], ids[290:300], ids[300:310]])
+    index.replace(replaced, vectors[400:440])
+    live.update(zip(replaced.tolist(), vectors[400:440]))
+    check(index, live, queries)
+    with pytest.raises(ValueError):
+        index.replace(ids[:2].repeat(2), vectors[:4])
+    with pytest.raises(ValueError):
+        index.add(ids[:1], vectors[:1])
+    with pytest.raises(ValueError):
+        index.add(ids[500:501], vectors[:1, :8])
+    check(index, live, queries)
+    index.close()
+    check(open_index(tmp_path), live, queries)
+
+
+def test_background_merge(tmp_path):
+    ids, vectors, queries = make_data(n=1200, dim=16)
+    index = open_index(tmp_path, max_segments=3, merge_factor=2, background=True)
+    live = fill(index, ids, vectors, batch=50)
+    index.remove(ids[:400])
+    for id in ids[:400].tolist():
+        del live[id]
+    index.flush()
+    check(index, live, queries)
+    index.close()
+    assert index.compaction_error is None
+    reopened = open_index(tmp_path)
+    check(reopened, live, queries)
+
+
+def test_remove_during_merge(tmp_path):
+    ids, vectors, queries = make_data(n=4000, dim=16)
+    rng = np.random.default_rng(0)
+    interval = sys.getswitchinterval()
+    # Switch threads as often as possible, so removes interleave with the merge's copying of live rows
+    sys.setswitchinterval(1e-6)
+    try:
+        for round in range(5):
+            index = open_index(tmp_path / str(round), flush_size=50)
+            live = fill(index, ids, vectors, batch=50)
+            merge = threading.Thread(target=index.compact)
+            merge.start()
+            while merge.is_alive() or not len(index.segments[0].deleted):
+                removed = rng.choice(index.ids, 3, replace=False)
+                index.remove(removed)
+                for id in removed.tolist():
+                    del live[id]
+                found, _ = index.search(queries[:2], k=5)
+                assert not np.isin(found, removed).any()
+            merge.join()
+            assert len(index.segments) == 1
+            check(index, live, queries)
+            check(index, live, queries, k=100)
+            index.close()
+            check(open_index(tmp_path / str(round)), live, queries)
+    finally:
+        sys.setswitchinterval(interval)
+
+
+def test_remove_while_merge_is_paused(tmp_path, monkeypatch):
+    ids, vectors, queries = make_data(n=600, dim=16)
+    index = open_index(tmp_path)
+    live = fill(index, ids, vectors, batch=100)
+    index.remove(ids[:30])
+    for id in ids[:30].tolist():
+        del live[id]
+    copied, resume = threading.Event(), threading.Event()
+    original = Segment.live
+
+    def paused_live(segment, deleted):
+        result = original(segment, deleted)
+        copied.set()
+        resume.wait()
+        return result
+
+    monkeypatch.setattr(Segment, 'live', paused_live)
+    merge = threading.Thread(target=index.compact)
+    merge.start()
+    copied.wait()
+    # Removed after the merge took its snapshot of the tombstones
+    removed = ids[30:600:7]
+    assert index.remove(removed) == len(removed)
+    for id in removed.tolist():
+        del live[id]
+    check(index, live, queries, k=20)
+    resume.set()
+    merge.join()
+    assert len(index.segments) == 1 and index.segments[0].deleted == set(removed.tolist())
+    check(index, live, queries, k=20)
+    index.close()
+    check(open_index(tmp_path), live, queries)
@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+from dvx.index.flat import FlatIndex
+from dvx.index.sharded import ShardedIndex
+from .reference import make_data
+
+
+def shard_sizes(index):
+    sizes = index._call({shard: ('__len__', (), {}) for shard in range(index.n_shards)})
+    return [sizes[shard] for shard in range(index.n_shards)]
+
+
+@pytest.fixture(scope='module')
+def data():
+    return make_data(n=1000, dim=16)
+
+
+@pytest.mark.parametrize('start_method', ['fork', 'spawn'])
+@pytest.mark.parametrize('metric', ['cosine', 'l2'])
+def test_search_matches_flat_index(data, start_method, metric):
+    ids, vectors, queries = data
+    flat = FlatIndex(16, metric)
+    flat.add(ids, vectors)
+    with ShardedIndex(16, metric, n_shards=3, start_method=start_method) as index:
+        index.add(ids[:600], vectors[:600])
+        index.add(ids[600:], vectors[600:])
+        assert len(index) == 1000
+        for k in (1, 10):
+            found, scores = index.search(queries, k)
+            expected, expected_scores = flat.search(queries, k)
+            np.testing.assert_array_equal(found, expected)
+            np.testing.assert_allclose(scores, expected_scores, rtol=1e-5, atol=1e-5)
+        subset = ids[::7]
+        np.testing.assert_array_equal(index.search(queries, 10, subset=subset)[0],
+                                      flat.search(queries, 10, subset=subset)[0])
+
+
+def test_remove_is_routed_to_owning_shard(data):
+    ids, vectors, queries = data
+    with ShardedIndex(16, 'l2', n_shards=3, start_method='fork') as index:
+        index.add(ids, vectors)
+        owners = index.shard_of(ids)
+        assert shard_sizes(index) == np.bincount(owners, minlength=3).tolist()
+        removed = ids[owners == 1][:50]
+        assert index.remove(np.append(removed, [-7, 10**9])) == 50
+        assert index.remove(removed) == 0
+        assert len(index) == 950
+        assert shard_sizes(index) == (np.bincount(owners, minlength=3) - [0, 50, 0]).tolist()
+        assert not np.isin(index.search(queries, 50)[0], removed).any()
+
+
+def test_subset_goes_only_to_its_shards(data, monkeypatch):
+    ids, vectors, queries = data
+    with ShardedIndex(16, 'l2', n_shards=4, start_method='fork') as index:
+        index.add(ids, vectors)
+        subset = ids[index.shard_of(ids) == 2][:30]
+        sent = []
+        call = index._call
+
+        def recording_call(calls):
+            sent.append(calls)
+            return call(calls)
+
+        monkeypatch.setattr(index, '_call', recording_call)
+        found, _ = index.search(queries, 40, subset=subset)
+        assert list(sent[0]) == [2]
+        np.testing.assert_array_equal(sent[0][2][2]['subset'], np.sort(subset))
+        # Fewer candidates than k: every one of them, then padding
+        assert all(sorted(row[:30].tolist()) == sorted(subset.tolist()) for row in found)
+        assert (found[:, 30:] == -1).all()
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_save_and_load(tmp_path, data, mmap):
+    ids, vectors, queries = data
+    with ShardedIndex(16, 'cosine', n_shards=2, start_method='fork') as index:
+        index.add(ids, vectors)
+        index.remove(ids[:100])
+        expected = index.search(queries, 10)
+        index.save(str(tmp_path))
+    with ShardedIndex.load(str(tmp_path), mmap=mmap, start_method='fork') as loaded:
+        assert len(loaded) == 900 and loaded.n_shards == 2
+        found = loaded.search(queries, 10)
+        np.testing.assert_array_equal(found[0], expected[0])
+        np.testing.assert_allclose(found[1], expected[1], rtol=1e-6)
+        # Shards keep their ids, so removes still reach the right worker
+        assert loaded.remove(ids[100:200]) == 100
+
+
+def test_shard_errors_are_raised(data):
+    ids, vectors, _ = data
+    with ShardedIndex(16, 'l2', n_shards=2, start_method='fork') as index:
+        index.add(ids[:100], vectors[:100])
+        # Part of the batch is new, part is already stored: the size is recounted from the shards
+        with pytest.raises(ValueError):
+            index.add(ids[50:150], vectors[50:150])
+        assert len(index) == sum(shard_sizes(index))
+        with pytest.raises(ValueError):
+            index.add(ids[:2], vectors[:3])
+
+
+def test_close(data):
+    ids, vectors, queries = data
+    index = ShardedIndex(16, 'l2', n_shards=2, start_method='fork')
+    processes = list(index._processes)
+    index.add(ids, vectors)
+    index.close()
+    index.close()
+    assert not any(process.is_alive() for process in processes)
+    with pytest.raises(RuntimeError, match='closed'):
+        index.search(queries, 5)
+
+
+@pytest.mark.parametrize('operation', ['search', 'add'])
+def test_killed_worker(data, operation):
+    ids, vectors, queries = data
+    index = ShardedIndex(16, 'l2', n_shards=2, start_method='fork')
+    index.add(ids[:500], vectors[:500])
+    index._processes[1].kill()
+    index._processes[1].join()
+    # The worker's exit is reported, not hidden behind the index being closed as a result
+    with pytest.raises(RuntimeError, match='Shard 1 worker exited'):
+        if operation == 'search':
+            index.search(queries, 5)
+        else:
+            index.add(ids[500:], vectors[500:])
+    assert not index._processes[0].is_alive()
+    with pytest.raises(RuntimeError, match='closed'):
+        index.search(queries, 5)
@@ -0,0 +1,266 @@
+import datetime
+import numpy as np
+import pytest
+from dvx.core.document import Document
+from dvx.core.store import VectorStore
+from dvx.store.bitmap import LabelSet
+from .reference import brute_force_search, make_data
+
+START = datetime.datetime(2024, 1, 1)
+
+
+def make_documents(n, seed=0, version=0):
+    rng = np.random.default_rng(seed)
+    documents = []
+    for i in range(n):
+        extension = ['pdf', 'txt', 'docx'][rng.integers(3)]
+        metadata = {'path': f'data/tenant{rng.integers(4)}/sub{rng.integers(2)}/file{i}.{extension}',
+                    'modified_on': (START + datetime.timedelta(days=int(rng.integers(365)))).isoformat()}
+        documents.append(Document(f'doc{i}', f'text {i} v{version}', metadata))
+    return documents
+
+
+def matches(document, doc_type=None, path_prefix=None, modified_after=None, modified_before=None):
+    metadata = document.metadata
+    return ((doc_type is None or metadata['path'].endswith('.' + doc_type))
+            and (path_prefix is None or metadata['path'].startswith(path_prefix + '/'))
+            and (modified_after is None or metadata['modified_on'] >= modified_after)
+            and (modified_before is None or metadata['modified_on'] < modified_before))
+
+
+def check(store, vectors, queries, k=10, **filters):
+    """Compare store.search with brute force over the stored documents, given their vectors by id"""
+    ids = [id for id, document in store.documents.items() if matches(document, **filters)]
+    found = store.search(queries, k, **filters)
+    assert len(found) == len(queries)
+    if not ids:
+        assert found == [[] for _ in queries]
+        return
+    expected, expected_scores = brute_force_search(np.array(ids), np.array([vectors[id] for id in ids]),
+                                                   queries, k, 'cosine')
+    for row, expected_row, expected_row_scores in zip(found, expected, expected_scores):
+        assert [document.id for document, _ in row] == expected_row.tolist()
+        np.testing.assert_allclose([score for _, score in row], expected_row_scores, rtol=1e-4, atol=1e-4)
+        assert all(store.documents[document.id] is document for document, _ in row)
+
+
+def build(n=400):
+    _, vectors, queries = make_data(n=n, dim=16)
+    documents = make_documents(n)
+    store = VectorStore()
+    labels = store.upsert(documents, vectors)
+    np.testing.assert_array_equal(labels, np.arange(n))
+    return store, documents, dict(zip((document.id for document in documents), vectors)), queries
+
+
+def test_upsert_and_search():
+    store, documents, vectors, queries = build()
+    assert len(store) == 400
+    check(store, vectors, queries)
+    check(store, vectors, queries[:1], k=3)
+    assert len(store.search(queries[0], k=3)) == 1
+
+
+def test_upsert_replaces_in_place():
+    store, documents, vectors, queries = build()
+    _, new_vectors, _ = make_data(n=150, dim=16, seed=1)
+    updated = make_documents(100, version=1) + [Document(f'new{i}', 'new') for i in range(50)]
+    labels = store.upsert(updated, new_vectors)
+    # Existing ids keep their labels and new ids get fresh ones
+    np.testing.assert_array_equal(labels, np.concatenate([np.arange(100), np.arange(400, 450)]))
+    vectors.update(zip((document.id for document in updated), new_vectors))
+    assert len(store) == 450 and store.documents['doc5'].text == 'text 5 v1'
+    check(store, vectors, queries)
+
+
+def test_duplicate_ids_in_batch_last_wins():
+    store, documents, vectors, queries = build()
+    _, new_vectors, _ = make_data(n=3, dim=16, seed=2)
+    batch = [Document('doc1', 'first'), Document('extra', 'extra'), Document('doc1', 'second')]
+    labels = store.upsert(batch, new_vectors)
+    assert labels.tolist() == [1, 400, 1]
+    vectors.update({'doc1': new_vectors[2], 'extra': new_vectors[1]})
+    assert store.documents['doc1'].text == 'second'
+    check(store, vectors, queries)
+
+
+def test_rejected_upsert_leaves_store_unchanged():
+    store, documents, vectors, queries = build()
+    before = (dict(store.documents), dict(store.labels), store._next_label, len(store.index))
+    with pytest.raises(ValueError):
+        store.upsert([Document('doc1', 'changed'), Document('new', 'new')], np.ones((2, 8)))
+    with pytest.raises(ValueError):
+        store.upsert([Document('new', 'new')], np.ones((2, 16)))
+    assert (dict(store.documents), dict(store.labels), store._next_label, len(store.index)) == before
+    check(store, vectors, queries)
+
+
+def test_invalid_metadata_leaves_store_unchanged():
+    store, documents, vectors, queries = build()
+    before = (dict(store.documents), dict(store.labels), store._next_label, len(store.index),
+              store.select(doc_type='pdf'))
+    batch = [Document('doc1', 'changed', {'path': 'data/x.txt'}),
+             Document('new', 'new', {'path': 'data/y.txt', 'modified_on': 'not a date'})]
+    with pytest.raises(ValueError, match='not a date'):
+        store.upsert(batch, np.ones((2, 16)))
+    assert (dict(store.documents), dict(store.labels), store._next_label, len(store.index),
+            store.select(doc_type='pdf')) == before
+    check(store, vectors, queries)
+    check(store, vectors, queries, doc_type='txt')
+
+    # A rejected first batch does not create the index either, so its dimension is still open
+    empty = VectorStore()
+    with pytest.raises(ValueError):
+        empty.upsert(batch[1:], np.ones((1, 16)))
+    assert empty.index is None
+    empty.upsert([Document('a', 'a')], np.ones((1, 4)))
+    assert empty.index.dim == 4
+
+
+def test_delete():
+    store, documents, vectors, queries = build()
+    deleted = [f'doc{i}' for i in range(0, 400, 3)]
+    assert store.delete(deleted + ['missing']) == len(deleted)
+    assert store.delete(deleted) == 0
+    for id in deleted:
+        del vectors[id]
+    assert len(store) == 400 - len(deleted)
+    check(store, vectors, queries)
+    check(store, vectors, queries, doc_type='pdf')
+    # Deleted ids come back with new labels
+    store.upsert([documents[0]], vectors['doc1'][None])
+    assert store.labels['doc0'] == 400
+
+
+@pytest.mark.parametrize('filters', [
+    {'doc_type': 'pdf'},
+    {'path_prefix': 'data/tenant2'},
+    {'path_prefix': 'data/tenant1/sub0', 'doc_type': 'txt'},
+    {'modified_after': '2024-03-01', 'modified_before': '2024-06-01'},
+    {'doc_type': 'docx', 'path_prefix': 'data/tenant3', 'modified_before': '2024-02-01'},
+    {'path_prefix': 'data/nobody'},
+])
+def test_filtered_search(filters):
+    store, documents, vectors, queries = build()
+    store.delete([f'doc{i}' for i in range(0, 400, 5)])
+    for i in range(0, 400, 5):
+        del vectors[f'doc{i}']
+    expected = sorted(id for id, document in store.documents.items() if matches(document, **filters))
+    assert sorted(store.select(**filters)) == expected
+    check(store, vectors, queries, **filters)
+
+
+def test_filters_follow_metadata_updates():
+    store, documents, vectors, queries = build()
+    moved = [Document(document.id, document.text, dict(document.metadata, path='archive/' + document.id + '.txt'))
+             for document in documents[:50]]
+    store.upsert(moved, np.array([vectors[document.id] for document in moved]))
+    assert sorted(store.select(path_prefix='archive')) == sorted(document.id for document in moved)
+    assert not set(store.select(doc_type='pdf')) & {document.id for document in moved}
+    assert store.select() is None
+
+
+def test_save_and_load(tmp_path):
+    store, documents, vectors, queries = build()
+    store.delete(['doc3', 'doc4'])
+    del vectors['doc3'], vectors['doc4']
+    store.save(str(tmp_path))
+    for mmap in (True, False):
+        loaded = VectorStore.load(str(tmp_path), mmap=mmap)
+        assert loaded.documents == store.documents and loaded.labels == store.labels
+        check(loaded, vectors, queries, doc_type='txt')
+        # Labels are never reused after a reload
+        loaded.upsert([Document('fresh', 'fresh')], np.ones((1, 16)))
+        assert loaded.labels['fresh'] == 400
+
+
+def test_label_set_matches_python_sets():
+    rng = np.random.default_rng(0)
+    for size in (10, 1000, 100_000):
+        left, right = LabelSet(), LabelSet()
+        expected_left, expected_right = set(), set()
+        for _ in range(20):
+            labels = rng.integers(0, size, rng.integers(1, 200))
+            if rng.random() < 0.7:
+                left.set(labels)
+                expected_left.update(labels.tolist())
+            else:
+                left.clear(labels)
+                expected_left.difference_update(labels.tolist())
+            labels = rng.integers(0, size, rng.integers(1, 2000))
+            right.set(labels)
+            expected_right.update(labels.tolist())
+            assert left.labels().tolist() == sorted(expected_left)
+            assert len(left) == len(expected_left)
+            assert (left & right).labels().tolist() == sorted(expected_left & expected_right)
+            assert (left | right).labels().tolist() == sorted(expected_left | expected_right)
+            probe = rng.integers(0, 2 * size, 50)
+            assert left.contains(probe).tolist() == [label in expected_left for label in probe.tolist()]
+
+
+def open_store(path, **options):
+    return VectorStore.open(str(path), **dict(dict(sync=False, flush_size=150, background=False), **options))
+
+
+def test_durable_store_reopens_without_close(tmp_path):
+    _, vectors, queries = make_data(n=400, dim=16)
+    documents = make_documents(400)
+    vectors = dict(zip((document.id for document in documents), vectors))
+    store = open_store(tmp_path)
+    for start in range(0, 400, 100):
+        batch = documents[start:start + 100]
+        store.upsert(batch, np.array([vectors[document.id] for document in batch]))
+        if start == 100:
+            store.checkpoint()
+    store.delete(['doc1', 'doc250'])
+    del vectors['doc1'], vectors['doc250']
+    store.upsert([Document('doc2', 'updated', documents[2].metadata)], vectors['doc3'][None])
+    vectors['doc2'] = vectors['doc3']
+
+    # Never closed, as after a crash: the snapshot plus both logs give back every write
+    reopened = open_store(tmp_path)
+    assert reopened.documents == store.documents and reopened.labels == store.labels
+    check(reopened, vectors, queries)
+    check(reopened, vectors, queries, path_prefix='data/tenant0')
+    reopened.upsert([Document('fresh', 'fresh')], np.ones((1, 16)))
+    assert reopened.labels['fresh'] == 400
+    reopened.close()
+    store.close()
+
+
+def test_durable_store_drops_unlogged_upsert(tmp_path):
+    _, vectors, queries = make_data(n=200, dim=16)
+    documents = make_documents(200)
+    store = open_store(tmp_path, dim=16)
+    store.upsert(documents[:150], vectors[:150])
+    store.upsert(documents[150:], vectors[150:])
+    store.close()
+    # The documents of the last upsert were torn from the log after its vectors were logged by the index
+    log = tmp_path / 'documents.log'
+    log.write_bytes(log.read_bytes()[:-10])
+
+    with pytest.warns(UserWarning, match='Truncating'):
+        reopened = open_store(tmp_path)
+    assert len(reopened) == 150 and len(reopened.index) == 150
+    check(reopened, dict(zip((document.id for document in documents[:150]), vectors)), queries)
+    assert reopened.upsert(documents[150:151], vectors[150:151]).tolist() == [200]
+    reopened.close()
+
+
+def test_durable_store_warns_about_lost_vectors(tmp_path):
+    _, vectors, _ = make_data(n=20, dim=16)
+    store = open_store(tmp_path)
+    store.upsert(make_documents(20), vectors)
+    store.close()
+    # Losing the index log behind the document log's back leaves documents without vectors
+    index_wal = next((tmp_path / 'index').glob('wal-*.log'))
+    index_wal.write_bytes(b'')
+    with pytest.warns(UserWarning, match='20 documents'):
+        reopened = open_store(tmp_path)
+    assert len(reopened) == 20 and not len(reopened.index)
+    reopened.close()
+
+
+def test_checkpoint_needs_durable_store():
+    with pytest.raises(RuntimeError):
+        VectorStore().checkpoint()
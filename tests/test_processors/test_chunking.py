@@ -0,0 +1,91 @@
+import random
+import numpy as np
+import pytest
+from dvx.core.chunks import ChunkTable
+from dvx.encoders.text.hashing import HashingEncoder
+from dvx.utils.chunking import (fixed_size_chunk, fixed_size_spans, paragraph_based_chunk, paragraph_spans,
+                                semantic_sentence_chunk, semantic_sentence_spans, sentence_based_chunk,
+                                sentence_spans)
+
+WORDS = ['data', 'science', 'index', 'vector', 'query', 'é', 'naïve', '42', 'x', '、', '\U0001F600']
+SEPARATORS = [' ', ' ', ' ', '  ', '\n', '\n\n', '\n \n\n', '. ', '.', '..', ' . ', '\t', '\xa0', '　', '\x1c']
+
+
+def random_text(rng, n_words):
+    parts = [rng.choice(SEPARATORS) if rng.random() < 0.3 else '']
+    for _ in range(n_words):
+        parts.append(rng.choice(WORDS))
+        parts.append(rng.choice(SEPARATORS))
+    return ''.join(parts)
+
+
+def texts():
+    rng = random.Random(0)
+    yield from ['', ' ', '.', '...', '\n\n', 'one', 'one.', ' one two. three ', 'a.\n\nb. c']
+    for _ in range(200):
+        yield random_text(rng, rng.randint(1, 80))
+
+
+def slices(text, spans):
+    assert spans.dtype == np.int64 and spans.shape[1] == 2
+    return [text[start:end] for start, end in spans.tolist()]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 50])
+def test_fixed_size_spans(chunk_size):
+    for text in texts():
+        chunks = slices(text, fixed_size_spans(text, chunk_size))
+        # Spans keep the source whitespace that fixed_size_chunk() collapses to single spaces
+        assert [' '.join(chunk.split()) for chunk in chunks] == fixed_size_chunk(text, chunk_size)
+        assert all(chunk == chunk.strip() for chunk in chunks)
+
+
+def test_sentence_spans():
+    for text in texts():
+        chunks = slices(text, sentence_spans(text))
+        assert [chunk.removesuffix('.').strip() + '.' for chunk in chunks] == sentence_based_chunk(text)
+
+
+def test_paragraph_spans():
+    for text in texts():
+        assert slices(text, paragraph_spans(text)) == paragraph_based_chunk(text)
+
+
+@pytest.mark.parametrize('metric, threshold', [('cosine', {'cosine_threshold': 0.2}),
+                                               ('l2', {'l2_threshold': 1.2})])
+def test_semantic_sentence_spans(metric, threshold):
+    encoder = HashingEncoder(n_features=64)
+    for text in texts():
+        options = dict(metric=metric, chunk_size=3, encoder=encoder, **threshold)
+        chunks = slices(text, semantic_sentence_spans(text, **options))
+        expected = semantic_sentence_chunk(text, **options)
+        assert [' '.join(sentence_based_chunk(chunk)) for chunk in chunks] == expected
+
+
+def test_chunk_table():
+    table = ChunkTable(capacity=2)
+    documents = list(texts())[:50]
+    expected = []
+    for i, text in enumerate(documents):
+        assert table.add(text, sentence_spans(text), doc_id=f'doc{i}') == i
+        expected.extend((f'doc{i}', chunk) for chunk in slices(text, sentence_spans(text)))
+    assert len(table) == len(expected)
+    assert table.to_list() == [chunk for _, chunk in expected]
+    assert [(chunk.doc_id, chunk.text) for chunk in table] == expected
+    assert table[-1].text == expected[-1][1]
+    with pytest.raises(IndexError):
+        table.text(len(table))
+    with pytest.raises(ValueError):
+        table.add('short', np.array([[0, 10]]))
+
+
+def test_chunk_table_overlap():
+    text = 'alpha beta. gamma delta. epsilon.'
+    table = ChunkTable()
+    table.add(text, sentence_spans(text))
+    table.add(text, sentence_spans(text))
+    overlapped = table.with_overlap(8)
+    assert overlapped.to_list()[:3] == ['alpha beta.', 'a beta. gamma delta.', ' delta. epsilon.']
+    # The first chunk of the second document does not reach back into the first
+    assert overlapped.text(3) == 'alpha beta.'
+    assert table.to_list()[:3] == ['alpha beta.', 'gamma delta.', 'epsilon.']
@@ -0,0 +1,72 @@
+import random
+import re
+import pytest
+from dvx.utils.clean import GarbledTextCleaner, fix_hyphenated_words, iter_clean, remove_garbled_text
+
+ALPHABET = ('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+            ' \n\t\r\x00\x07\x7f-_.,;:!?\'"()~`@#$%^&*+=|<>/[]{}\\'
+            'éßü€—“” �')
+
+
+def reference_garbled(text):
+    """The four-pass cleaner the fused patterns replaced"""
+    text = re.sub(r'[^\x20-\x7E\n]+', '', text)
+    text = re.sub(r'(\W|\d){4,}', '', text)
+    text = re.sub(r'[~`@#$%^&*+=|<>/\[\]\{\}_]', '', text)
+    text = re.sub(r'\b[a-zA-Z0-9]\b', '', text)
+    return text
+
+
+def random_text(rng, n):
+    # Mix word-like runs with noise so every pass has something to match
+    parts, size = [], 0
+    while size < n:
+        if rng.random() < 0.6:
+            part = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(1, 9)))
+        else:
+            part = ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 6)))
+        parts.append(part)
+        size += len(part)
+    return ''.join(parts)
+
+
+def random_chunks(rng, text):
+    cuts = sorted(rng.sample(range(len(text)), min(len(text), rng.randint(0, 20))))
+    return [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_remove_garbled_text_matches_reference(seed):
+    rng = random.Random(seed)
+    text = random_text(rng, 2000)
+    assert remove_garbled_text(text) == reference_garbled(text)
+    assert remove_garbled_text(text, strip=True) == reference_garbled(text).strip()
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_iter_clean_matches_whole_text(seed):
+    rng = random.Random(seed)
+    text = random_text(rng, 20000)
+    assert ''.join(iter_clean(random_chunks(rng, text))) == reference_garbled(text)
+
+
+def test_streaming_cleaner_with_small_buffer():
+    rng = random.Random(0)
+    text = random_text(rng, 5000)
+    cleaner = GarbledTextCleaner(min_chunk=16)
+    pieces = [cleaner.feed(chunk) for chunk in random_chunks(rng, text)]
+    assert ''.join(pieces) + cleaner.flush() == reference_garbled(text)
+
+
+def test_edge_cases():
+    for text in ['', 'a', '1234', 'ab 12 cd', '____', 'x\n\n\ny', '—'*10, 'word' + '\x00'*5 + 'word']:
+        assert remove_garbled_text(text) == reference_garbled(text)
+        assert ''.join(iter_clean([text])) == reference_garbled(text)
+
+
+def test_fix_hyphenated_words():
+    rng = random.Random(0)
+    for _ in range(50):
+        text = ''.join(rng.choice('ab -\n') for _ in range(200))
+        assert fix_hyphenated_words(text) == re.sub(r'-\n(\w+)', r'\1', text)
+    assert fix_hyphenated_words('infor-\nmation retrie-\nval') == 'information retrieval'
@@ -0,0 +1,112 @@
+import json
+import os
+import pytest
+from dvx.core.document import list_files, parse, read_document
+from dvx.processors.pdf import iter_pages
+from dvx.utils import instrument
+from .pdfs import write_pdf
+
+CHUNKING = 'sentence_based_chunk'
+
+
+@pytest.fixture
+def hook():
+    events = []
+    instrument.add_hook(events.append)
+    yield events
+    instrument.remove_hook(events.append)
+
+
+def make_folder(tmp_path):
+    for i in range(4):
+        (tmp_path / f'doc{i}.txt').write_text(' '.join(f'File {i} sentence {j} is here.' for j in range(i + 2)))
+    (tmp_path / 'table.csv').write_text('a,b\n')
+    return str(tmp_path)
+
+
+def test_hooks_receive_stage_events(tmp_path, hook):
+    path = str(tmp_path / 'doc.txt')
+    with open(path, 'w') as file:
+        file.write('Some text to read.')
+    with instrument.collect() as stats:
+        content = read_document(path)
+    assert content == 'Some text to read.'
+    assert [(event.stage, event.info, event.memory_peak) for event in hook] == [('read', {'path': path}, None)]
+    assert hook[0].seconds >= 0
+    assert stats.stages['read'].calls == 1 and stats.counters == {'bytes': os.path.getsize(path)}
+
+    hook.clear()
+    with instrument.collect(trace_memory=True):
+        with instrument.stage('outer', size=3):
+            with instrument.stage('inner'):
+                data = [bytearray(1 << 16) for _ in range(16)]
+            del data
+    assert [event.stage for event in hook] == ['inner', 'outer']
+    assert hook[1].info == {'size': 3}
+    assert hook[1].memory_peak >= hook[0].memory_peak >= 16 << 16
+
+
+def test_parse_counters(tmp_path):
+    folder = make_folder(tmp_path)
+    files = list_files(folder)
+    with instrument.collect() as serial:
+        chunks = parse(folder, CHUNKING)
+    assert serial.counters == {'files': len(files), 'errors': 1, 'chunks': len(chunks),
+                               'bytes': sum(os.path.getsize(path) for path in files if path.endswith('.txt'))}
+    assert serial.stages['parse'].calls == 1
+    assert serial.stages['read'].calls == serial.stages['chunk'].calls == len(files) - 1
+
+    # Stats collected in worker processes are merged into the parent's
+    with instrument.collect() as parallel:
+        assert parse(folder, CHUNKING, workers=2) == chunks
+    assert parallel.counters == serial.counters
+    assert {name: stage.calls for name, stage in parallel.stages.items()} == \
+           {name: stage.calls for name, stage in serial.stages.items()}
+
+
+def test_pdf_worker_stats_are_merged(tmp_path):
+    path = write_pdf(str(tmp_path / 'sample.pdf'), [[f'Page {i} has a sentence.'] for i in range(5)])
+    with instrument.collect() as stats:
+        assert len(list(iter_pages(path, workers=2, batch_size=2))) == 5
+    assert stats.counters == {'pages': 5} and stats.stages['pdf.page'].calls == 5
+
+
+def test_failing_hook_warns():
+    def broken(event):
+        raise KeyError('boom')
+
+    instrument.add_hook(broken)
+    try:
+        with instrument.collect() as stats:
+            with pytest.warns(RuntimeWarning, match='KeyError'):
+                with instrument.stage('work'):
+                    pass
+    finally:
+        instrument.remove_hook(broken)
+    assert stats.stages['work'].calls == 1
+
+
+def test_disabled_is_a_no_op(hook):
+    assert not instrument.is_enabled() and instrument.options() is None
+    before = instrument.stats().to_dict()
+    assert instrument.stage('a') is instrument.stage('b', path='x')
+    with instrument.stage('a'):
+        instrument.count('files', 3)
+    assert instrument.wrap('a', len) is len
+    assert instrument.stats().to_dict() == before and hook == []
+
+
+def test_collect_restores_and_exports():
+    outer = instrument.stats()
+    with instrument.collect() as stats:
+        assert instrument.is_enabled() and instrument.stats() is stats
+        timed = instrument.wrap('sum', sum)
+        assert timed([1, 2]) == 3
+        instrument.count('items', 2)
+    assert not instrument.is_enabled() and instrument.stats() is outer
+    assert stats.stages['sum'].calls == 1
+
+    exported = json.loads(stats.to_json())
+    stats.merge(exported)
+    assert stats.counters == {'items': 4} and stats.stages['sum'].calls == 2
+    assert 'sum' in stats.report() and 'items' in stats.report()
@@ -0,0 +1,103 @@
+import builtins
+import os
+import pytest
+from dvx.core.manifest import Manifest, file_hash
+from dvx.core.metadata import generate_metadata
+
+
+def write(path, text, mtime=None):
+    path.write_text(text)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def test_scan_and_record(tmp_path):
+    a = write(tmp_path / 'a.txt', 'alpha', 1000)
+    b = write(tmp_path / 'b.txt', 'beta', 1000)
+    c = write(tmp_path / 'c.txt', 'gamma', 1000)
+    manifest = Manifest(str(tmp_path / 'manifest.json'))
+    diff = manifest.scan([a, b, c])
+    assert diff.new == [a, b, c] and diff.pending == [a, b, c]
+    for path in diff.pending:
+        assert manifest.record(path, *diff.fingerprints[path]) == file_hash(path)
+    manifest.save()
+    c_id = manifest.get_id(c)
+
+    write(tmp_path / 'a.txt', 'alpha', 2000)    # touched only
+    write(tmp_path / 'b.txt', 'beta 2', 2000)   # modified
+    os.remove(c)
+    d = write(tmp_path / 'd.txt', 'delta')
+    manifest = Manifest(str(tmp_path / 'manifest.json'))
+    diff = manifest.scan([a, b, d], root=str(tmp_path))
+    assert (diff.new, diff.changed, diff.unchanged, diff.deleted) == ([d], [b], [a], [c])
+    assert set(diff.fingerprints) == {b, d}
+    assert manifest.forget(diff.deleted) == [c_id] and c not in manifest
+    # Touching a file refreshes its stored mtime, so the next scan does not read it
+    assert manifest.entries[a]['mtime'] == 2000
+
+
+def test_file_changed_while_processing_is_scanned_again(tmp_path):
+    a = write(tmp_path / 'a.txt', 'first', 1000)
+    manifest = Manifest()
+    diff = manifest.scan([a])
+    # Modified after the scan but before it is recorded
+    write(tmp_path / 'a.txt', 'second version', 2000)
+    manifest.record(a, *diff.fingerprints[a])
+    assert manifest.get_id(a) == diff.fingerprints[a].id
+    assert manifest.scan([a]).changed == [a]
+
+
+def test_generate_metadata_follows_changes(tmp_path):
+    folder = tmp_path / 'data'
+    folder.mkdir()
+    a = write(folder / 'a.txt', 'alpha', 1000)
+    b = write(folder / 'b.txt', 'beta', 1000)
+    manifest = Manifest(str(tmp_path / 'manifest.json'))
+    metadoc = generate_metadata(str(folder), manifest=manifest)
+    assert sorted(metadoc.df['path']) == [a, b]
+
+    write(folder / 'a.txt', 'alpha 2', 2000)
+    os.remove(b)
+    c = write(folder / 'c.txt', 'gamma')
+    metadoc = generate_metadata(str(folder), metadoc, manifest=Manifest(str(tmp_path / 'manifest.json')))
+    assert sorted(metadoc.df['path']) == [a, c]
+    assert metadoc.get_by_path(a)['id'] == file_hash(a)
+    assert metadoc.get_by_path(b) is None
+
+    # Nothing changed: nothing is re-added
+    before = metadoc.df.copy()
+    metadoc = generate_metadata(str(folder), metadoc, manifest=Manifest(str(tmp_path / 'manifest.json')))
+    assert metadoc.df.equals(before)
+
+
+def test_generate_metadata_in_a_new_process(tmp_path):
+    folder = tmp_path / 'data'
+    folder.mkdir()
+    paths = [write(folder / f'{name}.txt', name, 1000) for name in ('a', 'b', 'c')]
+    first = generate_metadata(str(folder), manifest=Manifest(str(tmp_path / 'manifest.json')))
+
+    write(folder / 'b.txt', 'b changed', 2000)
+    # A fresh metadoc, as in a new process, still lists the files the manifest skips as unchanged
+    metadoc = generate_metadata(str(folder), manifest=Manifest(str(tmp_path / 'manifest.json')))
+    assert sorted(metadoc.df['path']) == paths
+    for path in (paths[0], paths[2]):
+        assert metadoc.get_by_path(path) == first.get_by_path(path)
+    assert metadoc.get_by_path(paths[1])['id'] == file_hash(paths[1])
+
+
+def test_generate_metadata_without_manifest_reads_no_contents(tmp_path, monkeypatch):
+    folder = tmp_path / 'data'
+    folder.mkdir()
+    paths = sorted(write(folder / f'{name}.txt', name) for name in ('a', 'b'))
+    original = builtins.open
+
+    def guarded_open(file, *args, **kwargs):
+        if str(file) in paths:
+            pytest.fail(f'{file} was read')
+        return original(file, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, 'open', guarded_open)
+    metadoc = generate_metadata(str(folder))
+    assert sorted(metadoc.df['path']) == paths
+    assert len(set(metadoc.df['id'])) == 2
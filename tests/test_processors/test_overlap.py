@@ -0,0 +1,60 @@
+import random
+import pytest
+from dvx.core.document import overlap
+from dvx.utils.chunking import paragraph_based_chunk, sentence_based_chunk
+from dvx.utils.overlap import fixed_size_overlap, paragraph_overlap, sentence_overlap, token_overlap
+
+PIECES = ['word', 'data', 'x', '42', ' ', ' ', '  ', '\n', '\n\n', ' \n \n', '.', '. ', '\t', 'é']
+
+
+def texts(n=500, seed=0):
+    rng = random.Random(seed)
+    yield from ['', ' ', '.', 'one', 'one.', '\n\n', 'a. b.\n\nc']
+    for _ in range(n):
+        # Long texts too, so the tail scan has to widen its window
+        yield ''.join(rng.choice(PIECES) for _ in range(rng.choice([5, 50, 2000])))
+
+
+@pytest.mark.parametrize('size', [1, 2, 5])
+def test_sentence_overlap_matches_chunker(size):
+    for text in texts():
+        assert sentence_overlap(text, 'NEXT', size) == ''.join(sentence_based_chunk(text)[-size:]) + 'NEXT'
+
+
+@pytest.mark.parametrize('size', [1, 2, 5])
+def test_paragraph_overlap_matches_chunker(size):
+    for text in texts():
+        assert paragraph_overlap(text, 'NEXT', size) == ''.join(paragraph_based_chunk(text)[-size:]) + 'NEXT'
+
+
+@pytest.mark.parametrize('size', [1, 3, 200])
+def test_token_overlap(size):
+    for text in texts():
+        result = token_overlap(text, 'NEXT', size)
+        tokens = text.split()[-size:]
+        if not tokens:
+            assert result == 'NEXT'
+            continue
+        assert result.endswith(' NEXT') and result[:-5].split() == tokens
+        # The tokens keep the whitespace they had in the source text
+        assert text.rstrip().endswith(result[:-5])
+
+
+def test_fixed_size_overlap():
+    assert fixed_size_overlap('abcdef', 'XY', 3) == 'defXY'
+    assert fixed_size_overlap('ab', 'XY', 3) == 'abXY'
+
+
+@pytest.mark.parametrize('overlap_fn', [fixed_size_overlap, token_overlap, sentence_overlap, paragraph_overlap])
+@pytest.mark.parametrize('size', [0, -1])
+def test_no_overlap(overlap_fn, size):
+    assert overlap_fn('One two. Three four.\n\nFive.', 'NEXT', size) == 'NEXT'
+
+
+def test_overlap_pairs():
+    chunks = ['One. Two.', 'Three. Four.', 'Five.']
+    assert overlap(chunks, 'sentence_overlap') == ['Two.Three. Four.', 'Four.Five.']
+    assert overlap(chunks, 'sentence_overlap', keep_first=True)[0] == 'One. Two.'
+    assert overlap(chunks[:1], 'sentence_overlap') == []
+    with pytest.raises(ValueError):
+        overlap(chunks, 'no_such_overlap')
@@ -0,0 +1,71 @@
+from itertools import islice
+from dvx.core.document import iter_overlap, iter_parse, list_files, overlap, parse, parse_file, parse_files
+from dvx.core.manifest import Manifest
+
+CHUNKING = 'sentence_based_chunk'
+
+
+def make_folder(tmp_path):
+    """A few text files, a corrupt PDF and a file of an unsupported type"""
+    (tmp_path / 'sub').mkdir()
+    for i in range(5):
+        sentences = ' '.join(f'Document {i} has sentence number {j} about topic {i * j}.' for j in range(i + 3))
+        (tmp_path / ('sub' if i % 2 else '') / f'doc{i}.txt').write_text(sentences)
+    (tmp_path / 'broken.pdf').write_bytes(b'not a pdf at all')
+    (tmp_path / 'table.csv').write_text('a,b\n1,2\n')
+    return str(tmp_path)
+
+
+def test_parallel_parse_matches_serial(tmp_path):
+    folder = make_folder(tmp_path)
+    files = list_files(folder)
+    serial = parse_files(files, CHUNKING)
+    assert [result.path for result in serial] == files
+    for chunksize in (1, 2, 10):
+        assert parse_files(files, CHUNKING, workers=2, chunksize=chunksize) == serial
+    assert parse(folder, CHUNKING, workers=2) == parse(folder, CHUNKING)
+
+
+def test_parse_errors_are_captured_per_file(tmp_path):
+    folder = make_folder(tmp_path)
+    results = {result.path: result for result in parse_files(list_files(folder), CHUNKING, workers=2)}
+    failed = {path for path, result in results.items() if result.error is not None}
+    assert failed == {str(tmp_path / 'broken.pdf'), str(tmp_path / 'table.csv')}
+    assert all(results[path].chunks == [] for path in failed)
+    assert results[str(tmp_path / 'table.csv')].error.startswith('ValueError')
+    assert all(result.chunks for path, result in results.items() if path not in failed)
+    assert len(parse(folder, CHUNKING)) == sum(len(result.chunks) for result in results.values())
+
+
+def test_iter_parse_matches_parse(tmp_path):
+    (tmp_path / 'docs').mkdir()
+    folder = make_folder(tmp_path / 'docs')
+    pairs = list(iter_parse(folder, CHUNKING, workers=2))
+    assert [text for _, text in pairs] == parse(folder, CHUNKING)
+    expected = [(path, text) for path in list_files(folder) for text in parse_file(path, CHUNKING).chunks]
+    assert pairs == expected
+
+    manifest = Manifest(str(tmp_path / 'manifest.json'))
+    assert list(iter_parse(folder, CHUNKING, manifest=manifest)) == pairs
+    # Saved once the generator is exhausted, so nothing is pending on the next run
+    assert list(iter_parse(folder, CHUNKING, manifest=Manifest(str(tmp_path / 'manifest.json')))) == []
+
+
+def test_iter_overlap_matches_overlap_and_is_lazy():
+    chunks = [f'Chunk {i} opens here. It closes with sentence {i}.' for i in range(6)]
+    for overlap_type in ('fixed_size_overlap', 'token_overlap', 'sentence_overlap', 'paragraph_overlap'):
+        for keep_first in (False, True):
+            expected = overlap(chunks, overlap_type, keep_first=keep_first)
+            assert list(iter_overlap(iter(chunks), overlap_type, keep_first=keep_first)) == expected
+            assert len(expected) == len(chunks) - 1 + keep_first
+    assert overlap(chunks, 'token_overlap', overlap_size=2)[0] == 'sentence 0. ' + chunks[1]
+
+    consumed = []
+
+    def source():
+        for text in chunks:
+            consumed.append(text)
+            yield text
+
+    assert list(islice(iter_overlap(source(), 'fixed_size_overlap'), 2)) == overlap(chunks[:3], 'fixed_size_overlap')
+    assert consumed == chunks[:3]
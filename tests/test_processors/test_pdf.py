@@ -0,0 +1,51 @@
+import PyPDF2
+import pytest
+from dvx.processors.pdf import clean_page, count_pages, extract_pages, iter_pages, read
+from dvx.utils.clean import fix_hyphenated_words, remove_garbled_text
+from .pdfs import write_pdf
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    pages = []
+    for i in range(7):
+        pages.append([f'Page {i} opens with an ordinary sentence.',
+                      'Its second line ends in a hyphen-',
+                      f'ated word and some noise @@@@ #### {i}.',
+                      'The last line is plain prose again.'])
+    return write_pdf(str(tmp_path / 'sample.pdf'), pages)
+
+
+def raw_pages(path):
+    with open(path, 'rb') as file:
+        return [page.extract_text() for page in PyPDF2.PdfReader(file).pages]
+
+
+def reference_read(texts):
+    """Cleaning of the whole concatenated document, as read() did before it streamed pages"""
+    return remove_garbled_text(''.join(fix_hyphenated_words(text) + '\n' for text in texts)).strip()
+
+
+def test_read_matches_whole_document_cleaning(pdf):
+    raw = raw_pages(pdf)
+    assert count_pages(pdf) == len(raw) == 7
+    assert read(pdf) == reference_read(raw)
+    assert 'hyphenated' in read(pdf) and '@@@@' not in read(pdf)
+    assert read(pdf, pages=range(2, 5)) == reference_read(raw[2:5])
+
+
+def test_page_ranges(pdf):
+    raw = raw_pages(pdf)
+    assert list(iter_pages(pdf)) == [clean_page(text) for text in raw]
+    assert list(iter_pages(pdf, pages=range(3, 6))) == [clean_page(text) for text in raw[3:6]]
+    assert extract_pages(pdf, [5, 0, 2]) == [clean_page(raw[i]) for i in (5, 0, 2)]
+    assert extract_pages(pdf, [1], clean=False) == [fix_hyphenated_words(raw[1])]
+    assert list(iter_pages(pdf, pages=[])) == []
+
+
+def test_parallel_extraction_matches_serial(pdf):
+    for pages in (None, range(1, 6), [6, 0, 3]):
+        serial = list(iter_pages(pdf, pages=pages))
+        for batch_size in (1, 2, 16):
+            assert list(iter_pages(pdf, pages=pages, workers=2, batch_size=batch_size)) == serial
+        assert read(pdf, pages=pages, workers=2) == read(pdf, pages=pages)